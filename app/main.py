@@ -1,21 +1,161 @@
-from fastapi import FastAPI, UploadFile, File, Form, BackgroundTasks
-from fastapi.responses import JSONResponse, HTMLResponse, FileResponse
+from fastapi import FastAPI, UploadFile, File, Form, Request
+from fastapi.responses import JSONResponse, HTMLResponse, FileResponse, StreamingResponse, PlainTextResponse
+from fastapi.concurrency import run_in_threadpool
+from starlette.background import BackgroundTask
 from pathlib import Path
 from uuid import uuid4
-import time, subprocess, threading
-from typing import Dict, Tuple, Optional, List
+import time, subprocess, threading, sqlite3, json, hashlib, gzip, asyncio, zipfile, tempfile, socket, secrets
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, wait
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Tuple, Optional, List, NamedTuple
+from array import array
+from bisect import bisect_left, bisect_right
+import numpy as np
 from faster_whisper import WhisperModel
-import sys, shutil
+from faster_whisper.vad import VadOptions, get_speech_timestamps
+import sys, shutil, re
 import os 
 import ctranslate2 as ct2
 
 app = FastAPI(title="Get Subtitles — MVP")
 
 BASE_DIR = Path(__file__).resolve().parent.parent
-UPLOAD_DIR = BASE_DIR / "uploads"
-DEFAULT_OUTPUT_DIR = BASE_DIR / "outputs"
-UPLOAD_DIR.mkdir(exist_ok=True)
-DEFAULT_OUTPUT_DIR.mkdir(exist_ok=True)
+# With several API/worker processes these folders and STATE_DIR must be shared by all of them.
+UPLOAD_DIR = Path(os.environ.get("GETSUBTITLES_UPLOAD_DIR") or BASE_DIR / "uploads").expanduser()
+DEFAULT_OUTPUT_DIR = Path(os.environ.get("GETSUBTITLES_OUTPUT_DIR") or BASE_DIR / "outputs").expanduser()
+UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+DEFAULT_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+STATE_DIR = Path(os.environ.get("GETSUBTITLES_STATE_DIR") or BASE_DIR / "state").expanduser()
+STATE_DIR.mkdir(parents=True, exist_ok=True)
+ROLE = os.environ.get("GETSUBTITLES_ROLE", "all").strip().lower()  # all | api (no workers) | worker
+
+# ----------------- Metrics -----------------
+class Metrics:
+    """
+    Minimal in-process Prometheus registry: labelled counters, histograms and scrape-time gauges.
+    Processes without an HTTP endpoint publish snapshot() through the job store; render() merges
+    them, giving every per-process series a worker label.
+    """
+
+    PHASE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help: Dict[str, Tuple[str, str]] = {}  # name -> (type, help)
+        self._counters: Dict[Tuple[str, tuple], float] = {}
+        self._hists: Dict[Tuple[str, tuple], list] = {}  # -> [bucket counts..., sum, count]
+        self._gauges: Dict[str, object] = {}  # name -> callable returning value or {labels: value}
+        self._process_gauges: set = set()  # gauges describing this process rather than the shared store
+
+    def describe(self, name: str, kind: str, text: str):
+        self._help[name] = (kind, text)
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            h = self._hists.setdefault(key, [0] * len(self.PHASE_BUCKETS) + [0.0, 0])
+            for i, bound in enumerate(self.PHASE_BUCKETS):
+                if value <= bound:
+                    h[i] += 1
+            h[-2] += value
+            h[-1] += 1
+
+    def gauge(self, name: str, fn, per_process: bool = False):
+        self._gauges[name] = fn
+        if per_process:
+            self._process_gauges.add(name)
+
+    @staticmethod
+    def _gauge_items(fn) -> list:
+        value = fn()
+        return list(value.items()) if isinstance(value, dict) else [((), value)]
+
+    def snapshot(self) -> dict:
+        """This process's counters, histograms and per-process gauges as JSON-friendly lists."""
+        with self._lock:
+            counters = [[n, [list(p) for p in labels], v] for (n, labels), v in self._counters.items()]
+            hists = [[n, [list(p) for p in labels], list(h)] for (n, labels), h in self._hists.items()]
+        gauges = {}
+        for name in self._process_gauges:
+            try:
+                gauges[name] = [[[list(p) for p in labels], v] for labels, v in self._gauge_items(self._gauges[name])]
+            except Exception:
+                continue
+        return {"counters": counters, "hists": hists, "gauges": gauges}
+
+    @staticmethod
+    def _labels(pairs) -> str:
+        if not pairs:
+            return ""
+        inner = ",".join(f'{k}="{str(v).replace(chr(34), chr(39))}"' for k, v in pairs)
+        return "{" + inner + "}"
+
+    def render(self, worker_id: str, others: Optional[Dict[str, dict]] = None) -> str:
+        """Prometheus text for this process plus `others`, snapshot()s keyed by worker id."""
+        counters: Dict[Tuple[str, tuple], float] = {}
+        hists: Dict[Tuple[str, tuple], list] = {}
+        gauges: Dict[str, list] = {}
+        for wid, snap in [(worker_id, self.snapshot())] + sorted((others or {}).items()):
+            tag = (("worker", wid),)
+            for n, labels, v in snap["counters"]:
+                counters[(n, tuple(map(tuple, labels)) + tag)] = v
+            for n, labels, h in snap["hists"]:
+                hists[(n, tuple(map(tuple, labels)) + tag)] = h
+            for n, items in snap["gauges"].items():
+                gauges.setdefault(n, []).extend((tuple(map(tuple, labels)) + tag, v) for labels, v in items)
+        for name, fn in self._gauges.items():
+            if name not in self._process_gauges:
+                try:
+                    gauges[name] = self._gauge_items(fn)
+                except Exception:
+                    continue
+
+        lines = []
+        names = sorted({k[0] for k in counters} | {k[0] for k in hists} | set(gauges))
+        for name in names:
+            kind, text = self._help.get(name, ("untyped", ""))
+            lines.append(f"# HELP {name} {text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for (n, labels), v in sorted(counters.items()):
+                if n == name:
+                    lines.append(f"{name}{self._labels(labels)} {v}")
+            for (n, labels), h in sorted(hists.items()):
+                if n != name:
+                    continue
+                for bound, count in zip(self.PHASE_BUCKETS, h):
+                    lines.append(f"{name}_bucket{self._labels(labels + (('le', bound),))} {count}")
+                lines.append(f"{name}_bucket{self._labels(labels + (('le', '+Inf'),))} {h[-1]}")
+                lines.append(f"{name}_sum{self._labels(labels)} {h[-2]}")
+                lines.append(f"{name}_count{self._labels(labels)} {h[-1]}")
+            for labels, v in gauges.get(name, []):
+                lines.append(f"{name}{self._labels(labels)} {v}")
+        return "\n".join(lines) + "\n"
+
+METRICS = Metrics()
+METRICS.describe("getsubtitles_jobs_total", "counter", "Finished jobs by outcome.")
+METRICS.describe("getsubtitles_audio_seconds_total", "counter", "Seconds of audio transcribed (excluding cache hits).")
+METRICS.describe("getsubtitles_model_loads_total", "counter", "Model loads by profile and compute type.")
+METRICS.describe("getsubtitles_compute_fallbacks_total", "counter", "Compute types that failed to load before a fallback.")
+METRICS.describe("getsubtitles_phase_seconds", "histogram", "Per-job time spent in each pipeline phase.")
+METRICS.describe("getsubtitles_cache_lookups_total", "counter", "Result cache lookups by outcome.")
+METRICS.describe("getsubtitles_queue_depth", "gauge", "Jobs waiting in the queue.")
+METRICS.describe("getsubtitles_jobs_in_progress", "gauge", "Jobs currently claimed by a worker.")
+METRICS.describe("getsubtitles_models_resident", "gauge", "Models loaded in this process.")
+METRICS.describe("getsubtitles_models_resident_bytes", "gauge", "Approximate memory of the loaded models.")
 
 # --- Local model folder helpers ---
 def _bundle_base() -> Path:
@@ -49,46 +189,396 @@ def _compute_candidates(profile: str, device: str) -> list[str]:
                .get(profile, "int16")
         return [base, "int16", "float32"]
 
+# --- CPU budget: how many inference threads the server uses and how they are split ---
+def _available_cpus() -> List[int]:
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+_HOST_CPUS = _available_cpus()  # before any pinning, so unpinning can restore it
+
+def parse_cpu_list(spec: str) -> List[int]:
+    """'0-3,8' -> [0, 1, 2, 3, 8]. Raises ValueError."""
+    cpus = set()
+    for part in spec.replace(" ", "").split(","):
+        if not part:
+            continue
+        lo, _, hi = part.partition("-")
+        a, b = int(lo), int(hi or lo)
+        if a < 0 or b < a:
+            raise ValueError(f"bad CPU range '{part}'")
+        cpus.update(range(a, b + 1))
+    if not cpus:
+        raise ValueError("empty CPU list")
+    return sorted(cpus)
+
+class CpuBudget:
+    """
+    total_threads    inference threads for the whole server (default: the CPUs we may run on)
+    threads_per_job  intra-op threads of one transcription (CTranslate2 cpu_threads)
+    inter_threads    transcriptions one loaded model runs in parallel (CTranslate2 num_workers)
+    workers          job threads; by default as many as the budget holds at threads_per_job
+    pin              "" (no pinning), "auto" (all allowed CPUs, split between chunk processes)
+                     or a CPU list like "0-7" the inference threads are restricted to
+    0 / "" picks the default for a setting.
+    """
+
+    def __init__(self):
+        self.configure(
+            total_threads=_env_int("GETSUBTITLES_CPU_THREADS", 0),
+            threads_per_job=_env_int("GETSUBTITLES_THREADS_PER_JOB", 0),
+            inter_threads=_env_int("GETSUBTITLES_INTER_THREADS", 0),
+            workers=_env_int("GETSUBTITLES_WORKERS", 0),
+            pin=os.environ.get("GETSUBTITLES_CPU_PIN", ""),
+        )
+
+    def configure(self, total_threads: int = 0, threads_per_job: int = 0, inter_threads: int = 0,
+                  workers: int = 0, pin: str = ""):
+        """Raises ValueError on negative counts or a malformed CPU list."""
+        if min(total_threads, threads_per_job, inter_threads, workers) < 0:
+            raise ValueError("thread and worker counts must be >= 0")
+        pin = (pin or "").strip().lower()
+        cpus = None
+        if pin == "auto":
+            cpus = list(_HOST_CPUS)
+        elif pin:
+            cpus = parse_cpu_list(pin)
+        total = total_threads or len(cpus or _HOST_CPUS)
+        if workers:
+            per_job = threads_per_job or max(1, total // workers)
+        else:
+            per_job = min(threads_per_job or total, total)
+            workers = max(1, total // per_job)
+        self.total_threads = total
+        self.threads_per_job = per_job
+        self.inter_threads = inter_threads or workers
+        self.workers = workers
+        self.pin = pin
+        self.cpus = cpus
+
+    def model_kwargs(self, device: str) -> dict:
+        """WhisperModel keyword arguments for one in-process model."""
+        if device == "cpu":
+            return {"cpu_threads": self.threads_per_job, "num_workers": self.inter_threads}
+        return {"num_workers": self.inter_threads}
+
+    def chunk_threads(self, procs: int) -> int:
+        """cpu_threads for each of `procs` chunk processes sharing one job's share."""
+        return max(1, self.threads_per_job // procs)
+
+    def chunk_cpu_slices(self, procs: int) -> Optional[List[List[int]]]:
+        """Disjoint CPU sets, one per chunk process, when pinning is on."""
+        if not self.cpus:
+            return None
+        size = max(1, len(self.cpus) // procs)
+        return [self.cpus[i * size:(i + 1) * size] or self.cpus for i in range(procs)]
+
+    def pin_current_thread(self):
+        """Restrict the calling thread (and the threads it starts) to the pinned CPUs, or undo it."""
+        if hasattr(os, "sched_setaffinity"):
+            try:
+                os.sched_setaffinity(0, self.cpus or _HOST_CPUS)
+            except OSError as e:
+                print(f"[GETSUBTITLES] CPU pinning failed: {e}")
+
+    def settings(self) -> dict:
+        return {
+            "cpu_count": os.cpu_count(),
+            "total_threads": self.total_threads,
+            "threads_per_job": self.threads_per_job,
+            "inter_threads": self.inter_threads,
+            "workers": self.workers,
+            "pin": self.pin or None,
+            "cpus": self.cpus,
+        }
+
+CPU_BUDGET = CpuBudget()
+
 # ----------------- Model cache -----------------
-_model_cache: Dict[str, WhisperModel] = {}
-_model_meta: Dict[str, dict] = {}
+MODEL_RAM_BUDGET_MB  = _env_int("GETSUBTITLES_MODEL_RAM_MB", 0)     # 0 = no budget
+MODEL_IDLE_UNLOAD_S  = _env_int("GETSUBTITLES_MODEL_IDLE_SEC", 0)   # 0 = keep loaded
 
-def get_model(model_choice: str) -> Tuple[WhisperModel, dict]:
-    key = (model_choice or "fast").lower().strip()
-    if key in _model_cache:
-        return _model_cache[key], _model_meta[key]
+# Rough parameter counts and weight sizes, used to estimate resident memory.
+_MODEL_PARAMS = {"small": 244e6, "medium": 769e6, "large-v2": 1550e6}
+_BYTES_PER_PARAM = {"int8": 1, "int8_float16": 1, "int8_float32": 1, "int8_bfloat16": 1,
+                    "int16": 2, "float16": 2, "bfloat16": 2, "float32": 4}
 
+def _resolve_model(model_choice: str) -> Tuple[str, str, bool]:
+    """Map a profile name to (profile, model id or local path, is_local)."""
+    key = (model_choice or "fast").lower().strip()
     size = "small" if key == "fast" else "medium" if key == "balanced" else "large-v2"
     if key not in ("fast", "balanced", "best"):
         key, size = "balanced", "medium"
-
     local = _local_model_path(key)
-    model_id = str(local) if local else size
+    return key, (str(local) if local else size), bool(local)
 
-    device = _detect_device()
-    candidates = _compute_candidates(key, device)
+# Constructor used for every model load; benchmarks swap in a stand-in via set_model_factory().
+MODEL_FACTORY = WhisperModel
+
+def set_model_factory(factory):
+    global MODEL_FACTORY
+    MODEL_FACTORY = factory
+    MODELS.clear()
 
+# --- Compute types that worked / failed on this host, so later startups skip the failures ---
+COMPUTE_RECORD_PATH = STATE_DIR / "compute_types.json"
+_compute_record_lock = threading.Lock()
+
+def _read_compute_record() -> dict:
+    try:
+        return json.loads(COMPUTE_RECORD_PATH.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+def _record_compute(model_id: str, device: str, ok: Optional[str], failed: List[str]):
+    with _compute_record_lock:
+        record = _read_compute_record()
+        entry = record.setdefault(f"{device}:{Path(model_id).name}", {"ok": None, "failed": []})
+        entry["failed"] = sorted(set(entry["failed"]) | set(failed))
+        if ok:
+            entry["ok"] = ok
+        tmp = COMPUTE_RECORD_PATH.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(record, indent=2), encoding="utf-8")
+        os.replace(tmp, COMPUTE_RECORD_PATH)
+
+def host_compute_candidates(profile: str, model_id: str, device: str) -> List[str]:
+    """_compute_candidates reordered by what this host has already tried."""
+    candidates = _compute_candidates(profile, device)
+    entry = _read_compute_record().get(f"{device}:{Path(model_id).name}")
+    if not entry:
+        return candidates
+    if entry.get("ok") in candidates:
+        return [entry["ok"]] + [c for c in candidates if c != entry["ok"]]
+    untried = [c for c in candidates if c not in entry.get("failed", [])]
+    return untried or candidates
+
+def _load_whisper(model_id: str, device: str, candidates: List[str], **kwargs) -> Tuple[WhisperModel, str]:
+    """Try each compute type in order; returns the model and the compute type that worked."""
     last_err = None
-    for compute in candidates:
+    failed = []
+    for compute in dict.fromkeys(candidates):
         try:
             print(f"[GETSUBTITLES] Loading '{model_id}' device={device} compute_type='{compute}'")
-            model = WhisperModel(model_id, device=device, compute_type=compute)
-            meta = {
-                "model_choice": key,
-                "model_name": model_id,
-                "compute_type": compute,
-                "device": device,
-                "source": "local" if local else "hub",
-            }
-            _model_cache[key] = model
-            _model_meta[key] = meta
-            return model, meta
+            model = MODEL_FACTORY(model_id, device=device, compute_type=compute, **kwargs)
+            _record_compute(model_id, device, compute, failed)
+            METRICS.inc("getsubtitles_model_loads_total", model=Path(model_id).name, compute_type=compute)
+            return model, compute
         except Exception as e:
             print(f"[GETSUBTITLES] Failed compute_type={compute}: {e}")
+            METRICS.inc("getsubtitles_compute_fallbacks_total", model=Path(model_id).name, compute_type=compute)
+            failed.append(compute)
             last_err = e
 
+    _record_compute(model_id, device, None, failed)
     raise RuntimeError(f"Could not load model on {device} with any compute type. Last error: {last_err}")
 
+def _approx_model_bytes(model_id: str, compute: str) -> int:
+    params = _MODEL_PARAMS.get(Path(model_id).name, _MODEL_PARAMS["large-v2"])
+    return int(params * _BYTES_PER_PARAM.get(compute, 4))
+
+class ModelManager:
+    """
+    Resident WhisperModels keyed by profile: LRU eviction under a RAM budget,
+    one load per key at a time (other callers wait for it) and idle unloading.
+    Every get() takes a lease that is handed back with release(); leased entries
+    are never evicted or reaped, so a running job can't lose its model to a reload.
+    Long mode's chunk process pools are entries too (see _get_chunk_pool).
+    """
+
+    def __init__(self, budget_bytes: int, idle_timeout: float):
+        self.budget_bytes = budget_bytes
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()  # oldest use first
+        self._loading: Dict[str, threading.Event] = {}
+        self._reaper: Optional[threading.Thread] = None
+
+    def get(self, model_choice: str) -> Tuple[WhisperModel, dict]:
+        key = _resolve_model(model_choice)[0]
+        return self.acquire(key, lambda: self._load(key))
+
+    @contextmanager
+    def lease(self, model_choice: str):
+        """get() for the duration of a with-block."""
+        model, meta = self.get(model_choice)
+        try:
+            yield model, meta
+        finally:
+            self.release(_resolve_model(model_choice)[0], model)
+
+    def acquire(self, key: str, loader) -> Tuple[object, dict]:
+        """
+        Lease the entry for key. When it isn't resident, loader() builds it:
+        a dict with model, meta, approx_bytes, load_sec and an optional close()
+        called when the entry is evicted or unloaded.
+        """
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry["leases"] += 1
+                    entry["last_used"] = time.time()
+                    self._entries.move_to_end(key)
+                    return entry["model"], entry["meta"]
+                event = self._loading.get(key)
+                if event is None:
+                    event = self._loading[key] = threading.Event()
+                    break
+            event.wait()  # someone else is loading this key; re-check once they finish
+
+        try:
+            entry = loader()
+            now = time.time()
+            entry.update(loaded_at=now, last_used=now, leases=1)
+            entry.setdefault("close", None)
+            with self._lock:
+                self._entries[key] = entry
+            self.make_room(0, keep=key)
+            self._start_reaper()
+            return entry["model"], entry["meta"]
+        finally:
+            with self._lock:
+                self._loading.pop(key, None)
+            event.set()
+
+    def release(self, key: str, model):
+        """Hand back a lease from get()/acquire(); a no-op if the entry was unloaded meanwhile."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry["model"] is not model:
+                return
+            entry["leases"] = max(entry["leases"] - 1, 0)
+            entry["last_used"] = time.time()
+        self.make_room(0, keep=key)  # catch up on evictions skipped while everything was leased
+
+    def _load(self, key: str) -> dict:
+        key, model_id, local = _resolve_model(key)
+        device = _detect_device()
+        candidates = host_compute_candidates(key, model_id, device)
+        self.make_room(_approx_model_bytes(model_id, candidates[0]), keep=key)
+
+        threading_kwargs = CPU_BUDGET.model_kwargs(device)
+        t0 = time.time()
+        model, compute = _load_whisper(model_id, device, candidates, **threading_kwargs)
+        meta = {
+            "model_choice": key,
+            "model_name": model_id,
+            "compute_type": compute,
+            "device": device,
+            "source": "local" if local else "hub",
+            "cpu_threads": threading_kwargs.get("cpu_threads"),
+            "num_workers": threading_kwargs["num_workers"],
+            "cpu_affinity": CPU_BUDGET.cpus if device == "cpu" else None,
+        }
+        return {"model": model, "meta": meta, "load_sec": time.time() - t0,
+                "approx_bytes": _approx_model_bytes(model_id, compute)}
+
+    @staticmethod
+    def _close(dropped: List[Tuple[str, dict]]):
+        for _, entry in dropped:
+            if entry["close"] is not None:
+                entry["close"]()
+
+    def make_room(self, incoming: int, keep: str):
+        if self.budget_bytes <= 0:
+            return
+        dropped = []
+        with self._lock:
+            used = sum(e["approx_bytes"] for e in self._entries.values())
+            for k, e in list(self._entries.items()):
+                if used + incoming <= self.budget_bytes:
+                    break
+                if k == keep or e["leases"]:
+                    continue  # in use by a running job
+                used -= e["approx_bytes"]
+                dropped.append((k, self._entries.pop(k)))
+                print(f"[GETSUBTITLES] Evicted model '{k}' to stay within the RAM budget")
+        self._close(dropped)
+
+    def _start_reaper(self):
+        if self.idle_timeout <= 0 or self._reaper is not None:
+            return
+        self._reaper = threading.Thread(target=self._reap_idle, daemon=True)
+        self._reaper.start()
+
+    def reap_idle(self, now: Optional[float] = None):
+        """Unload entries nobody has leased for idle_timeout seconds."""
+        cutoff = (now or time.time()) - self.idle_timeout
+        dropped = []
+        with self._lock:
+            for k in [k for k, e in self._entries.items() if not e["leases"] and e["last_used"] < cutoff]:
+                dropped.append((k, self._entries.pop(k)))
+                print(f"[GETSUBTITLES] Unloaded idle model '{k}'")
+        self._close(dropped)
+
+    def _reap_idle(self):
+        while True:
+            time.sleep(min(self.idle_timeout, 30))
+            self.reap_idle()
+
+    def meta(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry["meta"] if entry else None
+
+    def unload(self, key: str) -> bool:
+        return self.unload_where(lambda k: k == key) > 0
+
+    def unload_where(self, predicate) -> int:
+        with self._lock:
+            dropped = [(k, self._entries.pop(k)) for k in list(self._entries) if predicate(k)]
+        self._close(dropped)
+        return len(dropped)
+
+    def clear(self):
+        self.unload_where(lambda k: True)
+
+    def resident(self) -> List[dict]:
+        now = time.time()
+        with self._lock:
+            return [
+                dict(e["meta"],
+                     loaded_at=e["loaded_at"],
+                     load_sec=round(e["load_sec"], 2),
+                     idle_sec=round(now - e["last_used"], 1),
+                     approx_mb=round(e["approx_bytes"] / 1e6),
+                     leases=e["leases"])
+                for e in reversed(self._entries.values())  # most recently used first
+            ]
+
+MODELS = ModelManager(MODEL_RAM_BUDGET_MB * 1024 * 1024, MODEL_IDLE_UNLOAD_S)
+
+def get_model(model_choice: str) -> Tuple[WhisperModel, dict]:
+    """Leases the model; hand it back with MODELS.release(meta["model_choice"], model)."""
+    return MODELS.get(model_choice)
+
+# --- Startup preload + warm-up ---
+PRELOAD_MODELS = [p.strip() for p in os.environ.get("GETSUBTITLES_PRELOAD", "").split(",") if p.strip()]
+if ROLE == "api":
+    PRELOAD_MODELS = []  # API replicas never load models
+READINESS = {"ready": not PRELOAD_MODELS, "preload": {p: "pending" for p in PRELOAD_MODELS}}
+
+def warm_up(model: WhisperModel):
+    """One short inference on synthetic audio so the first real job doesn't pay for lazy init."""
+    rng = np.random.default_rng(0)
+    audio = (rng.standard_normal(SAMPLE_RATE) * 0.01).astype(np.float32)
+    segments, _ = model.transcribe(audio, language="en", beam_size=1)
+    for _ in segments:
+        pass
+
+def preload_models(profiles: List[str]):
+    for profile in profiles:
+        READINESS["preload"][profile] = "loading"
+        try:
+            t0 = time.time()
+            with MODELS.lease(profile) as (model, meta):
+                warm_up(model)
+            READINESS["preload"][profile] = f"ready ({meta['compute_type']}, {time.time() - t0:.1f}s)"
+        except Exception as e:
+            READINESS["preload"][profile] = f"failed: {e}"
+            print(f"[GETSUBTITLES] Preload of '{profile}' failed: {e}")
+    READINESS["ready"] = True
+
 
 # ----------------- Utils -----------------
 
@@ -103,27 +593,185 @@ def _ffmpeg_path() -> str:
         return str(cand)
     return shutil.which("ffmpeg") or "ffmpeg"
 
+SAMPLE_RATE = 16000
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # bytes copied per read while saving an upload
+
+def file_sha256(path: Path, chunk_size: int = UPLOAD_CHUNK_SIZE) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def save_upload(src, dst: Path, chunk_size: int = UPLOAD_CHUNK_SIZE) -> Tuple[int, str]:
+    """Copy an upload stream to disk chunk by chunk; returns (bytes written, sha256 hex)."""
+    written = 0
+    digest = hashlib.sha256()
+    with dst.open("wb") as out:
+        while True:
+            chunk = src.read(chunk_size)
+            if not chunk:
+                break
+            out.write(chunk)
+            digest.update(chunk)
+            written += len(chunk)
+    return written, digest.hexdigest()
+
+PCM_MEMORY_LIMIT_MB = _env_int("GETSUBTITLES_PCM_MEMORY_MB", 256)  # ~70 min of audio
+
+def decode_pcm(src: Path, spill_path: Path, memory_limit: int = PCM_MEMORY_LIMIT_MB * 1024 * 1024,
+               feed=None, job_id: Optional[str] = None) -> np.ndarray:
+    """
+    Decode any media to 16 kHz mono float32 by reading ffmpeg's raw PCM from stdout.
+    Short files stay in memory; once `memory_limit` bytes are exceeded the samples are
+    spilled to `spill_path` and returned as a read-only memmap.
+    `feed`, an iterator of byte blocks, is piped to ffmpeg instead of reading `src`.
+    With `job_id`, a cancel of that job kills ffmpeg and raises JobCancelled.
+    """
+    cmd = [_ffmpeg_path(), "-nostdin", "-i", "pipe:0" if feed is not None else str(src), "-vn", "-ac", "1",
+           "-ar", str(SAMPLE_RATE), "-f", "f32le", "-acodec", "pcm_f32le", "-"]
+    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE if feed is not None else None,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    err_tail: List[str] = []
+    def _drain_stderr():
+        for line in proc.stderr:
+            err_tail[:] = (err_tail + [line.decode("utf-8", "replace").strip()])[-5:]
+    err_thread = threading.Thread(target=_drain_stderr, daemon=True)
+    err_thread.start()
+
+    feed_error: List[Exception] = []
+    feed_thread = None
+    if feed is not None:
+        def _feed():
+            try:
+                for block in feed:
+                    proc.stdin.write(block)
+            except BrokenPipeError:
+                pass  # ffmpeg stopped reading; its exit code says why
+            except Exception as e:
+                feed_error.append(e)
+                proc.kill()  # don't let ffmpeg "finish" a truncated input
+            finally:
+                try:
+                    proc.stdin.close()
+                except OSError:
+                    pass
+        feed_thread = threading.Thread(target=_feed, daemon=True)
+        feed_thread.start()
+
+    buf: Optional[bytearray] = bytearray()
+    spill = None
+    last_check = time.time()
+    try:
+        while True:
+            chunk = proc.stdout.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            if spill is None and len(buf) + len(chunk) > memory_limit:
+                spill = spill_path.open("wb")
+                spill.write(buf)
+                buf = None
+            if spill is not None:
+                spill.write(chunk)
+            else:
+                buf += chunk
+            if job_id and time.time() - last_check >= PROGRESS_SAVE_INTERVAL:
+                check_cancelled(job_id)
+                last_check = time.time()
+    except BaseException:
+        proc.kill()  # don't let ffmpeg decode the rest
+        raise
+    finally:
+        if spill is not None:
+            spill.close()
+        rc = proc.wait()
+        err_thread.join(timeout=1.0)
+        if feed_thread is not None:
+            feed_thread.join()
+
+    if feed_error:
+        raise RuntimeError(str(feed_error[0]))
+    if rc != 0:
+        raise RuntimeError(f"ffmpeg could not decode the file: {' '.join(err_tail[-1:]) or rc}")
+    if spill is not None:
+        n = spill_path.stat().st_size // 4
+        return np.memmap(spill_path, dtype=np.float32, mode="r", shape=(n,))
+    return np.frombuffer(buf, dtype=np.float32, count=len(buf) // 4)
+
+def read_pcm_window(pcm_path: Path, start: float, end: float) -> np.ndarray:
+    """Read [start, end) seconds from a raw 16 kHz float32 file written by decode_pcm."""
+    first = max(int(start * SAMPLE_RATE), 0)
+    count = max(int(end * SAMPLE_RATE) - first, 0)
+    return np.fromfile(pcm_path, dtype=np.float32, count=count, offset=first * 4)
+
 def to_wav16k_mono(src: Path, dst: Path):
     cmd = [_ffmpeg_path(), "-y", "-i", str(src), "-ac", "1", "-ar", "16000", str(dst)]
-    subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    except subprocess.CalledProcessError as e:
+        tail = (e.stderr or b"").decode("utf-8", "replace").strip().splitlines()[-1:]
+        raise RuntimeError(f"ffmpeg could not decode the file: {' '.join(tail) or e}") from e
+
+def _fmt_seg_time(t):
+    h = int(t // 3600); t -= h*3600
+    m = int(t // 60);   t -= m*60
+    s = int(t);         ms = int((t - s)*1000)
+    return f"{h:02d}:{m:02d}:{s:02d},{ms:03d}"
 
 def write_srt_from_segments(segments, out_path: Path):
     """Default behavior: one block per model segment (unchanged)."""
-    def fmt(t):
-        h = int(t // 3600); t -= h*3600
-        m = int(t // 60);   t -= m*60
-        s = int(t);         ms = int((t - s)*1000)
-        return f"{h:02d}:{m:02d}:{s:02d},{ms:03d}"
+    fmt = _fmt_seg_time
     with out_path.open("w", encoding="utf-8") as f:
         for i, seg in enumerate(segments, 1):
             f.write(f"{i}\n{fmt(seg.start)} --> {fmt(seg.end)}\n{seg.text.strip()}\n\n")
 
 # ---------- Vertical mode helpers (word-based packer) ----------
-VERT_MAX_CHARS_PER_LINE  = 38
-VERT_MAX_WORDS_PER_BLOCK = 10
-VERT_MAX_DURATION_S      = 2.2
-VERT_MIN_DURATION_S      = 0.7
+class VerticalLayout(NamedTuple):
+    """Limits for one vertical block; chosen per request with the `layout` form field."""
+    max_chars: int = 38        # per line
+    max_words: int = 10
+    max_duration: float = 2.2  # a block is closed once it spans this long
+    min_duration: float = 0.7  # short blocks take more words until they span this long
+    lines: int = 1
+
+VERTICAL_LAYOUTS = {
+    "reels": VerticalLayout(),
+    "compact": VerticalLayout(max_chars=24, max_words=5, max_duration=1.6, min_duration=0.5),
+    "two_lines": VerticalLayout(max_chars=32, max_words=14, max_duration=3.5, min_duration=1.0, lines=2),
+}
+DEFAULT_LAYOUT = VERTICAL_LAYOUTS["reels"]
 PUNCT_BREAK = {".", ",", "!", "?", "…", ":", ";", "—", "–"}
+SENTENCE_END = {".", "!", "?"}
+
+def parse_layout(value) -> VerticalLayout:
+    """
+    A layout is a profile name from VERTICAL_LAYOUTS, or a JSON object / dict that
+    overrides fields of the default, e.g. {"max_chars": 30, "lines": 2}.
+    Raises ValueError for unknown names, fields or out-of-range values.
+    """
+    if value is None or value == "":
+        return DEFAULT_LAYOUT
+    if isinstance(value, str):
+        if not value.lstrip().startswith("{"):
+            if value not in VERTICAL_LAYOUTS:
+                raise ValueError(f"unknown layout '{value}' (choose from {', '.join(VERTICAL_LAYOUTS)})")
+            return VERTICAL_LAYOUTS[value]
+        value = json.loads(value)
+    base = VERTICAL_LAYOUTS.get(value.get("profile"), DEFAULT_LAYOUT) if isinstance(value, dict) else None
+    if base is None:
+        raise ValueError("layout must be a profile name or an object")
+    fields = {k: v for k, v in value.items() if k != "profile"}
+    unknown = set(fields) - set(VerticalLayout._fields)
+    if unknown:
+        raise ValueError(f"unknown layout fields: {', '.join(sorted(unknown))}")
+    try:
+        layout = base._replace(**{k: type(getattr(base, k))(v) for k, v in fields.items()})
+    except TypeError as e:
+        raise ValueError(str(e))
+    if layout.max_chars < 1 or layout.max_words < 1 or layout.lines < 1 or layout.max_duration <= 0 \
+            or layout.min_duration < 0:
+        raise ValueError("layout limits must be positive")
+    return layout
 
 def _fmt_time(seconds: float) -> str:
     h = int(seconds // 3600)
@@ -141,69 +789,123 @@ def _clean_spaces(s: str) -> str:
              .replace(" :", ":")
              .replace(" ;", ";"))
 
-def _should_break(line: str, block_start: float, last_end: float, last_token: str) -> bool:
-    duration = (last_end - block_start) if (last_end is not None and block_start is not None) else 0.0
-    if duration >= VERT_MAX_DURATION_S:
-        return True
-    if len(line) >= VERT_MAX_CHARS_PER_LINE - 3 and last_token and last_token[-1] in PUNCT_BREAK:
-        return True
-    return False
+class WordBuffer:
+    """
+    Words as parallel arrays (start/end times, token lengths, punctuation flags) so
+    the packer runs one pass over numbers instead of rebuilding line strings.
+    """
+    __slots__ = ("texts", "starts", "ends", "lens", "flags")
+    PUNCT = 1     # ends with a character from PUNCT_BREAK
+    SENTENCE = 2  # ends a sentence
 
-def build_vertical_blocks(words: List[dict]) -> List[dict]:
-    """Pack words into short, single-line blocks for reels/shorts."""
-    blocks = []
-    i, n = 0, len(words)
+    def __init__(self):
+        self.texts: List[str] = []
+        self.starts = array("d")
+        self.ends = array("d")
+        self.lens = array("I")
+        self.flags = bytearray()
 
-    while i < n:
-        line = ""
-        block_start = words[i]["start"]
-        block_end   = words[i]["end"]
-        count = 0
-        j = i
+    @classmethod
+    def from_dicts(cls, words: List[dict]) -> "WordBuffer":
+        buf = cls()
+        buf.texts = [w["text"] for w in words]
+        buf.starts = array("d", [w["start"] for w in words])
+        buf.ends = array("d", [w["end"] for w in words])
+        buf.lens = array("I", map(len, buf.texts))
+        buf.flags = bytearray(_WORD_FLAGS.get(t[-1:], 0) for t in buf.texts)
+        return buf
 
-        while j < n:
-            w = words[j]
-            token = w["text"]
-            extra_len = (1 if line else 0) + len(token)
+    def __len__(self) -> int:
+        return len(self.texts)
 
-            if len(line) + extra_len > VERT_MAX_CHARS_PER_LINE and count > 0:
-                break
-            if count >= VERT_MAX_WORDS_PER_BLOCK:
-                break
+    def append(self, text: str, start: float, end: float):
+        self.texts.append(text)
+        self.starts.append(start)
+        self.ends.append(end)
+        self.lens.append(len(text))
+        self.flags.append(_WORD_FLAGS.get(text[-1:], 0))
 
-            line = f"{line} {token}" if line else token
-            block_end = w["end"]
-            count += 1
-            j += 1
+    def pack(self, layout: VerticalLayout = DEFAULT_LAYOUT, first: int = 0,
+             stop: Optional[int] = None) -> List[tuple]:
+        """
+        Greedy single pass with a running line length over the words first:stop.
+        Returns spans (first, stop, start_sec, end_sec, line_breaks) where line_breaks
+        are the word indices that begin a new line inside the block.
+        """
+        # Plain lists index faster than arrays in the hot loop; the copy is a single C call each.
+        starts, ends = self.starts[first:stop].tolist(), self.ends[first:stop].tolist()
+        lens, flags = self.lens[first:stop].tolist(), list(self.flags[first:stop])
+        max_chars, max_words = layout.max_chars, layout.max_words
+        max_dur, min_dur, last_line = layout.max_duration, layout.min_duration, layout.lines - 1
+        PUNCT, SENTENCE = self.PUNCT, self.SENTENCE
+        spans = []
+        i, n = 0, len(lens)
 
-            if _should_break(line, block_start, block_end, token):
-                break
+        while i < n:
+            block_start = starts[i]
+            block_end = ends[i]
+            used = 0  # characters on the current line
+            line = 0
+            breaks = ()
+            j = i
 
-        while j < n:
-            duration = block_end - block_start
-            if duration >= VERT_MIN_DURATION_S:
-                break
-            last_token = words[j-1]["text"] if j-1 >= 0 else ""
-            if last_token and last_token[-1] in {".", "!", "?"}:
-                break
-            next_token = words[j]["text"]
-            extra_len = (1 if line else 0) + len(next_token)
-            if len(line) + extra_len > VERT_MAX_CHARS_PER_LINE:
-                break
-            line = f"{line} {next_token}"
-            block_end = words[j]["end"]
-            count += 1
-            j += 1
+            while j < n:
+                extra = (1 if used else 0) + lens[j]
+                if used + extra > max_chars and j > i:
+                    if line == last_line:
+                        break
+                    line += 1
+                    breaks += (j,)
+                    used, extra = 0, lens[j]
+                if j - i >= max_words:
+                    break
+                used += extra
+                block_end = ends[j]
+                j += 1
+                if block_end - block_start >= max_dur:
+                    break
+                if line == last_line and used >= max_chars - 3 and flags[j - 1] & PUNCT:
+                    break
+
+            # Too short to read: keep adding words unless a sentence just ended.
+            while j < n:
+                if block_end - block_start >= min_dur or flags[j - 1] & SENTENCE:
+                    break
+                extra = (1 if used else 0) + lens[j]
+                if used + extra > max_chars:
+                    if line == last_line:
+                        break
+                    line += 1
+                    breaks += (j,)
+                    used, extra = 0, lens[j]
+                used += extra
+                block_end = ends[j]
+                j += 1
 
-        if line.strip():
-            blocks.append({
-                "start": block_start,
-                "end": block_end,
-                "text": _clean_spaces(line.strip())
-            })
+            spans.append((first + i, first + j, block_start, block_end,
+                          tuple(first + b for b in breaks) if breaks else breaks))
+            i = j if j > i else i + 1
 
-        i = j if j > i else i + 1
+        return spans
 
+    def block_text(self, first: int, stop: int, breaks: tuple = ()) -> str:
+        if not breaks:
+            return _clean_spaces(" ".join(self.texts[first:stop]).strip())
+        bounds = [first, *breaks, stop]
+        lines = (_clean_spaces(" ".join(self.texts[a:b]).strip()) for a, b in zip(bounds, bounds[1:]))
+        return "\n".join(line for line in lines if line)
+
+_WORD_FLAGS = {c: (WordBuffer.PUNCT if c in PUNCT_BREAK else 0) | (WordBuffer.SENTENCE if c in SENTENCE_END else 0)
+               for c in PUNCT_BREAK | SENTENCE_END}
+
+def build_vertical_blocks(words: List[dict], layout: VerticalLayout = DEFAULT_LAYOUT) -> List[dict]:
+    """Pack words into short blocks for reels/shorts."""
+    buf = WordBuffer.from_dicts(words)
+    blocks = []
+    for first, stop, start, end, breaks in buf.pack(layout):
+        text = buf.block_text(first, stop, breaks)
+        if text:
+            blocks.append({"start": start, "end": end, "text": text, "n_words": stop - first})
     return blocks
 
 def write_srt_from_blocks(blocks: List[dict], out_path: Path):
@@ -213,7 +915,150 @@ def write_srt_from_blocks(blocks: List[dict], out_path: Path):
             f.write(f"{_fmt_time(b['start'])} --> {_fmt_time(b['end'])}\n")
             f.write(f"{b['text']}\n\n")
 
+class Transcript:
+    """
+    Segments and words of one job in parallel arrays, filled while the segment
+    generator is consumed and shared by the writers and the result cache. Segment i
+    owns words word_idx[i]:word_idx[i + 1]; word tokens are interned, so repeated
+    words share one string.
+    """
+    __slots__ = ("starts", "ends", "texts", "word_idx", "words")
+
+    def __init__(self):
+        self.starts = array("d")
+        self.ends = array("d")
+        self.texts: List[str] = []
+        self.word_idx = array("I", [0])
+        self.words = WordBuffer()
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def add(self, start: float, end: float, text: str, words=()):
+        """Append a segment; `words` are (token, start, end) tuples."""
+        self.starts.append(start)
+        self.ends.append(end)
+        self.texts.append(text.strip())
+        for token, ws, we in words:
+            token = token.strip()
+            if token and ws is not None and we is not None:
+                self.words.append(sys.intern(token), ws, we)
+        self.word_idx.append(len(self.words))
+
+    def add_segment(self, seg, smap: Optional["SpeechMap"] = None):
+        """Append a faster-whisper Segment (or anything shaped like one); `smap` maps VAD times back."""
+        start, end = float(seg.start), float(seg.end)
+        words = ((w.word or "", w.start, w.end) for w in (getattr(seg, "words", None) or []))
+        if smap is not None:
+            start, end = smap.to_original(start), smap.to_original(end, is_end=True)
+            words = ((t, smap.to_original(ws), smap.to_original(we, is_end=True))
+                     if ws is not None and we is not None else (t, ws, we) for t, ws, we in words)
+        self.add(start, end, seg.text, words)
+
+    def segment_words(self, i: int) -> List[tuple]:
+        w = self.words
+        return [(w.texts[k], w.starts[k], w.ends[k]) for k in range(self.word_idx[i], self.word_idx[i + 1])]
+
+class SubtitleStreamWriter:
+    """
+    Appends SRT cues to `out_path` as segments are added to the transcript, flushing
+    after each one so the partial file can be served while the job runs.
+    - default  -> one cue per segment, written immediately
+    - vertical -> the transcript's words are packed with WordBuffer.pack; every block
+                  except the last is final (the packer is greedy), so only the last
+                  one is held back
+    """
+
+    def __init__(self, out_path: Path, style: str, layout: VerticalLayout = DEFAULT_LAYOUT,
+                 transcript: Optional[Transcript] = None, output: str = "srt"):
+        self.out_path = out_path
+        self.style = style
+        self.layout = layout
+        self.transcript = transcript if transcript is not None else Transcript()
+        self.output = output  # "srt" | "vtt"
+        self.cues = 0
+        self.write_sec = 0.0  # time spent packing/writing, reported as the "write" phase
+        self._next_word = 0  # first word not yet written as part of a block
+        self._f = out_path.open("w", encoding="utf-8")
+        if output == "vtt":
+            self._f.write("WEBVTT\n\n")
+
+    def _write(self, start: float, end: float, text: str, fmt=_fmt_time):
+        self.cues += 1
+        a, b = fmt(start), fmt(end)
+        if self.output == "vtt":
+            a, b = a.replace(",", "."), b.replace(",", ".")
+        self._f.write(f"{self.cues}\n{a} --> {b}\n{text}\n\n")
+
+    def _flush_blocks(self, final: bool, stop: Optional[int] = None):
+        """Write the blocks of the words before `stop` (default: all of them)."""
+        words = self.transcript.words
+        stop = len(words) if stop is None else stop
+        if self.style != "vertical" or self._next_word >= stop:
+            return
+        spans = words.pack(self.layout, self._next_word, stop)
+        keep = spans if final else spans[:-1]
+        for first, stop, start, end, breaks in keep:
+            text = words.block_text(first, stop, breaks)
+            if text:
+                self._write(start, end, text)
+        if keep:
+            self._next_word = keep[-1][1]
+
+    def add(self, seg, smap: Optional["SpeechMap"] = None):
+        """Append a Segment to the transcript and write its cues."""
+        self.transcript.add_segment(seg, smap)
+        self.write_segment(len(self.transcript) - 1)
+
+    def write_segment(self, i: int):
+        """Write the cues for segment i, which is already in the transcript."""
+        t0 = time.perf_counter()
+        t = self.transcript
+        # Only words up to this segment: a finished transcript (re-render) already holds
+        # the later ones, which must not be packed ahead of a wordless segment's cue.
+        if self.style == "vertical" and t.word_idx[i + 1] > t.word_idx[i]:
+            self._flush_blocks(final=False, stop=t.word_idx[i + 1])
+        else:
+            self._flush_blocks(final=True, stop=t.word_idx[i])
+            self._write(t.starts[i], t.ends[i], t.texts[i], fmt=_fmt_seg_time)
+        self._f.flush()
+        self.write_sec += time.perf_counter() - t0
+
+    def close(self):
+        t0 = time.perf_counter()
+        self._flush_blocks(final=True)
+        self._f.close()
+        self.write_sec += time.perf_counter() - t0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def read_new_cues(srt_path: Path, offset: int) -> Tuple[List[dict], int]:
+    """Parse the complete cues appended to an SRT file since byte `offset`."""
+    try:
+        with srt_path.open("rb") as f:
+            f.seek(offset)
+            data = f.read()
+    except OSError:
+        return [], offset
+    end = data.rfind(b"\n\n")
+    if end < 0:
+        return [], offset
+    cues = []
+    for block in data[:end].decode("utf-8").split("\n\n"):
+        lines = block.strip("\n").split("\n")
+        if len(lines) < 3 or " --> " not in lines[1]:
+            continue
+        start, end_ts = lines[1].split(" --> ")
+        cues.append({"index": int(lines[0]), "start": start, "end": end_ts, "text": "\n".join(lines[2:])})
+    return cues, offset + end + 2
+
 # ----------------- Job store -----------------
+FINISHED_STATES = ("done", "error", "cancelled")
+
 class Job:
     def __init__(self, job_id: str, original_name: str, out_dir: Path):
         self.job_id = job_id
@@ -227,181 +1072,2924 @@ class Job:
         self.model_choice: Optional[str] = None
         self.model_name: Optional[str] = None
         self.compute_type: Optional[str] = None
-        self.started_at: float = time.time()
+        self.priority: int = 0
+        self.params: dict = {}  # arguments for run_transcription
+        self.enqueued_at: float = time.time()
+        self.started_at: Optional[float] = None
         self.finished_at: Optional[float] = None
         self.srt_path: Optional[Path] = None
+        self.cache_hit: bool = False
+        self.timings: Dict[str, float] = {}  # seconds per phase: decode, model_load, inference
+        self.batch_id: Optional[str] = None
+        self.rtf_estimate: Optional[float] = None  # expected inference seconds per audio second
+        self.language_probability: Optional[float] = None
+        self.language_source: Optional[str] = None  # "request" | "detected" | "cached" | "model"
+        self.speech_sec: Optional[float] = None  # audio left after the VAD pre-pass (None without VAD)
+        self.inference_started_at: Optional[float] = None
+        self.worker_id: Optional[str] = None  # process running the job (see JobStore.heartbeat)
+        self.transfer: Optional[dict] = None  # chunked uploads: bytes sent vs. the client's original file
+        self.refine: Optional[dict] = None  # speculative mode: refine profile, windows and their revisions
+        self.updated_at: float = self.enqueued_at  # set by JobStore on every add/save
 
-JOBS: Dict[str, Job] = {}
-JOBS_LOCK = threading.Lock()
+    def to_dict(self) -> dict:
+        d = dict(self.__dict__)
+        d["out_dir"] = str(self.out_dir)
+        d["srt_path"] = str(self.srt_path) if self.srt_path else None
+        return d
 
-# ----------------- Routes -----------------
-@app.get("/", response_class=HTMLResponse)
-def index():
-    return "<h2>Get Subtitles — MVP</h2><p>See <a href='/docs'>/docs</a>.</p>"
+    @classmethod
+    def from_dict(cls, d: dict) -> "Job":
+        job = cls(d["job_id"], d.get("original_name"), Path(d["out_dir"]))
+        for k, v in d.items():
+            if k in job.__dict__:
+                setattr(job, k, v)
+        job.out_dir = Path(d["out_dir"])
+        job.srt_path = Path(d["srt_path"]) if d.get("srt_path") else None
+        return job
 
-@app.get("/health")
-def health():
-    return {"status": "ok"}
+class JobStore:
+    """SQLite-backed job table; also serves as the persistent FIFO/priority queue."""
 
-@app.get("/download/{job_id}.srt")
-def download_srt(job_id: str):
-    p = DEFAULT_OUTPUT_DIR / f"{job_id}.srt"
-    if p.exists():
-        return FileResponse(p, media_type="text/plain", filename=f"{job_id}.srt")
-    return JSONResponse({"error": "not found"}, status_code=404)
+    def __init__(self, path: Path):
+        self.path = path
+        self._local = threading.local()
+        self.listeners: List = []  # called with the Job after every add/save
+        with self._conn() as c:
+            c.execute("PRAGMA journal_mode=WAL")
+            c.execute("""CREATE TABLE IF NOT EXISTS jobs (
+                job_id      TEXT PRIMARY KEY,
+                status      TEXT NOT NULL,
+                priority    INTEGER NOT NULL DEFAULT 0,
+                enqueued_at REAL NOT NULL,
+                data        TEXT NOT NULL)""")
+            c.execute("CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority, enqueued_at)")
+            if "updated_at" not in {row[1] for row in c.execute("PRAGMA table_info(jobs)")}:
+                c.execute("ALTER TABLE jobs ADD COLUMN updated_at REAL NOT NULL DEFAULT 0")
+            c.execute("CREATE INDEX IF NOT EXISTS jobs_updated ON jobs (updated_at)")
+            c.execute("""CREATE TABLE IF NOT EXISTS batches (
+                batch_id    TEXT PRIMARY KEY,
+                created_at  REAL NOT NULL,
+                data        TEXT NOT NULL)""")
+            c.execute("""CREATE TABLE IF NOT EXISTS source_languages (
+                source_hash TEXT NOT NULL,
+                detector    TEXT NOT NULL,
+                language    TEXT NOT NULL,
+                probability REAL NOT NULL,
+                detected_at REAL NOT NULL,
+                PRIMARY KEY (source_hash, detector))""")
+            c.execute("""CREATE TABLE IF NOT EXISTS workers (
+                worker_id    TEXT PRIMARY KEY,
+                host         TEXT NOT NULL,
+                pid          INTEGER NOT NULL,
+                role         TEXT NOT NULL,
+                started_at   REAL NOT NULL,
+                heartbeat_at REAL NOT NULL,
+                report       TEXT)""")
+            if "report" not in {row[1] for row in c.execute("PRAGMA table_info(workers)")}:
+                c.execute("ALTER TABLE workers ADD COLUMN report TEXT")  # stores created before reports
+            c.execute("""CREATE TABLE IF NOT EXISTS uploads (
+                upload_id   TEXT PRIMARY KEY,
+                sha256      TEXT,
+                status      TEXT NOT NULL,
+                updated_at  REAL NOT NULL,
+                data        TEXT NOT NULL)""")
+            c.execute("CREATE INDEX IF NOT EXISTS uploads_sha256 ON uploads (sha256)")
+            c.execute("""CREATE TABLE IF NOT EXISTS upload_chunks (
+                upload_id   TEXT NOT NULL,
+                idx         INTEGER NOT NULL,
+                sha256      TEXT NOT NULL,
+                PRIMARY KEY (upload_id, idx))""")
+            c.execute("""CREATE TABLE IF NOT EXISTS cancellations (
+                job_id       TEXT PRIMARY KEY,
+                requested_at REAL NOT NULL)""")
+            c.execute("""CREATE TABLE IF NOT EXISTS leases (
+                name        TEXT PRIMARY KEY,
+                holder      TEXT NOT NULL,
+                expires_at  REAL NOT NULL)""")
 
-@app.post("/models/clear_cache")
-def clear_cache():
-    _model_cache.clear()
-    _model_meta.clear()
-    return {"cleared": True}
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
 
-# --- Graceful shutdown endpoint ---
-@app.post("/shutdown")
-def shutdown():
-    """
-    Immediately terminates the FastAPI process.
-    Called from the Streamlit 'Close app' button.
-    """
-    import threading, os, time
-    def _exit():
-        time.sleep(0.1)
-        os._exit(0)
-    threading.Thread(target=_exit, daemon=True).start()
-    return {"ok": True}
+    def add(self, job: Job):
+        self._insert(self._conn(), job)
+        self._notify(job)
 
-# --------- Background worker ----------
-def run_transcription(job_id: str,
-                      wav_path: Path,
-                      language: Optional[str],
-                      task: str,
-                      model_choice: str,
-                      out_dir: Path,
-                      style: str):
-    """
-    style: "default" | "vertical"
-    - default  -> segment-based SRT (unchanged)
-    - vertical -> word-timestamp packing for reels/shorts
-    """
-    job = JOBS[job_id]
-    try:
-        job.status = "loading_model"
-        
-        model, meta = get_model(model_choice)
-        job.model_choice = meta["model_choice"]
-        job.model_name = meta["model_name"]
-        job.compute_type = meta["compute_type"]
+    @staticmethod
+    def _insert(conn: sqlite3.Connection, job: Job):
+        job.updated_at = time.time()
+        conn.execute(
+            "INSERT INTO jobs (job_id, status, priority, enqueued_at, updated_at, data) VALUES (?, ?, ?, ?, ?, ?)",
+            (job.job_id, job.status, job.priority, job.enqueued_at, job.updated_at, json.dumps(job.to_dict())),
+        )
 
-        use_word_ts = (style == "vertical")
-        segments, info = model.transcribe(
-            str(wav_path),
-            task=task,
-            language=language,
-            word_timestamps=use_word_ts
+    def save(self, job: Job):
+        job.updated_at = time.time()
+        self._conn().execute(
+            "UPDATE jobs SET status = ?, priority = ?, updated_at = ?, data = ? WHERE job_id = ?",
+            (job.status, job.priority, job.updated_at, json.dumps(job.to_dict()), job.job_id),
         )
+        self._notify(job)
 
-        job.language = info.language
-        job.duration = float(info.duration or 0.0)
-        job.status = "running"
+    def updated_since(self, since: float, limit: int = 500) -> List[Job]:
+        """Jobs added or saved by any process after `since`, oldest change first."""
+        rows = self._conn().execute(
+            "SELECT data FROM jobs WHERE updated_at > ? ORDER BY updated_at LIMIT ?", (since, limit)
+        ).fetchall()
+        return [Job.from_dict(json.loads(r[0])) for r in rows]
 
-        # Progress based on last end time vs duration
-        seg_list = []
-        last_end = 0.0
-        for seg in segments:
-            seg_list.append(seg)
-            last_end = max(last_end, float(getattr(seg, "end", 0.0) or 0.0))
-            if job.duration > 0:
-                job.progress = min(last_end / job.duration, 0.999)
+    def _notify(self, job: Job):
+        for listener in self.listeners:
+            try:
+                listener(job)
+            except Exception as e:
+                print(f"[GETSUBTITLES] Job listener failed: {e}")
 
-        # Write SRT
-        srt_path = out_dir / f"{job_id}.srt"
+    def get(self, job_id: str) -> Optional[Job]:
+        row = self._conn().execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return Job.from_dict(json.loads(row[0])) if row else None
 
-        if style == "vertical":
-            # Build word list
-            words = []
-            for seg in seg_list:
-                if getattr(seg, "words", None):
-                    for w in seg.words:
-                        token = (w.word or "").strip()
-                        if not token:
-                            continue
-                        if w.start is None or w.end is None:
-                            continue
-                        words.append({"text": token, "start": float(w.start), "end": float(w.end)})
-
-            if words:
-                blocks = build_vertical_blocks(words)
-                write_srt_from_blocks(blocks, srt_path)
+    def get_many(self, job_ids: List[str]) -> List[Job]:
+        rows = []
+        for i in range(0, len(job_ids), 500):  # stay under SQLite's parameter limit
+            part = job_ids[i:i + 500]
+            rows += self._conn().execute(
+                f"SELECT data FROM jobs WHERE job_id IN ({','.join('?' for _ in part)})", part
+            ).fetchall()
+        order = {job_id: i for i, job_id in enumerate(job_ids)}
+        jobs = [Job.from_dict(json.loads(r[0])) for r in rows]
+        return sorted(jobs, key=lambda j: order[j.job_id])
+
+    def add_batch(self, batch_id: str, data: dict, jobs: List[Job] = ()):
+        """The batch row and its jobs in one transaction, so no job is ever seen without its batch."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT INTO batches (batch_id, created_at, data) VALUES (?, ?, ?)",
+                (batch_id, data["created_at"], json.dumps(data)),
+            )
+            for job in jobs:
+                self._insert(conn, job)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        for job in jobs:
+            self._notify(job)
+
+    def get_batch(self, batch_id: str) -> Optional[dict]:
+        row = self._conn().execute("SELECT data FROM batches WHERE batch_id = ?", (batch_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_source_language(self, source_hash: str, detector: str) -> Optional[Tuple[str, float]]:
+        row = self._conn().execute(
+            "SELECT language, probability FROM source_languages WHERE source_hash = ? AND detector = ?",
+            (source_hash, detector),
+        ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def put_source_language(self, source_hash: str, detector: str, language: str, probability: float):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO source_languages VALUES (?, ?, ?, ?, ?)",
+            (source_hash, detector, language, probability, time.time()),
+        )
+
+    def claim_next(self, worker_id: Optional[str] = None) -> Optional[Job]:
+        """Atomically take the highest-priority, oldest queued job."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT data FROM jobs WHERE status = 'queued' "
+                "ORDER BY priority DESC, enqueued_at, rowid LIMIT 1"
+            ).fetchone()
+            if not row:
+                conn.execute("COMMIT")
+                return None
+            job = Job.from_dict(json.loads(row[0]))
+            job.status = "starting"
+            job.worker_id = worker_id
+            job.started_at = time.time()
+            job.timings["queue_wait"] = job.started_at - job.enqueued_at
+            self.save(job)
+            conn.execute("COMMIT")
+            return job
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def queue_position(self, job: Job) -> int:
+        """1-based position among queued jobs, 0 if the job is not queued."""
+        if job.status != "queued":
+            return 0
+        (ahead,) = self._conn().execute(
+            "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND "
+            "(priority > ? OR (priority = ? AND enqueued_at < ?))",
+            (job.priority, job.priority, job.enqueued_at),
+        ).fetchone()
+        return ahead + 1
+
+    def queue_depth(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+
+    def in_progress(self) -> int:
+        placeholders = ",".join("?" for _ in FINISHED_STATES)
+        return self._conn().execute(
+            f"SELECT COUNT(*) FROM jobs WHERE status != 'queued' AND status NOT IN ({placeholders})",
+            FINISHED_STATES,
+        ).fetchone()[0]
+
+    def request_cancel(self, job_id: str) -> Optional[Job]:
+        """
+        Cancel a queued job at once; a running job is flagged and stops at its next
+        check (see check_cancelled). Finished jobs are returned unchanged.
+        """
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            job = self.get(job_id)
+            if job is None or job.status in FINISHED_STATES:
+                conn.execute("COMMIT")
+                return job
+            if job.status == "queued":
+                job.status, job.finished_at = "cancelled", time.time()
+                self.save(job)
             else:
-                write_srt_from_segments(seg_list, srt_path)
-        else:
-            write_srt_from_segments(seg_list, srt_path)
+                conn.execute("INSERT OR IGNORE INTO cancellations (job_id, requested_at) VALUES (?, ?)",
+                             (job_id, time.time()))
+            conn.execute("COMMIT")
+            return job
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
 
-        job.srt_path = srt_path
-        job.progress = 1.0
-        job.status = "done"
-        job.finished_at = time.time()
+    def cancel_requested(self, job_id: str) -> bool:
+        return self._conn().execute(
+            "SELECT 1 FROM cancellations WHERE job_id = ?", (job_id,)
+        ).fetchone() is not None
 
-    except Exception as e:
-        job.status = "error"
-        job.error_msg = str(e)
-        job.finished_at = time.time()
+    def status_counts(self) -> Dict[str, int]:
+        return dict(self._conn().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
 
-# ---------- Async start + progress ----------
-@app.post("/transcribe_start")
-async def transcribe_start(
-    background_tasks: BackgroundTasks,
-    file: UploadFile = File(...),
-    language: str = Form("auto"),
-    task: str = Form("transcribe"),
-    model_choice: str = Form("fast"),
-    output_dir: str = Form(None),
-    style: str = Form("default"),
-):
-    job_id = str(uuid4())[:8]
+    def expired_jobs(self, before: float) -> List[Job]:
+        """Finished jobs that finished before `before`."""
+        placeholders = ",".join("?" for _ in FINISHED_STATES)
+        rows = self._conn().execute(
+            f"SELECT data FROM jobs WHERE status IN ({placeholders}) AND enqueued_at < ?",
+            (*FINISHED_STATES, before),
+        ).fetchall()
+        jobs = [Job.from_dict(json.loads(data)) for (data,) in rows]
+        return [j for j in jobs if (j.finished_at or j.enqueued_at) < before]
 
-    src_path = UPLOAD_DIR / f"{job_id}_{file.filename}"
-    src_path.write_bytes(await file.read())
+    def delete_jobs(self, job_ids: List[str]):
+        conn = self._conn()
+        for i in range(0, len(job_ids), 500):
+            part = job_ids[i:i + 500]
+            marks = ",".join("?" for _ in part)
+            conn.execute(f"DELETE FROM jobs WHERE job_id IN ({marks})", part)
+            conn.execute(f"DELETE FROM cancellations WHERE job_id IN ({marks})", part)
 
-    out_dir = Path(output_dir).expanduser() if output_dir else DEFAULT_OUTPUT_DIR
-    out_dir.mkdir(parents=True, exist_ok=True)
+    def prune_batches(self, before: float) -> int:
+        """Delete batches created before `before` none of whose jobs are left."""
+        conn = self._conn()
+        n = 0
+        for batch_id, data in conn.execute(
+            "SELECT batch_id, data FROM batches WHERE created_at < ?", (before,)
+        ).fetchall():
+            if not self.get_many(json.loads(data)["job_ids"]):
+                conn.execute("DELETE FROM batches WHERE batch_id = ?", (batch_id,))
+                n += 1
+        return n
 
-    wav_path = UPLOAD_DIR / f"{job_id}.wav"
-    to_wav16k_mono(src_path, wav_path)
+    def add_upload(self, up: dict):
+        self._conn().execute(
+            "INSERT INTO uploads (upload_id, sha256, status, updated_at, data) VALUES (?, ?, ?, ?, ?)",
+            (up["upload_id"], up.get("sha256"), up["status"], up["updated_at"], json.dumps(up)),
+        )
 
-    with JOBS_LOCK:
-        JOBS[job_id] = Job(job_id, file.filename, out_dir)
+    def save_upload(self, up: dict):
+        self._conn().execute(
+            "UPDATE uploads SET sha256 = ?, status = ?, updated_at = ?, data = ? WHERE upload_id = ?",
+            (up.get("sha256"), up["status"], up["updated_at"], json.dumps(up), up["upload_id"]),
+        )
 
-    lang = None if language == "auto" else language
-    background_tasks.add_task(
-        run_transcription, job_id, wav_path, lang, task, model_choice, out_dir, style
-    )
+    def get_upload(self, upload_id: str) -> Optional[dict]:
+        row = self._conn().execute("SELECT data FROM uploads WHERE upload_id = ?", (upload_id,)).fetchone()
+        return json.loads(row[0]) if row else None
 
-    return {"job_id": job_id, "original_filename": file.filename}
+    def find_upload(self, sha256: str) -> Optional[dict]:
+        """A finished upload with this content whose file is still on disk."""
+        rows = self._conn().execute(
+            "SELECT data FROM uploads WHERE sha256 = ? AND status = 'complete' ORDER BY updated_at DESC",
+            (sha256,),
+        ).fetchall()
+        for (data,) in rows:
+            up = json.loads(data)
+            if Path(up["path"]).exists():
+                return up
+        return None
 
-@app.get("/progress/{job_id}")
-def progress(job_id: str):
-    job = JOBS.get(job_id)
-    if not job:
-        return JSONResponse({"error": "unknown job"}, status_code=404)
+    def save_upload_unless_chunks(self, up: dict) -> bool:
+        """Save `up` unless chunks arrived for it meanwhile; a dedup proof must not race them."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("SELECT 1 FROM upload_chunks WHERE upload_id = ? LIMIT 1",
+                            (up["upload_id"],)).fetchone():
+                conn.execute("ROLLBACK")
+                return False
+            self.save_upload(up)
+            conn.execute("COMMIT")
+            return True
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
 
-    eta_sec = None
-    if job.status == "running" and job.progress and job.started_at:
-        elapsed = time.time() - job.started_at
-        if job.progress > 0:
-            eta_sec = max(elapsed * (1.0 - job.progress) / job.progress, 0.0)
+    def touch_upload(self, upload_id: str):
+        self._conn().execute("UPDATE uploads SET updated_at = ? WHERE upload_id = ?", (time.time(), upload_id))
 
-    resp = {
-        "status": job.status,
-        "progress": round(job.progress, 4),
-        "eta_sec": None if eta_sec is None else round(eta_sec, 1),
-        "language": job.language,
-        "model_choice": job.model_choice,
-        "model_name": job.model_name,
-        "compute_type": job.compute_type,
-        "duration_sec": round(job.duration, 2) if job.duration else None,
-        "srt_path": str(job.srt_path) if job.srt_path else None,
-        "srt_url": f"/download/{job.job_id}.srt" if job.srt_path and job.out_dir == DEFAULT_OUTPUT_DIR else "/download/disabled_for_custom_dir",
-        "error": job.error_msg,
-    }
-    return resp
+    def stale_uploads(self, before: float) -> List[dict]:
+        rows = self._conn().execute("SELECT data FROM uploads WHERE updated_at < ?", (before,)).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def delete_upload(self, upload_id: str):
+        conn = self._conn()
+        conn.execute("DELETE FROM upload_chunks WHERE upload_id = ?", (upload_id,))
+        conn.execute("DELETE FROM uploads WHERE upload_id = ?", (upload_id,))
+
+    def put_chunk(self, upload_id: str, idx: int, sha256: str):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO upload_chunks (upload_id, idx, sha256) VALUES (?, ?, ?)",
+            (upload_id, idx, sha256),
+        )
+
+    def upload_paths(self) -> set:
+        return {json.loads(data)["path"] for (data,) in self._conn().execute("SELECT data FROM uploads")}
+
+    def upload_chunks(self, upload_id: str) -> Dict[int, str]:
+        rows = self._conn().execute(
+            "SELECT idx, sha256 FROM upload_chunks WHERE upload_id = ?", (upload_id,)
+        ).fetchall()
+        return dict(rows)
+
+    def unfinished(self) -> List[Job]:
+        """Every job that is queued or running."""
+        placeholders = ",".join("?" for _ in FINISHED_STATES)
+        rows = self._conn().execute(
+            f"SELECT data FROM jobs WHERE status NOT IN ({placeholders})", FINISHED_STATES
+        ).fetchall()
+        return [Job.from_dict(json.loads(data)) for (data,) in rows]
+
+    def unfinished_sources(self) -> set:
+        """src_path of every job that is queued or running."""
+        return {job.params.get("src_path") for job in self.unfinished()}
+
+    def heartbeat(self, worker_id: str, role: str, report: Optional[dict] = None):
+        """`report`: what this process publishes for the API replicas (see process_report)."""
+        now = time.time()
+        self._conn().execute(
+            "INSERT INTO workers (worker_id, host, pid, role, started_at, heartbeat_at, report) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(worker_id) DO UPDATE SET heartbeat_at = excluded.heartbeat_at, report = excluded.report",
+            (worker_id, socket.gethostname(), os.getpid(), role, now, now,
+             json.dumps(report) if report is not None else None),
+        )
+
+    def worker_reports(self) -> Dict[str, dict]:
+        """Latest report of every other live process, by worker id."""
+        now = time.time()
+        rows = self._conn().execute(
+            "SELECT worker_id, host, pid, heartbeat_at, report FROM workers WHERE report IS NOT NULL"
+        ).fetchall()
+        return {wid: json.loads(report) for wid, host, pid, beat, report in rows
+                if wid != WORKER_ID and _worker_alive(wid, host, pid, beat, now)}
+
+    def remove_worker(self, worker_id: str):
+        conn = self._conn()
+        conn.execute("DELETE FROM workers WHERE worker_id = ?", (worker_id,))
+        conn.execute("DELETE FROM leases WHERE holder = ?", (worker_id,))
+
+    def take_lease(self, name: str, holder: str, ttl: float) -> bool:
+        """Hold (or renew) the named lease for `ttl` seconds unless another holder's is still valid."""
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT holder, expires_at FROM leases WHERE name = ?", (name,)).fetchone()
+            ok = row is None or row[0] == holder or row[1] < now
+            if ok:
+                conn.execute("INSERT OR REPLACE INTO leases (name, holder, expires_at) VALUES (?, ?, ?)",
+                             (name, holder, now + ttl))
+            conn.execute("COMMIT")
+            return ok
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _in_flight(self, conn: sqlite3.Connection) -> List[Job]:
+        placeholders = ",".join("?" for _ in FINISHED_STATES)
+        rows = conn.execute(
+            f"SELECT data FROM jobs WHERE status != 'queued' AND status NOT IN ({placeholders})",
+            FINISHED_STATES,
+        ).fetchall()
+        return [Job.from_dict(json.loads(data)) for (data,) in rows]
+
+    def workers(self) -> List[dict]:
+        conn = self._conn()
+        now = time.time()
+        running: Dict[str, List[str]] = {}
+        for job in self._in_flight(conn):
+            running.setdefault(job.worker_id, []).append(job.job_id)
+        rows = conn.execute(
+            "SELECT worker_id, host, pid, role, started_at, heartbeat_at FROM workers ORDER BY started_at"
+        ).fetchall()
+        return [
+            {"worker_id": wid, "host": host, "pid": pid, "role": role, "started_at": started,
+             "heartbeat_age_sec": round(now - beat, 1), "alive": _worker_alive(wid, host, pid, beat, now),
+             "jobs": running.get(wid, [])}
+            for wid, host, pid, role, started, beat in rows
+        ]
+
+    def requeue_orphans(self) -> int:
+        """
+        Requeue jobs whose worker stopped heartbeating (crash, restart, scale-down);
+        jobs whose upload is gone fail instead.
+        """
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            live = {
+                wid for wid, host, pid, beat in conn.execute("SELECT worker_id, host, pid, heartbeat_at FROM workers")
+                if _worker_alive(wid, host, pid, beat, now)
+            }
+            n = 0
+            for job in self._in_flight(conn):
+                if job.worker_id in live:
+                    continue
+                src = job.params.get("src_path")
+                if self.cancel_requested(job.job_id):
+                    job.status, job.finished_at = "cancelled", time.time()
+                elif src and Path(src).exists():
+                    job.status, job.progress, job.started_at, job.worker_id = "queued", 0.0, None, None
+                else:
+                    job.status, job.error_msg = "error", "Interrupted: its worker stopped and the upload is gone."
+                    job.finished_at = time.time()
+                self.save(job)
+                n += 1
+            conn.execute("DELETE FROM workers WHERE heartbeat_at < ?", (now - 10 * HEARTBEAT_TIMEOUT,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return n
+
+# --- Workers: processes that run jobs heartbeat; in-flight jobs of silent workers are requeued ---
+HEARTBEAT_SEC     = _env_int("GETSUBTITLES_HEARTBEAT_SEC", 5)
+HEARTBEAT_TIMEOUT = _env_int("GETSUBTITLES_HEARTBEAT_TIMEOUT", 60)
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:6]}"
+
+def _pid_running(pid: int) -> bool:
+    if os.name == "nt":
+        return True  # os.kill would terminate it; rely on the heartbeat timeout
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass  # exists but belongs to someone else
+    return True
+
+def _worker_alive(worker_id: str, host: str, pid: int, heartbeat_at: float, now: float) -> bool:
+    if worker_id == WORKER_ID:
+        return True
+    if now - heartbeat_at > HEARTBEAT_TIMEOUT:
+        return False
+    if host == socket.gethostname():
+        # Same machine: a restarted process is noticed at once instead of after the timeout.
+        return pid != os.getpid() and _pid_running(pid)
+    return True
+
+JOB_STORE = JobStore(STATE_DIR / "jobs.sqlite3")
+
+class JobScheduler:
+    """Pool of worker threads pulling jobs from the JobStore queue, resizable at runtime."""
+
+    def __init__(self, store: JobStore, workers: int):
+        self.store = store
+        self.workers = workers
+        self._wake = threading.Condition()
+        self._threads: Dict[int, threading.Thread] = {}
+
+    def start(self):
+        if self._threads:
+            return
+        self.resize(self.workers)
+
+    def resize(self, workers: int):
+        """Start missing workers; workers above the new count exit after their current job."""
+        with self._wake:
+            self.workers = workers
+            for i in range(workers):
+                t = self._threads.get(i)
+                if t is None or not t.is_alive():
+                    t = threading.Thread(target=self._loop, args=(i,), name=f"getsubtitles-worker-{i}",
+                                         daemon=True)
+                    t.start()
+                    self._threads[i] = t
+            self._wake.notify_all()
+
+    def alive(self) -> int:
+        return sum(t.is_alive() for t in self._threads.values())
+
+    def submit(self, job: Job):
+        self.store.add(job)
+        self.wake()
+
+    def wake(self, n: int = 1):
+        """Tell idle workers that jobs were queued directly in the store."""
+        with self._wake:
+            self._wake.notify(n)
+
+    def _loop(self, index: int):
+        while True:
+            if index >= self.workers:
+                return
+            CPU_BUDGET.pin_current_thread()
+            job = self.store.claim_next(WORKER_ID)
+            if job is None:
+                with self._wake:
+                    self._wake.wait(timeout=2.0)
+                continue
+            try:
+                run_job(job)
+            except Exception as e:  # a failure outside run_transcription's own handling
+                print(f"[GETSUBTITLES] Job {job.job_id} failed: {e!r}")
+                self._fail(job.job_id, str(e))
+
+    def _fail(self, job_id: str, error: str):
+        """Mark a job that escaped its own error handling as failed, so it is not left running."""
+        try:
+            job = self.store.get(job_id)
+            if job is not None and job.status not in FINISHED_STATES:
+                job.status, job.error_msg, job.finished_at = "error", error, time.time()
+                self.store.save(job)
+        except Exception as e:
+            print(f"[GETSUBTITLES] Could not mark job {job_id} as failed: {e!r}")
+
+SCHEDULER = JobScheduler(JOB_STORE, CPU_BUDGET.workers)
+
+METRICS.gauge("getsubtitles_queue_depth", JOB_STORE.queue_depth)
+METRICS.gauge("getsubtitles_jobs_in_progress", JOB_STORE.in_progress)
+METRICS.gauge("getsubtitles_models_resident", lambda: len(MODELS.resident()), per_process=True)
+METRICS.gauge("getsubtitles_models_resident_bytes",
+              lambda: sum(m["approx_mb"] for m in MODELS.resident()) * 1_000_000, per_process=True)
+
+METRICS.describe("getsubtitles_workers_alive", "gauge", "Processes heartbeating into the job store.")
+METRICS.gauge("getsubtitles_workers_alive", lambda: sum(w["alive"] for w in JOB_STORE.workers()))
+
+def process_report() -> dict:
+    """Metrics, resident models and cache counters of this process, published with each heartbeat."""
+    return {"metrics": METRICS.snapshot(), "models": MODELS.resident(), "cache": RESULT_CACHE.counters()}
+
+def _cluster_round(role: Optional[str], maintenance: bool = True):
+    if role:
+        JOB_STORE.heartbeat(WORKER_ID, role, process_report())
+    if not maintenance:
+        return
+    n = JOB_STORE.requeue_orphans()
+    if n:
+        print(f"[GETSUBTITLES] Recovered {n} job(s) from stopped workers")
+    JANITOR.run()
+
+def _cluster_loop(role: Optional[str], maintenance: bool):
+    while True:
+        time.sleep(HEARTBEAT_SEC)
+        try:
+            _cluster_round(role, maintenance)
+        except Exception as e:
+            print(f"[GETSUBTITLES] Heartbeat failed: {e}")
+
+def start_cluster(role: Optional[str], maintenance: bool = True):
+    """
+    Heartbeat as `role` (None: this process runs no jobs) and requeue jobs of stopped workers.
+    maintenance=False (the bulk CLI) only heartbeats: no requeueing and no janitor lease.
+    """
+    _cluster_round(role, maintenance)
+    threading.Thread(target=_cluster_loop, args=(role, maintenance), name="getsubtitles-heartbeat",
+                     daemon=True).start()
+
+def start_services():
+    """Startup of the API process (per ROLE) and of worker_entry.py."""
+    runs_jobs = ROLE != "api"
+    if runs_jobs:
+        CPU_BUDGET.pin_current_thread()
+        print(f"[GETSUBTITLES] CPU budget: {CPU_BUDGET.settings()}")
+    start_cluster(ROLE if runs_jobs else None)
+    if runs_jobs:
+        SCHEDULER.start()
+        threading.Thread(target=preload_models, args=(PRELOAD_MODELS,), daemon=True).start()
+    print(f"[GETSUBTITLES] Started as role={ROLE} worker_id={WORKER_ID}")
+
+@app.on_event("startup")
+def _start_scheduler():
+    start_services()
+
+# ----------------- Result cache -----------------
+CACHE_MAX_MB = _env_int("GETSUBTITLES_CACHE_MB", 512)  # 0 disables the cache
+
+class ResultCache:
+    """
+    Content-addressed store of raw transcription results (segments + word timestamps),
+    keyed by the source hash and the settings that change the model output.
+    Entries are gzip'd JSON files; mtime doubles as the LRU clock.
+    """
+
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.stores = self.evictions = 0
+
+    @staticmethod
+    def make_key(source_hash: str, model_choice: str, task: str,
+                 language: Optional[str], compute_type: str, vad: Optional[dict] = None) -> str:
+        parts = [source_hash, model_choice, task, language or "auto", compute_type]
+        if vad:
+            parts.append(vad)
+        raw = json.dumps(parts, sort_keys=True)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.root / f"{key}.json.gz"
+
+    def contains(self, key: str) -> bool:
+        return self.max_bytes > 0 and self._path(key).exists()
+
+    def get(self, key: str, need_words: bool = False) -> Optional[dict]:
+        if self.max_bytes <= 0:
+            return None
+        p = self._path(key)
+        try:
+            with gzip.open(p, "rt", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            entry = None
+        if entry is None or (need_words and not entry.get("has_words")):
+            with self._lock:
+                self.misses += 1
+            METRICS.inc("getsubtitles_cache_lookups_total", result="miss")
+            return None
+        os.utime(p)  # mark as recently used
+        with self._lock:
+            self.hits += 1
+        METRICS.inc("getsubtitles_cache_lookups_total", result="hit")
+        return entry
+
+    def put(self, key: str, entry: dict):
+        if self.max_bytes <= 0:
+            return
+        tmp = self._path(key).with_suffix(".tmp")
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            json.dump(entry, f, separators=(",", ":"))
+        os.replace(tmp, self._path(key))
+        with self._lock:
+            self.stores += 1
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            files = []
+            for p in self.root.glob("*.json.gz"):
+                try:
+                    st = p.stat()
+                except OSError:
+                    continue
+                files.append((st.st_mtime, st.st_size, p))
+            total = sum(size for _, size, _ in files)
+            for _, size, p in sorted(files):
+                if total <= self.max_bytes:
+                    break
+                p.unlink(missing_ok=True)
+                total -= size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            for p in self.root.glob("*.json.gz"):
+                p.unlink(missing_ok=True)
+
+    def counters(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "stores": self.stores, "evictions": self.evictions}
+
+    def stats(self, others: Optional[List[dict]] = None) -> dict:
+        """`others`: counters() of other processes sharing this cache folder."""
+        sizes = [p.stat().st_size for p in self.root.glob("*.json.gz")]
+        totals = self.counters()
+        for other in others or []:
+            for k in totals:
+                totals[k] += other.get(k, 0)
+        lookups = totals["hits"] + totals["misses"]
+        return {
+            "entries": len(sizes),
+            "size_mb": round(sum(sizes) / 1e6, 2),
+            "max_mb": round(self.max_bytes / 1e6, 2),
+            "hits": totals["hits"],
+            "misses": totals["misses"],
+            "hit_rate": round(totals["hits"] / lookups, 3) if lookups else None,
+            "stores": totals["stores"],
+            "evictions": totals["evictions"],
+        }
+
+RESULT_CACHE = ResultCache(STATE_DIR / "cache", CACHE_MAX_MB * 1024 * 1024)
+
+def segments_to_cache(transcript: Transcript) -> list:
+    return [
+        [transcript.starts[i], transcript.ends[i], transcript.texts[i], transcript.segment_words(i)]
+        for i in range(len(transcript))
+    ]
+
+def segments_from_cache(rows: list) -> Transcript:
+    transcript = Transcript()
+    for s0, e0, text, words in rows:
+        transcript.add(s0, e0, text, words)
+    return transcript
+
+def _expected_compute_type(model_choice: str) -> str:
+    """Compute type a job for this profile will run with (used in the cache key before loading)."""
+    key = _resolve_model(model_choice)[0]
+    meta = MODELS.meta(key)
+    if meta:
+        return meta["compute_type"]
+    _, model_id, _ = _resolve_model(key)
+    return host_compute_candidates(key, model_id, _detect_device())[0]
+
+def result_cache_key(job: Job) -> Optional[str]:
+    p = job.params
+    if not p.get("source_hash"):
+        return None
+    key = _resolve_model(p.get("refine") or p["model_choice"])[0]  # refine jobs end with the refine profile
+    return ResultCache.make_key(p["source_hash"], key, p["task"], p.get("language"),
+                                _expected_compute_type(key), p.get("vad"))
+
+# ----------------- Output formats -----------------
+TRANSCRIPT_DIR = STATE_DIR / "transcripts"  # one gzip'd transcript per finished job
+RENDER_DIR = STATE_DIR / "renders"          # rendered downloads, one file per job and format
+TRANSCRIPT_DIR.mkdir(parents=True, exist_ok=True)
+RENDER_DIR.mkdir(parents=True, exist_ok=True)
+
+def save_transcript(job: Job, transcript: Transcript):
+    data = {
+        "language": job.language,
+        "duration": job.duration,
+        "segments": segments_to_cache(transcript),
+    }
+    tmp = TRANSCRIPT_DIR / f"{job.job_id}.{os.getpid()}.tmp"
+    with gzip.open(tmp, "wt", encoding="utf-8") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(tmp, TRANSCRIPT_DIR / f"{job.job_id}.json.gz")
+
+def load_transcript(job_id: str) -> Optional[Transcript]:
+    try:
+        with gzip.open(TRANSCRIPT_DIR / f"{job_id}.json.gz", "rt", encoding="utf-8") as f:
+            return segments_from_cache(json.load(f)["segments"])
+    except (OSError, ValueError, KeyError):
+        return None
+
+def _render_subtitles(output: str):
+    def render(job: Job, transcript: Transcript, path: Path):
+        write_subtitles(transcript, job.params.get("style", "default"), path,
+                        parse_layout(job.params.get("layout")), output)
+    return render
+
+def render_json(job: Job, transcript: Transcript, path: Path):
+    segments = []
+    for i in range(len(transcript)):
+        segments.append({
+            "start": round(transcript.starts[i], 3),
+            "end": round(transcript.ends[i], 3),
+            "text": transcript.texts[i],
+            "words": [{"word": w, "start": round(ws, 3), "end": round(we, 3)}
+                      for w, ws, we in transcript.segment_words(i)],
+        })
+    with path.open("w", encoding="utf-8") as f:
+        json.dump({"language": job.language, "duration": job.duration, "segments": segments},
+                  f, ensure_ascii=False)
+
+def render_tsv(job: Job, transcript: Transcript, path: Path):
+    """start/end in integer milliseconds, like Whisper's own TSV output."""
+    with path.open("w", encoding="utf-8") as f:
+        f.write("start\tend\ttext\n")
+        for i in range(len(transcript)):
+            text = transcript.texts[i].replace("\t", " ")
+            f.write(f"{round(transcript.starts[i] * 1000)}\t{round(transcript.ends[i] * 1000)}\t{text}\n")
+
+def render_txt(job: Job, transcript: Transcript, path: Path):
+    with path.open("w", encoding="utf-8") as f:
+        for text in transcript.texts:
+            f.write(f"{text}\n")
+
+# format -> (media type, renderer)
+OUTPUT_FORMATS = {
+    "srt": ("application/x-subrip", _render_subtitles("srt")),
+    "vtt": ("text/vtt", _render_subtitles("vtt")),
+    "json": ("application/json", render_json),
+    "tsv": ("text/tab-separated-values", render_tsv),
+    "txt": ("text/plain", render_txt),
+}
+
+def render_output(job: Job, fmt: str, cache: bool = True) -> Optional[Path]:
+    """
+    Render a finished job's transcript as `fmt`, reusing an earlier render. With
+    cache=False (a transcript that is still being refined) the caller deletes the file.
+    """
+    out = RENDER_DIR / f"{job.job_id}.{fmt}"
+    if cache and out.exists():
+        return out
+    transcript = load_transcript(job.job_id)
+    if transcript is None:
+        return None
+    tmp = RENDER_DIR / f"{job.job_id}.{fmt}.{threading.get_ident()}.tmp"
+    OUTPUT_FORMATS[fmt][1](job, transcript, tmp)
+    if not cache:
+        return tmp
+    os.replace(tmp, out)
+    return out
+
+# ----------------- Routes -----------------
+@app.get("/", response_class=HTMLResponse)
+def index():
+    return "<h2>Get Subtitles — MVP</h2><p>See <a href='/docs'>/docs</a>.</p>"
+
+@app.get("/health")
+def health():
+    """Liveness: the process answers. Readiness (preloaded models) is reported alongside."""
+    return {"status": "ok", "ready": READINESS["ready"]}
+
+@app.get("/health/ready")
+def health_ready():
+    body = dict(READINESS, preload=dict(READINESS["preload"]))
+    return JSONResponse(body, status_code=200 if READINESS["ready"] else 503)
+
+@app.get("/download/{job_id}.{fmt}")
+def download(job_id: str, fmt: str):
+    """
+    Subtitles/transcript in any of OUTPUT_FORMATS, rendered once from the stored
+    transcript and then served from disk. While a job runs, .srt is the partial file;
+    while it is refined, every format is the current revision.
+    """
+    if fmt not in OUTPUT_FORMATS:
+        return JSONResponse({"error": f"unknown format (choose from {', '.join(OUTPUT_FORMATS)})"},
+                            status_code=400)
+    job = JOB_STORE.get(job_id)
+    if not job:
+        return JSONResponse({"error": "not found"}, status_code=404)
+    media_type = OUTPUT_FORMATS[fmt][0]
+    name = f"{Path(job.original_name or job_id).stem}.{fmt}"
+    srt_path = job.srt_path or job.out_dir / f"{job_id}.srt"
+    if fmt == "srt" and srt_path.exists():
+        return FileResponse(srt_path, media_type=media_type, filename=name)
+    if job.status not in ("done", "refining"):
+        return JSONResponse({"error": f"job is {job.status}"}, status_code=409)
+    final = job.status == "done"
+    p = render_output(job, fmt, cache=final)
+    if p is None:
+        return JSONResponse({"error": "no stored transcript for this job"}, status_code=404)
+    return FileResponse(p, media_type=media_type, filename=name,
+                        background=None if final else BackgroundTask(remove_job_files, p))
+
+@app.get("/download/{job_id}")
+def download_as(job_id: str, format: str = "srt"):
+    return download(job_id, format)
+
+@app.get("/models")
+def list_models():
+    """Models of this process; `workers` has those of the other processes as of their last heartbeat."""
+    return {
+        "resident": MODELS.resident(),
+        "budget_mb": MODEL_RAM_BUDGET_MB or None,
+        "idle_unload_sec": MODEL_IDLE_UNLOAD_S or None,
+        "workers": {wid: r["models"] for wid, r in JOB_STORE.worker_reports().items()},
+    }
+
+@app.post("/models/{model_choice}/unload")
+def unload_model(model_choice: str):
+    key = _resolve_model(model_choice)[0]
+    return {"unloaded": MODELS.unload_where(lambda k: k in (key, _chunk_pool_key(key))) > 0}
+
+@app.post("/models/clear_cache")
+def clear_cache():
+    MODELS.clear()
+    return {"cleared": True}
+
+@app.get("/workers")
+def list_workers():
+    """Processes that run jobs against this job store, with their heartbeat and current jobs."""
+    return {"role": ROLE, "worker_id": WORKER_ID, "workers": JOB_STORE.workers()}
+
+@app.get("/cpu")
+def cpu_settings():
+    return dict(CPU_BUDGET.settings(), workers_running=SCHEDULER.alive())
+
+@app.post("/cpu")
+def cpu_configure(
+    total_threads: int = Form(0),
+    threads_per_job: int = Form(0),
+    inter_threads: int = Form(0),
+    workers: int = Form(0),
+    pin: str = Form(""),
+):
+    """
+    Replace the CPU budget (0 / empty = default). Loaded models and chunk processes are
+    dropped so they come back with the new thread counts; running jobs finish as they are.
+    """
+    try:
+        CPU_BUDGET.configure(total_threads, threads_per_job, inter_threads, workers, pin)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    MODELS.clear()  # chunk pools included
+    if ROLE != "api":
+        SCHEDULER.resize(CPU_BUDGET.workers)
+    return cpu_settings()
+
+@app.get("/metrics")
+def metrics():
+    others = {wid: r["metrics"] for wid, r in JOB_STORE.worker_reports().items()}
+    return PlainTextResponse(METRICS.render(WORKER_ID, others), media_type="text/plain; version=0.0.4")
+
+@app.get("/cache/stats")
+def cache_stats():
+    """Lookup counters summed over this process and the live workers."""
+    return RESULT_CACHE.stats([r["cache"] for r in JOB_STORE.worker_reports().values()])
+
+@app.post("/cache/clear")
+def cache_clear():
+    RESULT_CACHE.clear()
+    return {"cleared": True}
+
+# --- Graceful shutdown endpoint ---
+@app.post("/shutdown")
+def shutdown():
+    """
+    Immediately terminates the FastAPI process.
+    Called from the Streamlit 'Close app' button.
+    """
+    import threading, os, time
+    def _exit():
+        time.sleep(0.1)
+        os._exit(0)
+    threading.Thread(target=_exit, daemon=True).start()
+    return {"ok": True}
+
+# ----------------- Long-file mode (parallel chunks) -----------------
+LONG_MODE_MIN_SEC  = _env_int("GETSUBTITLES_LONG_MIN_SEC", 1200)  # "auto" switches on above this
+CHUNK_PROCS        = max(1, _env_int("GETSUBTITLES_CHUNK_PROCS", (os.cpu_count() or 1) // 4))
+CHUNK_TARGET_SEC   = _env_int("GETSUBTITLES_CHUNK_SEC", 300)
+CHUNK_SEARCH_SEC   = 30.0  # how far a cut may move away from the target to land in silence
+CHUNK_OVERLAP_SEC  = 1.0   # audio shared by neighbouring chunks; duplicates are dropped on stitch
+ENERGY_FRAME_SEC   = 0.1
+
+def find_silence_cuts(audio: np.ndarray, target: float = CHUNK_TARGET_SEC,
+                      search: float = CHUNK_SEARCH_SEC) -> List[float]:
+    """Pick one cut near every multiple of `target`, at the quietest point within +-search seconds."""
+    cuts = []
+    duration = len(audio) / SAMPLE_RATE
+    frame = int(ENERGY_FRAME_SEC * SAMPLE_RATE)
+    t = target
+    while t < duration - target / 2:
+        lo = max(t - search, (cuts[-1] if cuts else 0.0) + target / 2)
+        window = audio[int(lo * SAMPLE_RATE): int(min(t + search, duration) * SAMPLE_RATE)]
+        n = len(window) // frame
+        if n < 3:
+            cuts.append(t)
+        else:
+            energy = np.square(window[: n * frame].reshape(n, frame)).mean(axis=1)
+            smooth = np.convolve(energy, np.ones(5) / 5, mode="same")
+            cuts.append(lo + (int(np.argmin(smooth)) + 0.5) * ENERGY_FRAME_SEC)
+        t = cuts[-1] + target
+    return cuts
+
+def plan_chunks(duration: float, cuts: List[float],
+                overlap: float = CHUNK_OVERLAP_SEC) -> List[Tuple[float, float, float, float]]:
+    """(read_start, read_end, keep_from, keep_to) per chunk; a segment belongs to the chunk holding its midpoint."""
+    bounds = [0.0] + list(cuts) + [duration]
+    chunks = []
+    for i, (a, b) in enumerate(zip(bounds, bounds[1:])):
+        keep_from = a if i > 0 else float("-inf")
+        keep_to = b if i < len(bounds) - 2 else float("inf")
+        chunks.append((max(a - overlap, 0.0), min(b + overlap, duration), keep_from, keep_to))
+    return chunks
+
+# Per-process state of the chunk workers (each one owns a model).
+_worker_model = None
+_worker_compute = None
+_worker_progress = None
+
+def _chunk_worker_init(model_id: str, device: str, candidates: List[str], cpu_threads: int, progress_q,
+                       cpu_slices: Optional[List[List[int]]] = None, slot=None):
+    global _worker_model, _worker_compute, _worker_progress
+    if cpu_slices and hasattr(os, "sched_setaffinity"):
+        with slot.get_lock():
+            i = slot.value
+            slot.value += 1
+        try:
+            os.sched_setaffinity(0, cpu_slices[i % len(cpu_slices)])
+        except OSError as e:
+            print(f"[GETSUBTITLES] CPU pinning failed: {e}")
+    _worker_model, _worker_compute = _load_whisper(model_id, device, candidates, cpu_threads=cpu_threads)
+    _worker_progress = progress_q
+
+def _chunk_detect_language(pcm_path: str, start: float, end: float) -> str:
+    _, info = _worker_model.transcribe(read_pcm_window(Path(pcm_path), start, end))
+    return info.language
+
+def _chunk_transcribe(job_id: str, idx: int, pcm_path: str, chunk: tuple,
+                      task: str, language: Optional[str], word_ts: bool):
+    check_cancelled(job_id)  # chunks already handed to the pool when the job was cancelled
+    start, end, keep_from, keep_to = chunk
+    audio = read_pcm_window(Path(pcm_path), start, end)
+    segments, _ = _worker_model.transcribe(audio, task=task, language=language, word_timestamps=word_ts)
+    out = []
+    last_check = time.time()
+    for seg in segments:
+        _worker_progress.put((job_id, idx, float(seg.end)))
+        if time.time() - last_check >= PROGRESS_SAVE_INTERVAL:
+            check_cancelled(job_id)  # the job store is shared, so the child sees /cancel directly
+            last_check = time.time()
+        s0, e0 = seg.start + start, seg.end + start
+        if not keep_from <= (s0 + e0) / 2 < keep_to:
+            continue
+        words = [(w.word, w.start + start, w.end + start)
+                 for w in (seg.words or []) if w.start is not None and w.end is not None]
+        out.append((s0, e0, seg.text, words))
+    return _worker_compute, out
+
+_chunk_progress: Dict[Tuple[str, int], float] = {}
+_chunk_progress_q = None
+_chunk_progress_lock = threading.Lock()
+
+def _drain_chunk_progress():
+    while True:
+        job_id, idx, end = _chunk_progress_q.get()
+        _chunk_progress[(job_id, idx)] = end
+
+def _chunk_pool_key(profile: str) -> str:
+    return f"{profile}/chunks"
+
+def _get_chunk_pool(profile: str, model_id: str, device: str, candidates: List[str]) -> ProcessPoolExecutor:
+    """
+    Lease the chunk pool for a profile from MODELS. The pool's CHUNK_PROCS model copies
+    count against the RAM budget, and it is shut down when evicted or idle like any model.
+    """
+    def start_pool() -> dict:
+        global _chunk_progress_q
+        ctx = mp.get_context("spawn")
+        with _chunk_progress_lock:
+            if _chunk_progress_q is None:
+                _chunk_progress_q = ctx.Queue()
+                threading.Thread(target=_drain_chunk_progress, daemon=True).start()
+        approx = CHUNK_PROCS * _approx_model_bytes(model_id, candidates[0])
+        MODELS.make_room(approx, keep=_chunk_pool_key(profile))
+        pool = ProcessPoolExecutor(
+            max_workers=CHUNK_PROCS, mp_context=ctx, initializer=_chunk_worker_init,
+            initargs=(model_id, device, candidates, CPU_BUDGET.chunk_threads(CHUNK_PROCS),
+                      _chunk_progress_q, CPU_BUDGET.chunk_cpu_slices(CHUNK_PROCS), ctx.Value("i", 0)),
+        )
+        meta = {"model_choice": _chunk_pool_key(profile), "model_name": model_id, "compute_type": candidates[0],
+                "device": device, "processes": CHUNK_PROCS}
+        return {"model": pool, "meta": meta, "load_sec": 0.0, "approx_bytes": approx,
+                "close": lambda: pool.shutdown(wait=False)}
+
+    return MODELS.acquire(_chunk_pool_key(profile), start_pool)[0]
+
+def use_long_mode(long_mode: str, duration: float) -> bool:
+    if long_mode == "on":
+        return True
+    if long_mode == "off" or CHUNK_PROCS < 2 or _detect_device() != "cpu":
+        return False
+    return duration >= LONG_MODE_MIN_SEC
+
+def transcribe_long(job: Job, audio: np.ndarray, pcm_path: Path, language: Optional[str],
+                    task: str, model_choice: str, word_ts: bool) -> Transcript:
+    """Split at silences, transcribe chunks across the process pool and stitch the segments."""
+    if not isinstance(audio, np.memmap):
+        audio.tofile(pcm_path)  # the chunk workers read their windows from disk
+    key, model_id, local = _resolve_model(model_choice)
+    device = _detect_device()
+    pool = _get_chunk_pool(key, model_id, device, host_compute_candidates(key, model_id, device))
+    job.model_choice, job.model_name = key, model_id
+    try:
+        return _transcribe_chunks(job, pool, audio, pcm_path, language, task, word_ts)
+    finally:
+        MODELS.release(_chunk_pool_key(key), pool)  # idle from here on; reaped/evicted like a model
+
+def _transcribe_chunks(job: Job, pool: ProcessPoolExecutor, audio: np.ndarray, pcm_path: Path,
+                       language: Optional[str], task: str, word_ts: bool) -> Transcript:
+    duration = len(audio) / SAMPLE_RATE
+
+    chunks = plan_chunks(duration, find_silence_cuts(audio))
+    if language is None:
+        mid = duration / 2
+        language = pool.submit(_chunk_detect_language, str(pcm_path), max(mid - 15, 0), mid + 15).result()
+    job.language = language
+    job.duration = duration
+    job.status = "running"
+    JOB_STORE.save(job)
+
+    futures = {
+        pool.submit(_chunk_transcribe, job.job_id, i, str(pcm_path), c, task, language, word_ts): i
+        for i, c in enumerate(chunks)
+    }
+    results: List[Optional[list]] = [None] * len(chunks)
+    pending = set(futures)
+    try:
+        while pending:
+            done, pending = wait(pending, timeout=PROGRESS_SAVE_INTERVAL)
+            check_cancelled(job.job_id)
+            for f in done:
+                job.compute_type, results[futures[f]] = f.result()
+            covered = 0.0
+            for i, (start, end, _, _) in enumerate(chunks):
+                span = end - start
+                covered += span if results[i] is not None else min(_chunk_progress.get((job.job_id, i), 0.0), span)
+            job.progress = min(covered / max(duration, 1e-6), 0.999)
+            JOB_STORE.save(job)
+    finally:
+        for f in pending:
+            f.cancel()
+        for i in range(len(chunks)):
+            _chunk_progress.pop((job.job_id, i), None)
+
+    transcript = Transcript()
+    for s0, e0, text, words in sorted((seg for part in results for seg in part), key=lambda x: x[0]):
+        if transcript.texts and s0 < transcript.ends[-1] and text.strip() == transcript.texts[-1]:
+            continue  # same line produced by both sides of an overlap
+        transcript.add(s0, e0, text, words)
+    return transcript
+
+# --------- Language detection fast path ----------
+# With language=auto the language is detected up front by a small model on a few
+# sampled windows, so the job's model starts with it pinned. "off" leaves detection
+# to the job's own model (first 30 s only).
+LANG_DETECT_PROFILE = os.environ.get("GETSUBTITLES_LANG_DETECT", "fast").strip().lower()
+LANG_DETECT_WINDOWS = max(1, _env_int("GETSUBTITLES_LANG_WINDOWS", 3))
+LANG_WINDOW_SEC = 30  # Whisper's input length
+
+def _detection_windows(audio: np.ndarray, n: int) -> List[Tuple[int, int]]:
+    """Up to n windows spread over the audio, preferring the loudest of 4n evenly spaced candidates."""
+    win = LANG_WINDOW_SEC * SAMPLE_RATE
+    if len(audio) <= win:
+        return [(0, len(audio))]
+    starts = np.linspace(0, len(audio) - win, num=4 * n).astype(int)
+    # Every 160th sample (10 ms) is plenty to tell speech from silence.
+    rms = [float(np.sqrt(np.mean(np.square(audio[s:s + win:160])))) for s in starts]
+    best = sorted(np.argsort(rms)[::-1][:n])
+    return [(int(starts[i]), int(starts[i]) + win) for i in best]
+
+def detect_language_fast(audio: np.ndarray) -> Tuple[str, float]:
+    """Language and mean probability, summed over the sampled windows."""
+    windows = _detection_windows(audio, LANG_DETECT_WINDOWS)
+    scores: Dict[str, float] = {}
+    with MODELS.lease(LANG_DETECT_PROFILE) as (model, _):
+        for start, end in windows:
+            # transcribe() detects the language eagerly; the segment generator is never consumed.
+            _, info = model.transcribe(np.asarray(audio[start:end], dtype=np.float32), beam_size=1)
+            probs = getattr(info, "all_language_probs", None) or [(info.language, info.language_probability)]
+            for lang, p in probs:
+                scores[lang] = scores.get(lang, 0.0) + p
+    lang = max(scores, key=scores.get)
+    return lang, scores[lang] / len(windows)
+
+def pin_language(job: Job, audio: np.ndarray) -> Optional[str]:
+    """Detected (or previously detected) language for an auto-language job; None to let the model decide."""
+    source_hash = job.params.get("source_hash")
+    found = JOB_STORE.get_source_language(source_hash, LANG_DETECT_PROFILE) if source_hash else None
+    job.language_source = "cached"
+    if found is None:
+        try:
+            found = detect_language_fast(audio)
+        except Exception as e:
+            print(f"[GETSUBTITLES] Language detection failed, leaving it to the model: {e}")
+            job.language_source = "model"
+            return None
+        job.language_source = "detected"
+        if source_hash:
+            JOB_STORE.put_source_language(source_hash, LANG_DETECT_PROFILE, *found)
+    job.language, job.language_probability = found
+    return job.language
+
+# --------- VAD pre-pass ----------
+# Only the detected speech is sent to the model; cue times are mapped back to the original timeline.
+VAD_DEFAULTS = {
+    "threshold": 0.5,                 # speech probability above which a frame counts as speech
+    "min_speech_duration_ms": 250,    # shorter bursts are dropped
+    "min_silence_duration_ms": 2000,  # shorter pauses don't split speech
+    "speech_pad_ms": 400,             # kept around each speech region
+}
+
+def parse_vad(value) -> Optional[dict]:
+    """
+    "off" (default), "on", or a JSON object / dict overriding VAD_DEFAULTS, e.g.
+    {"threshold": 0.6, "min_silence_duration_ms": 1000}. Raises ValueError.
+    """
+    if value is None or value in ("", "off", "false", "0"):
+        return None
+    if isinstance(value, str):
+        if value in ("on", "true", "1"):
+            return dict(VAD_DEFAULTS)
+        value = json.loads(value)
+    if not isinstance(value, dict):
+        raise ValueError("must be on, off or an object")
+    unknown = set(value) - set(VAD_DEFAULTS)
+    if unknown:
+        raise ValueError(f"unknown fields: {', '.join(sorted(unknown))}")
+    opts = dict(VAD_DEFAULTS)
+    try:
+        opts.update({k: type(VAD_DEFAULTS[k])(v) for k, v in value.items()})
+    except TypeError as e:
+        raise ValueError(str(e))
+    if not 0 < opts["threshold"] < 1 or any(opts[k] < 0 for k in opts if k.endswith("_ms")):
+        raise ValueError("threshold must be between 0 and 1 and durations non-negative")
+    return opts
+
+def detect_speech(audio: np.ndarray, opts: dict) -> List[Tuple[int, int]]:
+    """Speech regions as sample ranges (Silero VAD from faster-whisper)."""
+    return [(ts["start"], ts["end"]) for ts in get_speech_timestamps(audio, vad_options=VadOptions(**opts))]
+
+class SpeechMap:
+    """Maps times on the concatenated speech-only audio back to the original timeline."""
+    __slots__ = ("speech_starts", "offsets", "speech_sec")
+
+    def __init__(self, regions: List[Tuple[int, int]]):
+        self.speech_starts = array("d")
+        self.offsets = array("d")
+        t = 0.0
+        for start, end in regions:
+            self.speech_starts.append(t)
+            self.offsets.append(start / SAMPLE_RATE - t)
+            t += (end - start) / SAMPLE_RATE
+        self.speech_sec = t
+
+    def to_original(self, t: float, is_end: bool = False) -> float:
+        """An end time exactly on a region boundary belongs to the region before it."""
+        if not self.offsets:
+            return t
+        i = (bisect_left if is_end else bisect_right)(self.speech_starts, t) - 1
+        return round(t + self.offsets[max(i, 0)], 3)
+
+    def apply(self, transcript: Transcript):
+        """Remap a finished transcript in place."""
+        for times, is_end in ((transcript.starts, False), (transcript.ends, True),
+                              (transcript.words.starts, False), (transcript.words.ends, True)):
+            for i, t in enumerate(times):
+                times[i] = self.to_original(t, is_end)
+
+def collect_speech(audio: np.ndarray, regions: List[Tuple[int, int]], spill_path: Path,
+                   memory_limit: int = PCM_MEMORY_LIMIT_MB * 1024 * 1024) -> np.ndarray:
+    """Concatenate the speech regions; spilled to a memmap above `memory_limit` like decode_pcm."""
+    total = sum(end - start for start, end in regions)
+    if total * 4 > memory_limit:
+        out = np.memmap(spill_path, dtype=np.float32, mode="w+", shape=(total,))
+    else:
+        out = np.empty(total, dtype=np.float32)
+    pos = 0
+    for start, end in regions:
+        out[pos:pos + end - start] = audio[start:end]
+        pos += end - start
+    return out
+
+def vad_report(job: Job) -> Optional[dict]:
+    if job.speech_sec is None or not job.duration:
+        return None
+    skipped = max(job.duration - job.speech_sec, 0.0)
+    # Measured speed once inference is done, the running estimate before that.
+    inference = job.timings.get("inference")
+    rate = inference / job.speech_sec if inference and job.speech_sec else job.rtf_estimate
+    return {
+        "speech_sec": round(job.speech_sec, 1),
+        "speech_ratio": round(job.speech_sec / job.duration, 3),
+        "skipped_sec": round(skipped, 1),
+        "time_saved_sec": None if rate is None else round(skipped * rate, 1),
+    }
+
+def transfer_report(job: Job) -> Optional[dict]:
+    """Bytes the client sent against its original file, and the upload time that saved."""
+    t = job.transfer
+    if not t:
+        return None
+    saved = max(t["original_bytes"] - t["sent_bytes"], 0)
+    upload_sec = job.timings.get("upload")
+    time_saved = None
+    if upload_sec and t["sent_bytes"] and not t.get("deduplicated"):
+        rate = t["sent_bytes"] / upload_sec  # the upload speed this job actually got
+        time_saved = round(saved / rate - t["extract_sec"], 1)
+    return {
+        "original_bytes": t["original_bytes"],
+        "sent_bytes": t["sent_bytes"],
+        "saved_bytes": saved,
+        "extract_sec": round(t["extract_sec"], 2),
+        "upload_sec": None if upload_sec is None else round(upload_sec, 2),
+        "time_saved_sec": time_saved,
+        "deduplicated": t.get("deduplicated", False),
+    }
+
+# --------- Speculative mode (draft, then refine) ----------
+# With refine=<profile> the job's own model writes a draft that is streamed and stored as
+# usual; the larger profile then re-transcribes the audio window by window (cut at
+# silences), and each refined window replaces its draft segments in the stored transcript
+# and the SRT. Every window carries a revision number (0 = draft).
+PROFILE_ORDER = ("fast", "balanced", "best")
+REFINE_WINDOW_SEC = _env_int("GETSUBTITLES_REFINE_WINDOW_SEC", 60)
+
+def parse_refine(value, model_choice: str) -> Optional[str]:
+    """"off" (default), "on" (= best) or a profile larger than `model_choice`. Raises ValueError."""
+    if value is None or value in ("", "off", "false", "0"):
+        return None
+    value = "best" if value in ("on", "true", "1") else value.strip().lower()
+    if value not in PROFILE_ORDER:
+        raise ValueError(f"must be on, off or one of {', '.join(PROFILE_ORDER)}")
+    draft = _resolve_model(model_choice)[0]
+    if PROFILE_ORDER.index(value) <= PROFILE_ORDER.index(draft):
+        raise ValueError(f"{value} is not larger than the draft model ({draft})")
+    return value
+
+def refine_report(job: Job) -> Optional[dict]:
+    r = job.refine
+    if not r:
+        return None
+    return {
+        "profile": r["profile"],
+        "draft_model": r.get("draft_model"),
+        "draft_ready_sec": r.get("draft_ready_sec"),
+        "model_name": r.get("model_name"),
+        "windows": [[round(a, 2), round(b, 2), rev] for (a, b), rev in zip(r["windows"], r["revisions"])],
+        "refined": sum(1 for rev in r["revisions"] if rev),
+        "revision": sum(r["revisions"]),
+        "stopped": r.get("stopped", False),
+        "error": r.get("error"),
+    }
+
+def publish_transcript(job: Job, transcript: Transcript, srt_path: Path, style: str, layout: VerticalLayout):
+    """Replace the stored transcript and the SRT in one step each, so readers never see half a file."""
+    tmp = srt_path.with_name(f"{srt_path.name}.{os.getpid()}.tmp")
+    write_subtitles(transcript, style, tmp, layout)
+    os.replace(tmp, srt_path)
+    save_transcript(job, transcript)
+
+def refine_transcript(job: Job, audio: np.ndarray, draft: Transcript, smap: Optional["SpeechMap"],
+                      task: str, style: str, layout: VerticalLayout, srt_path: Path, device: str) -> Transcript:
+    """
+    Second pass of speculative mode. The finished draft is published first (status "refining",
+    all downloads available), then every window is re-transcribed with the refine profile and
+    spliced in. A cancel during this pass keeps what is refined so far.
+    """
+    r = job.refine
+    work_sec = len(audio) / SAMPLE_RATE
+    to_orig = smap.to_original if smap else (lambda t, is_end=False: t)
+    chunks = plan_chunks(work_sec, find_silence_cuts(audio, REFINE_WINDOW_SEC, REFINE_WINDOW_SEC / 4))
+    starts = [0.0] + [to_orig(c[2]) for c in chunks[1:]]
+    r["windows"] = list(zip(starts, starts[1:] + [job.duration]))
+    r["revisions"] = [0] * len(chunks)
+    r.update(draft_model=job.model_name, draft_compute_type=job.compute_type,
+             draft_ready_sec=round(time.time() - job.started_at, 2))
+    parts: List[list] = [[] for _ in chunks]
+    for i in range(len(draft)):
+        mid = (draft.starts[i] + draft.ends[i]) / 2
+        parts[max(bisect_right(starts, mid) - 1, 0)].append(
+            (draft.starts[i], draft.ends[i], draft.texts[i], draft.segment_words(i)))
+    publish_transcript(job, draft, srt_path, style, layout)
+    job.srt_path = srt_path
+    job.status, job.progress = "refining", 0.0
+    JOB_STORE.save(job)
+
+    t_phase = time.time()
+    transcript, done_sec = draft, 0.0
+    model = meta = None
+    try:
+        model, meta = get_model(r["profile"])
+        r.update(model_name=meta["model_name"], compute_type=meta["compute_type"])
+        job.rtf_estimate = RTF_RECORD.estimate(meta["model_choice"], meta["compute_type"], device, "single")
+        job.inference_started_at = time.time()
+        for i, (start, end, keep_from, keep_to) in enumerate(chunks):
+            check_cancelled(job.job_id)
+            segments, _ = model.transcribe(audio[int(start * SAMPLE_RATE):int(end * SAMPLE_RATE)], task=task,
+                                           language=job.language, word_timestamps=style == "vertical")
+            refined, last_check = [], time.time()
+            for seg in segments:
+                if time.time() - last_check >= PROGRESS_SAVE_INTERVAL:
+                    check_cancelled(job.job_id)
+                    last_check = time.time()
+                s0, e0 = seg.start + start, seg.end + start
+                if not keep_from <= (s0 + e0) / 2 < keep_to:
+                    continue
+                words = [(w.word or "", to_orig(w.start + start), to_orig(w.end + start, is_end=True))
+                         for w in (seg.words or []) if w.start is not None and w.end is not None]
+                refined.append((to_orig(s0), to_orig(e0, is_end=True), seg.text, words))
+            parts[i] = refined
+            r["revisions"][i] += 1
+            transcript = Transcript()
+            for part in parts:
+                for seg in part:
+                    transcript.add(*seg)
+            publish_transcript(job, transcript, srt_path, style, layout)
+            done_sec += min(keep_to, work_sec) - max(keep_from, 0.0)
+            job.progress = min(done_sec / max(work_sec, 1e-6), 0.999)
+            JOB_STORE.save(job)
+    except Exception as e:  # the draft stays valid, so a failed or cancelled refine still ends "done"
+        r["stopped"] = True
+        if not isinstance(e, JobCancelled):
+            r["error"] = str(e)
+        print(f"[GETSUBTITLES] Job {job.job_id}: refining stopped after "
+              f"{sum(1 for rev in r['revisions'] if rev)} of {len(chunks)} windows"
+              + ("" if isinstance(e, JobCancelled) else f" ({e})"))
+    finally:
+        if model is not None:
+            MODELS.release(meta["model_choice"], model)
+    job.timings["refine"] = time.time() - t_phase
+    if not r.get("stopped"):
+        job.model_choice, job.model_name, job.compute_type = meta["model_choice"], meta["model_name"], meta["compute_type"]
+        RTF_RECORD.update(job.model_choice, job.compute_type, device, "single",
+                          (time.time() - job.inference_started_at) / work_sec)
+    return transcript
+
+# --------- Background worker ----------
+PROGRESS_SAVE_INTERVAL = 0.5  # seconds between progress writes to the job store
+
+class RtfRecord:
+    """
+    Running estimate of inference real-time factor (wall seconds per audio second)
+    per (model_choice, compute_type, device, mode), kept as an exponential moving
+    average of finished jobs and persisted next to the job store.
+    """
+    ALPHA = 0.3  # weight of the newest job
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(model_choice: str, compute_type: str, device: str, mode: str) -> str:
+        return f"{model_choice}|{compute_type}|{device}|{mode}"
+
+    def _read(self) -> dict:
+        try:
+            return json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+
+    def estimate(self, model_choice: str, compute_type: str, device: str, mode: str) -> Optional[float]:
+        entry = self._read().get(self._key(model_choice, compute_type, device, mode))
+        return entry["rtf"] if entry else None
+
+    def update(self, model_choice: str, compute_type: str, device: str, mode: str, rtf: float):
+        with self._lock:
+            record = self._read()
+            key = self._key(model_choice, compute_type, device, mode)
+            entry = record.get(key)
+            if entry:
+                entry["rtf"] = (1 - self.ALPHA) * entry["rtf"] + self.ALPHA * rtf
+                entry["jobs"] += 1
+            else:
+                record[key] = {"rtf": rtf, "jobs": 1}
+            tmp = self.path.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_text(json.dumps(record, indent=2), encoding="utf-8")
+            os.replace(tmp, self.path)
+
+RTF_RECORD = RtfRecord(STATE_DIR / "rtf.json")
+
+def job_eta(job: Job) -> Optional[float]:
+    """
+    Remaining seconds for a job. Before the first segment this is the RTF estimate
+    times the audio duration; as segments arrive the extrapolation from live progress
+    takes over in proportion to the progress made.
+    """
+    if not job.duration or job.status in FINISHED_STATES:
+        return None
+    audio_sec = job.duration if job.speech_sec is None else job.speech_sec
+    predicted = job.rtf_estimate * audio_sec if job.rtf_estimate else None
+    if job.status not in ("running", "refining") or not job.inference_started_at:
+        return predicted if job.status in ("decoding", "loading_model") else None
+
+    elapsed = time.time() - job.inference_started_at
+    prior = predicted - elapsed if predicted and predicted > elapsed else None
+    if job.progress <= 0:
+        return prior
+    live = elapsed * (1.0 - job.progress) / job.progress
+    if prior is None:
+        return live
+    return (1.0 - job.progress) * prior + job.progress * live
+
+def write_subtitles(transcript: Transcript, style: str, srt_path: Path,
+                    layout: VerticalLayout = DEFAULT_LAYOUT, output: str = "srt") -> float:
+    """Write all cues of a finished transcript; returns the seconds spent."""
+    with SubtitleStreamWriter(srt_path, style, layout, transcript, output) as writer:
+        for i in range(len(transcript)):
+            writer.write_segment(i)
+    return writer.write_sec
+
+def remove_job_files(*paths: Path):
+    """Delete temporary upload/decode files once a job no longer needs them."""
+    for p in paths:
+        try:
+            p.unlink(missing_ok=True)
+        except OSError as e:
+            print(f"[GETSUBTITLES] Could not remove {p}: {e}")
+
+class JobCancelled(Exception):
+    """Raised inside a running job once a cancel was requested for it."""
+
+def check_cancelled(job_id: str):
+    if JOB_STORE.cancel_requested(job_id):
+        raise JobCancelled(job_id)
+
+def _record_job_metrics(job: Job):
+    outcome = "cache_hit" if job.status == "done" and job.cache_hit else job.status
+    METRICS.inc("getsubtitles_jobs_total", status=outcome)
+    if job.status == "done" and not job.cache_hit:
+        METRICS.inc("getsubtitles_audio_seconds_total", job.duration)
+    for phase, sec in job.timings.items():
+        METRICS.observe("getsubtitles_phase_seconds", sec, phase=phase)
+
+def _finish_job(job: Job, srt_path: Path, transcript: Transcript):
+    save_transcript(job, transcript)
+    job.srt_path = srt_path
+    job.progress = 1.0
+    job.status = "done"
+    job.finished_at = time.time()
+    JOB_STORE.save(job)
+    _record_job_metrics(job)
+
+def complete_from_cache(job: Job, recheck: bool = False) -> bool:
+    """
+    Re-render a cached result for this job; skips both ffmpeg and Whisper on a hit.
+    recheck: the upload already counted a miss for this key, so only an entry stored since
+    then is looked up (and counted).
+    """
+    key = result_cache_key(job)
+    if key and recheck and not RESULT_CACHE.contains(key):
+        return False  # already counted as a miss at upload time
+    entry = RESULT_CACHE.get(key, need_words=job.params["style"] == "vertical") if key else None
+    if entry is None:
+        return False
+    job.model_choice = _resolve_model(job.params.get("refine") or job.params["model_choice"])[0]
+    job.model_name = entry.get("model_name")
+    job.compute_type = entry.get("compute_type")
+    job.language = entry.get("language")
+    job.duration = float(entry.get("duration") or 0.0)
+    job.speech_sec = entry.get("speech_sec")
+    job.cache_hit = True
+    job.started_at = job.started_at or time.time()
+    srt_path = job.out_dir / f"{job.job_id}.srt"
+    transcript = segments_from_cache(entry["segments"])
+    write_subtitles(transcript, job.params["style"], srt_path, parse_layout(job.params.get("layout")))
+    _finish_job(job, srt_path, transcript)
+    return True
+
+def cache_transcript(job: Job, transcript: Transcript, task: str, language: Optional[str],
+                     vad: Optional[dict], has_words: bool):
+    """Store the result under the model that produced it (draft and refined results separately)."""
+    if not job.params.get("source_hash"):
+        return
+    RESULT_CACHE.put(
+        ResultCache.make_key(job.params["source_hash"], job.model_choice, task, language,
+                             job.compute_type, vad),
+        {
+            "language": job.language,
+            "duration": job.duration,
+            "speech_sec": job.speech_sec,
+            "model_name": job.model_name,
+            "compute_type": job.compute_type,
+            "has_words": has_words,
+            "segments": segments_to_cache(transcript),
+        },
+    )
+
+def run_transcription(job_id: str,
+                      src_path: Path,
+                      language: Optional[str],
+                      task: str,
+                      model_choice: str,
+                      out_dir: Path,
+                      style: str,
+                      long_mode: str = "auto",
+                      layout: Optional[dict] = None,
+                      vad: Optional[dict] = None,
+                      decoded: Optional[np.ndarray] = None):
+    """
+    style: "default" | "vertical"
+    - default  -> segment-based SRT (unchanged)
+    - vertical -> word-timestamp packing for reels/shorts
+    long_mode: "auto" | "on" | "off" -> split long media into chunks transcribed in parallel
+    layout: VerticalLayout fields for the vertical packer (default profile when None)
+    vad: VadOptions overrides; when set only the detected speech is transcribed
+    decoded: PCM already decoded by the caller into UPLOAD_DIR/{job_id}.f32 (or memory)
+    """
+    layout = parse_layout(layout)
+    vad = parse_vad(vad)
+    job = JOB_STORE.get(job_id)
+    if job is None:  # deleted (janitor, batch pruning) between being claimed and starting
+        return
+    pcm_path = UPLOAD_DIR / f"{job_id}.f32"
+    speech_path = UPLOAD_DIR / f"{job_id}.speech.f32"
+    audio = None
+    leased = None  # (key, model) handed back to MODELS when the job ends
+    try:
+        # A job started on an unfinished upload is hashed when the upload completes.
+        upload_id = job.params.get("upload_id")
+
+        # Server-local batch files are hashed here rather than in the request.
+        if not upload_id and not job.params.get("source_hash") and RESULT_CACHE.max_bytes > 0:
+            job.params["source_hash"] = file_sha256(src_path)
+
+        # The first lookup for jobs enqueued by an API replica; otherwise an identical
+        # upload may have finished while this one was queued.
+        if not upload_id and complete_from_cache(job, recheck=job.params.get("cache_checked", False)):
+            return
+
+        job.refine = {"profile": job.params["refine"], "windows": [], "revisions": []} \
+            if job.params.get("refine") else None
+
+        if decoded is None:
+            job.status = "decoding"
+            JOB_STORE.save(job)
+            t_phase = time.time()
+            if upload_id:
+                audio = decode_upload(job, pcm_path)
+                job.timings["decode"] = time.time() - t_phase
+                if complete_from_cache(job):
+                    return
+            else:
+                audio = decode_pcm(src_path, pcm_path, job_id=job_id)
+                job.timings["decode"] = time.time() - t_phase
+        else:
+            audio, decoded = decoded, None
+        duration = len(audio) / SAMPLE_RATE
+        check_cancelled(job_id)
+
+        smap = None
+        if vad:
+            job.status = "detecting_speech"
+            JOB_STORE.save(job)
+            t_phase = time.time()
+            regions = detect_speech(audio, vad)
+            smap = SpeechMap(regions)
+            audio = collect_speech(audio, regions, speech_path)  # the full decode is no longer needed
+            job.speech_sec = smap.speech_sec
+            job.timings["vad"] = time.time() - t_phase
+
+        pinned = language
+        job.language_source = "request" if language else "model"
+        if language is None and LANG_DETECT_PROFILE != "off" and len(audio):
+            job.status = "detecting_language"
+            JOB_STORE.save(job)
+            t_phase = time.time()
+            pinned = pin_language(job, audio)
+            job.timings["language_detect"] = time.time() - t_phase
+
+        use_word_ts = (style == "vertical")
+        srt_path = out_dir / f"{job_id}.srt"
+        work_sec = len(audio) / SAMPLE_RATE  # what the model sees (speech only with VAD)
+        device = _detect_device()
+        mode = "long" if use_long_mode(long_mode, work_sec) else "single"
+        profile = _resolve_model(model_choice)[0]
+        job.duration = duration
+        job.rtf_estimate = RTF_RECORD.estimate(profile, _expected_compute_type(profile), device, mode)
+        check_cancelled(job_id)
+        job.status = "loading_model"
+        JOB_STORE.save(job)
+        t_phase = time.time()
+
+        if not work_sec:
+            transcript = Transcript()  # VAD found no speech at all
+            job.timings["write"] = write_subtitles(transcript, style, srt_path, layout)
+        elif mode == "long":
+            job.inference_started_at = t_phase
+            transcript = transcribe_long(job, audio, speech_path if smap else pcm_path,
+                                         pinned, task, model_choice, use_word_ts)
+            job.timings["inference"] = time.time() - t_phase  # includes the workers' model loads
+            job.duration = duration
+            if smap:
+                smap.apply(transcript)
+            job.timings["write"] = write_subtitles(transcript, style, srt_path, layout)
+        else:
+            model, meta = get_model(model_choice)
+            leased = (meta["model_choice"], model)
+            job.model_choice = meta["model_choice"]
+            job.model_name = meta["model_name"]
+            job.compute_type = meta["compute_type"]
+            job.rtf_estimate = RTF_RECORD.estimate(job.model_choice, job.compute_type, device, mode)
+            job.timings["model_load"] = time.time() - t_phase
+            t_phase = time.time()
+
+            segments, info = model.transcribe(
+                audio,
+                task=task,
+                language=pinned,
+                word_timestamps=use_word_ts
+            )
+
+            job.language = info.language
+            job.status = "running"
+            job.inference_started_at = t_phase
+            JOB_STORE.save(job)
+
+            # Progress based on last end time vs duration; cues are appended to the SRT as they arrive
+            # Segments are copied into the compact transcript and dropped as they arrive.
+            transcript = Transcript()
+            last_end = 0.0
+            last_save = time.time()
+            with SubtitleStreamWriter(srt_path, style, layout, transcript) as writer:
+                for seg in segments:
+                    if not len(transcript):
+                        job.timings["first_segment"] = time.time() - t_phase
+                    writer.add(seg, smap)
+                    PROGRESS_HUB.poke(job_id)
+                    last_end = max(last_end, transcript.ends[-1])
+                    if job.duration > 0:
+                        job.progress = min(last_end / job.duration, 0.999)
+                    if time.time() - last_save >= PROGRESS_SAVE_INTERVAL:
+                        check_cancelled(job_id)
+                        JOB_STORE.save(job)
+                        last_save = time.time()
+            job.timings["write"] = writer.write_sec
+            job.timings["inference"] = time.time() - t_phase - writer.write_sec
+
+        if work_sec and job.compute_type:
+            RTF_RECORD.update(job.model_choice, job.compute_type, device, mode,
+                              job.timings["inference"] / work_sec)
+
+        cache_transcript(job, transcript, task, language, vad, use_word_ts)
+
+        if job.refine is not None and work_sec:
+            transcript = refine_transcript(job, audio, transcript, smap, task, style, layout, srt_path, device)
+            if not job.refine.get("stopped"):
+                cache_transcript(job, transcript, task, language, vad, use_word_ts)
+
+        _finish_job(job, srt_path, transcript)
+
+    except Exception as e:
+        if isinstance(e, JobCancelled) or JOB_STORE.cancel_requested(job_id):
+            job.status = "cancelled"
+            remove_job_files(out_dir / f"{job_id}.srt")  # partial subtitles
+        else:
+            job.status = "error"
+            job.error_msg = str(e)
+        job.finished_at = time.time()
+        JOB_STORE.save(job)
+        _record_job_metrics(job)
+
+    finally:
+        if leased:
+            MODELS.release(*leased)
+        del audio  # release the memmap before unlinking its file (Windows)
+        remove_job_files(pcm_path, speech_path)
+        if not job.params.get("keep_source"):
+            remove_job_files(src_path)
+
+def run_job(job: Job, decoded: Optional[np.ndarray] = None):
+    """run_transcription with the settings stored on the job."""
+    p = job.params
+    run_transcription(job.job_id, Path(p["src_path"]), p.get("language"), p["task"],
+                      p["model_choice"], job.out_dir, p["style"], p.get("long_mode", "auto"),
+                      p.get("layout"), p.get("vad"), decoded)
+
+# ---------- Async start + progress ----------
+@app.post("/transcribe_start")
+async def transcribe_start(
+    file: UploadFile = File(...),
+    language: str = Form("auto"),
+    task: str = Form("transcribe"),
+    model_choice: str = Form("fast"),
+    output_dir: str = Form(None),
+    style: str = Form("default"),
+    priority: int = Form(0),
+    long_mode: str = Form("auto"),
+    layout: str = Form(None),
+    vad: str = Form("off"),
+    refine: str = Form("off"),
+):
+    try:
+        settings = _job_settings(language, task, model_choice, style, long_mode, layout, vad, refine)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    full = await run_in_threadpool(JANITOR.make_room, file.size or 0)  # sent without Content-Length
+    if full:
+        return storage_full(full)
+    job_id = str(uuid4())[:8]
+
+    out_dir = Path(output_dir).expanduser() if output_dir else DEFAULT_OUTPUT_DIR
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    # Stream the upload to disk off the event loop instead of reading it all into memory.
+    src_path = UPLOAD_DIR / f"{job_id}_{Path(file.filename or 'upload').name}"
+    t0 = time.time()
+    _, source_hash = await run_in_threadpool(save_upload, file.file, src_path)
+    upload_sec = time.time() - t0
+
+    await run_in_threadpool(enqueue_job, job_id, file.filename, src_path, settings, out_dir,
+                            priority, source_hash=source_hash, timings={"upload": upload_sec})
+    return {"job_id": job_id, "original_filename": file.filename}
+
+def _job_settings(language: str, task: str, model_choice: str, style: str, long_mode: str,
+                  layout: Optional[str] = None, vad: Optional[str] = None, refine: Optional[str] = None) -> dict:
+    """Raises ValueError for an invalid layout, VAD or refine setting."""
+    try:
+        layout_opts = parse_layout(layout)._asdict()
+    except ValueError as e:
+        raise ValueError(f"invalid layout: {e}")
+    try:
+        vad_opts = parse_vad(vad)
+    except ValueError as e:
+        raise ValueError(f"invalid vad: {e}")
+    try:
+        refine_profile = parse_refine(refine, model_choice)
+    except ValueError as e:
+        raise ValueError(f"invalid refine: {e}")
+    return {
+        "language": None if language == "auto" else language,
+        "task": task,
+        "model_choice": model_choice,
+        "style": style,
+        "long_mode": long_mode,
+        "layout": layout_opts,
+        "vad": vad_opts,
+        "refine": refine_profile,
+    }
+
+def build_job(job_id: str, original_name: str, src_path: Path, settings: dict, out_dir: Path,
+              priority: int = 0, source_hash: Optional[str] = None, batch_id: Optional[str] = None,
+              keep_source: bool = False, timings: Optional[dict] = None,
+              transfer: Optional[dict] = None) -> Job:
+    """A new job, already finished if the result cache has it ("queued" otherwise); not stored yet."""
+    # Decoding happens in the worker as its own "decoding" phase.
+    job = Job(job_id, original_name, out_dir)
+    job.timings.update(timings or {})
+    job.transfer = transfer
+    job.priority = priority
+    job.batch_id = batch_id
+    job.params = dict(settings, src_path=str(src_path), source_hash=source_hash, keep_source=keep_source)
+    # The key holds the compute type the job will run with, which only a process that runs
+    # jobs knows (an API replica may not even see the workers' device); otherwise the worker looks.
+    if source_hash and ROLE != "api":
+        job.params["cache_checked"] = True
+        if complete_from_cache(job) and not keep_source:
+            remove_job_files(src_path)
+    return job
+
+def enqueue_job(job_id: str, original_name: str, src_path: Path, settings: dict, out_dir: Path,
+                priority: int = 0, source_hash: Optional[str] = None, batch_id: Optional[str] = None,
+                keep_source: bool = False, timings: Optional[dict] = None,
+                transfer: Optional[dict] = None) -> Job:
+    """Create a job; finish it right away from the result cache or queue it for the workers."""
+    job = build_job(job_id, original_name, src_path, settings, out_dir, priority, source_hash,
+                    batch_id, keep_source, timings, transfer)
+    if job.status == "queued":
+        SCHEDULER.submit(job)
+    else:
+        JOB_STORE.add(job)
+    return job
+
+def progress_payload(job: Job) -> dict:
+    wait_end = job.started_at or time.time()
+
+    eta_sec = job_eta(job)
+
+    resp = {
+        "status": job.status,
+        "progress": round(job.progress, 4),
+        "eta_sec": None if eta_sec is None else round(eta_sec, 1),
+        "rtf_estimate": None if job.rtf_estimate is None else round(job.rtf_estimate, 4),
+        "language": job.language,
+        "language_probability": None if job.language_probability is None else round(job.language_probability, 3),
+        "language_source": job.language_source,
+        "model_choice": job.model_choice,
+        "model_name": job.model_name,
+        "compute_type": job.compute_type,
+        "duration_sec": round(job.duration, 2) if job.duration else None,
+        "srt_path": str(job.srt_path) if job.srt_path else None,
+        "srt_url": f"/download/{job.job_id}.srt" if job.srt_path else None,
+        "error": job.error_msg,
+        "cancel_requested": job.status not in FINISHED_STATES and JOB_STORE.cancel_requested(job.job_id),
+        "queue_position": JOB_STORE.queue_position(job),
+        "wait_sec": round(max(wait_end - job.enqueued_at, 0.0), 1),
+        "cache_hit": job.cache_hit,
+        "partial_srt_url": f"/download/{job.job_id}.srt",
+        "downloads": {fmt: f"/download/{job.job_id}.{fmt}" for fmt in OUTPUT_FORMATS}
+                     if job.status in ("done", "refining") else None,
+        "timings": {k: round(v, 2) for k, v in job.timings.items()},
+        "vad": vad_report(job),
+        "transfer": transfer_report(job),
+        "refine": refine_report(job),
+        "updated_at": job.updated_at,
+    }
+    return resp
+
+@app.get("/progress/{job_id}")
+def progress(job_id: str):
+    job = JOB_STORE.get(job_id)
+    if not job:
+        return JSONResponse({"error": "unknown job"}, status_code=404)
+    return progress_payload(job)
+
+# ---------- Resumable uploads ----------
+# create -> PUT numbered chunks (any order, retried or resumed at will) -> complete.
+# A file whose sha256 matches a finished upload is not sent again once the client proves
+# it has the bytes: it answers a challenge for a random range of the file (POST .../proof).
+UPLOAD_PART_SIZE  = 8 * 1024 * 1024
+UPLOAD_PROOF_BYTES = 64 * 1024
+UPLOAD_PART_RANGE = (256 * 1024, 64 * 1024 * 1024)
+UPLOAD_KEEP_SEC   = _env_int("GETSUBTITLES_UPLOAD_KEEP_SEC", 6 * 3600)  # idle uploads kept for dedup/resume
+UPLOAD_STALL_SEC  = _env_int("GETSUBTITLES_UPLOAD_STALL_SEC", 600)  # early decode gives up after this
+
+def upload_missing(up: dict) -> List[int]:
+    if up["status"] == "complete":
+        return []
+    have = JOB_STORE.upload_chunks(up["upload_id"])
+    return [i for i in range(up["chunks"]) if i not in have]
+
+def upload_prefix_bytes(up: dict) -> int:
+    """Bytes at the start of the file that have all arrived."""
+    if up["status"] == "complete":
+        return up["size"]
+    have = JOB_STORE.upload_chunks(up["upload_id"])
+    n = 0
+    while n in have:
+        n += 1
+    return min(n * up["chunk_size"], up["size"])
+
+def upload_view(up: dict) -> dict:
+    missing = upload_missing(up)
+    last = up["size"] - (up["chunks"] - 1) * up["chunk_size"]
+    missing_bytes = sum(last if i == up["chunks"] - 1 else up["chunk_size"] for i in missing)
+    return {
+        "upload_id": up["upload_id"],
+        "status": up["status"],
+        "size": up["size"],
+        "chunk_size": up["chunk_size"],
+        "chunks": up["chunks"],
+        "missing": missing,
+        "received_bytes": up["size"] - missing_bytes,
+        "deduplicated": up.get("deduplicated", False),
+        "proof": up.get("proof") and {k: up["proof"][k] for k in ("offset", "length")},
+        "job_id": up.get("job_id"),
+    }
+
+def write_chunk(up: dict, idx: int, data: bytes, expected_sha: Optional[str]) -> Optional[str]:
+    """Store one chunk at its offset; returns an error message instead on bad input."""
+    expected_len = min(up["chunk_size"], up["size"] - idx * up["chunk_size"])
+    if len(data) != expected_len:
+        return f"chunk {idx} must be {expected_len} bytes, got {len(data)}"
+    digest = hashlib.sha256(data).hexdigest()
+    if expected_sha and expected_sha.lower() != digest:
+        return f"chunk {idx} does not match its sha256"
+    try:
+        with open(up["path"], "r+b") as f:
+            f.seek(idx * up["chunk_size"])
+            f.write(data)
+    except FileNotFoundError:  # completed by a dedup proof meanwhile
+        return "the upload is no longer open"
+    JOB_STORE.put_chunk(up["upload_id"], idx, digest)
+    JOB_STORE.touch_upload(up["upload_id"])
+    return None
+
+def upload_feed(upload_id: str):
+    """
+    The upload's bytes in order as they arrive; ends once it is complete and fully read.
+    The file is opened with the first bytes: until then a dedup proof may point the
+    upload at another file.
+    """
+    sent = 0
+    last_progress = time.time()
+    f = None
+    try:
+        while True:
+            up = JOB_STORE.get_upload(upload_id)
+            if up is None or up["status"] == "aborted":
+                raise RuntimeError("the upload was cancelled")
+            available = upload_prefix_bytes(up)
+            if available and f is None:
+                f = open(up["path"], "rb")
+            while sent < available:
+                f.seek(sent)
+                block = f.read(min(UPLOAD_CHUNK_SIZE, available - sent))
+                sent += len(block)
+                yield block
+                last_progress = time.time()
+            if up["status"] == "complete":
+                return
+            if time.time() - last_progress > UPLOAD_STALL_SEC:
+                raise RuntimeError(f"no upload data for {UPLOAD_STALL_SEC}s")
+            time.sleep(0.5)
+    finally:
+        if f is not None:
+            f.close()
+
+def wait_for_upload(upload_id: str) -> dict:
+    last = (time.time(), -1)
+    while True:
+        up = JOB_STORE.get_upload(upload_id)
+        if up is None or up["status"] == "aborted":
+            raise RuntimeError("the upload was cancelled")
+        if up["status"] == "complete":
+            return up
+        received = len(JOB_STORE.upload_chunks(upload_id))
+        if received != last[1]:
+            last = (time.time(), received)
+        elif time.time() - last[0] > UPLOAD_STALL_SEC:
+            raise RuntimeError(f"no upload data for {UPLOAD_STALL_SEC}s")
+        time.sleep(0.5)
+
+def decode_upload(job: Job, pcm_path: Path) -> np.ndarray:
+    """
+    Decode an upload that may still be arriving: ffmpeg reads the received prefix through
+    a pipe and waits for the next chunks. Containers that need seeking (e.g. MP4 with the
+    index at the end) fail on a pipe; those are decoded from the file once it is complete.
+    """
+    upload_id = job.params["upload_id"]
+    src = Path(job.params["src_path"])
+    try:
+        audio = decode_pcm(src, pcm_path, feed=upload_feed(upload_id), job_id=job.job_id)
+    except RuntimeError as e:
+        up = JOB_STORE.get_upload(upload_id)
+        if up is None or up["status"] == "aborted":
+            raise
+        print(f"[GETSUBTITLES] Decoding upload {upload_id} while it arrives failed ({e}); "
+              f"decoding after the upload")
+        up = wait_for_upload(upload_id)
+        audio = decode_pcm(Path(up["path"]), pcm_path, job_id=job.job_id)
+    up = wait_for_upload(upload_id)
+    job.params["source_hash"] = up["sha256"]
+    if up.get("deduplicated"):  # proven after the job started: nothing was sent
+        job.params["src_path"] = up["path"]
+        job.transfer = dict(job.transfer or {}, sent_bytes=0, deduplicated=True)
+    else:
+        job.timings["upload"] = up["completed_at"] - up["created_at"]
+    return audio
+
+def finish_upload(up: dict, claimed_sha: Optional[str]) -> Optional[str]:
+    """Hash the assembled file and mark the upload complete; returns an error message instead."""
+    missing = upload_missing(up)
+    if missing:
+        return f"{len(missing)} chunk(s) missing, e.g. {missing[0]}"
+    sha = file_sha256(Path(up["path"]))
+    if claimed_sha and claimed_sha.lower() != sha:
+        return "the assembled file does not match its sha256; re-send the chunks"
+    up.update(status="complete", sha256=sha, completed_at=time.time(), updated_at=time.time())
+    JOB_STORE.save_upload(up)
+    return None
+
+@app.post("/uploads")
+def upload_create(
+    filename: str = Form(...),
+    size: int = Form(...),
+    sha256: str = Form(None),
+    chunk_size: int = Form(UPLOAD_PART_SIZE),
+    start: bool = Form(False),
+    original_bytes: int = Form(0),
+    extract_sec: float = Form(0.0),
+    language: str = Form("auto"),
+    task: str = Form("transcribe"),
+    model_choice: str = Form("fast"),
+    output_dir: str = Form(None),
+    style: str = Form("default"),
+    priority: int = Form(0),
+    long_mode: str = Form("auto"),
+    layout: str = Form(None),
+    vad: str = Form("off"),
+    refine: str = Form("off"),
+):
+    """
+    Start a resumable upload of `size` bytes. With `sha256` of a file the server already
+    has, the response carries a `proof` challenge (a random byte range); answering it at
+    POST /uploads/{id}/proof completes the upload without sending it (`deduplicated`).
+    With `start`, the job is created now (settings as for /transcribe_start) and decoding
+    begins on the chunks received so far.
+    A client that extracted the audio track first reports the size of its original file in
+    `original_bytes` and the extraction time in `extract_sec`; /progress reports the savings.
+    """
+    if size <= 0:
+        return JSONResponse({"error": "size must be positive"}, status_code=400)
+    if not UPLOAD_PART_RANGE[0] <= chunk_size <= UPLOAD_PART_RANGE[1]:
+        return JSONResponse({"error": f"chunk_size must be within {UPLOAD_PART_RANGE}"}, status_code=400)
+    try:
+        settings = _job_settings(language, task, model_choice, style, long_mode, layout, vad, refine) if start else None
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    upload_id = "u" + uuid4().hex[:12]
+    now = time.time()
+    up = {"upload_id": upload_id, "filename": Path(filename).name or "upload", "size": size,
+          "chunk_size": chunk_size, "chunks": -(-size // chunk_size), "sha256": None, "status": "open",
+          "created_at": now, "updated_at": now, "job_id": None,
+          "original_bytes": max(original_bytes, size), "extract_sec": max(extract_sec, 0.0)}
+    known = JOB_STORE.find_upload(sha256.lower()) if sha256 else None
+    if known is not None and known["size"] == size:
+        JOB_STORE.touch_upload(known["upload_id"])  # keeps the shared file around for a while longer
+        length = min(UPLOAD_PROOF_BYTES, size)
+        up["proof"] = {"offset": secrets.randbelow(size - length + 1), "length": length,
+                       "upload_id": known["upload_id"]}
+    full = JANITOR.make_room(size)
+    if full:
+        return storage_full(full)
+    up["path"] = str(UPLOAD_DIR / f"{upload_id}_{up['filename']}")
+    with open(up["path"], "wb") as f:
+        f.truncate(size)
+    JOB_STORE.add_upload(up)
+
+    if settings is not None:
+        up["job_id"] = _start_upload_job(up, settings, output_dir, priority)
+        JOB_STORE.save_upload(up)
+    return upload_view(up)
+
+def _start_upload_job(up: dict, settings: dict, output_dir: Optional[str], priority: int) -> str:
+    job_id = str(uuid4())[:8]
+    out_dir = Path(output_dir).expanduser() if output_dir else DEFAULT_OUTPUT_DIR
+    out_dir.mkdir(parents=True, exist_ok=True)
+    deduplicated = up.get("deduplicated", False)
+    transfer = {"original_bytes": up["original_bytes"], "sent_bytes": 0 if deduplicated else up["size"],
+                "extract_sec": up["extract_sec"], "deduplicated": deduplicated}
+    if up["status"] == "complete":
+        timings = {} if deduplicated else {"upload": up["completed_at"] - up["created_at"]}
+        enqueue_job(job_id, up["filename"], Path(up["path"]), settings, out_dir, priority,
+                    source_hash=up["sha256"], keep_source=True, timings=timings, transfer=transfer)
+    else:
+        enqueue_job(job_id, up["filename"], Path(up["path"]), dict(settings, upload_id=up["upload_id"]),
+                    out_dir, priority, keep_source=True, transfer=transfer)
+    return job_id
+
+def _range_sha256(path: Path, offset: int, length: int) -> str:
+    with path.open("rb") as f:
+        f.seek(offset)
+        return hashlib.sha256(f.read(length)).hexdigest()
+
+@app.post("/uploads/{upload_id}/proof")
+def upload_proof(upload_id: str, sha256: str = Form(...)):
+    """
+    Answer the dedup challenge with the sha256 of the bytes in the `proof` range. A right
+    answer completes the upload with the file the server has; there is one try, after a
+    wrong one (or once chunks were sent) the file is uploaded as usual.
+    """
+    up = JOB_STORE.get_upload(upload_id)
+    if up is None:
+        return JSONResponse({"error": "unknown upload"}, status_code=404)
+    proof = up.pop("proof", None)
+    if up["status"] != "open" or proof is None:
+        return JSONResponse({"error": "no dedup challenge for this upload"}, status_code=409)
+    JOB_STORE.save_upload(up)  # one answer per challenge
+    known = JOB_STORE.get_upload(proof["upload_id"])
+    if (known is None or known["status"] != "complete" or not Path(known["path"]).exists()
+            or _range_sha256(Path(known["path"]), proof["offset"], proof["length"]) != sha256.lower()):
+        return JSONResponse({"error": "the proof does not match; send the chunks"}, status_code=409)
+    own = Path(up["path"])
+    now = time.time()
+    up.update(status="complete", sha256=known["sha256"], path=known["path"], deduplicated=True,
+              completed_at=now, updated_at=now)
+    if not JOB_STORE.save_upload_unless_chunks(up):
+        return JSONResponse({"error": "chunks were already sent; complete the upload"}, status_code=409)
+    JOB_STORE.touch_upload(known["upload_id"])
+    remove_job_files(own)
+    return upload_view(up)
+
+@app.get("/uploads/{upload_id}")
+def upload_status(upload_id: str):
+    """What the server has: `missing` lists the chunk numbers still to send (for resuming)."""
+    up = JOB_STORE.get_upload(upload_id)
+    if up is None:
+        return JSONResponse({"error": "unknown upload"}, status_code=404)
+    return upload_view(up)
+
+@app.put("/uploads/{upload_id}/chunks/{index}")
+async def upload_chunk(upload_id: str, index: int, request: Request):
+    """Raw chunk bytes; an `X-Chunk-Sha256` header is verified. Re-sending a chunk is harmless."""
+    up = await run_in_threadpool(JOB_STORE.get_upload, upload_id)
+    if up is None:
+        return JSONResponse({"error": "unknown upload"}, status_code=404)
+    if up["status"] != "open":
+        return JSONResponse({"error": f"upload is {up['status']}"}, status_code=409)
+    if not 0 <= index < up["chunks"]:
+        return JSONResponse({"error": f"chunk index must be 0..{up['chunks'] - 1}"}, status_code=400)
+    data = await request.body()
+    err = await run_in_threadpool(write_chunk, up, index, data, request.headers.get("x-chunk-sha256"))
+    if err:
+        return JSONResponse({"error": err}, status_code=400)
+    return {"upload_id": upload_id, "index": index, "missing": len(await run_in_threadpool(upload_missing, up))}
+
+@app.post("/uploads/{upload_id}/complete")
+async def upload_complete(
+    upload_id: str,
+    sha256: str = Form(None),
+    language: str = Form("auto"),
+    task: str = Form("transcribe"),
+    model_choice: str = Form("fast"),
+    output_dir: str = Form(None),
+    style: str = Form("default"),
+    priority: int = Form(0),
+    long_mode: str = Form("auto"),
+    layout: str = Form(None),
+    vad: str = Form("off"),
+    refine: str = Form("off"),
+):
+    """Verify and close the upload; starts the job unless it was started at creation."""
+    up = await run_in_threadpool(JOB_STORE.get_upload, upload_id)
+    if up is None:
+        return JSONResponse({"error": "unknown upload"}, status_code=404)
+    if up["status"] == "aborted":
+        return JSONResponse({"error": "upload was cancelled"}, status_code=409)
+    if up["status"] == "open":
+        err = await run_in_threadpool(finish_upload, up, sha256)
+        if err:
+            return JSONResponse({"error": err}, status_code=409)
+    if not up.get("job_id"):
+        try:
+            settings = _job_settings(language, task, model_choice, style, long_mode, layout, vad, refine)
+        except ValueError as e:
+            return JSONResponse({"error": str(e)}, status_code=400)
+        up["job_id"] = await run_in_threadpool(_start_upload_job, up, settings, output_dir, priority)
+        await run_in_threadpool(JOB_STORE.save_upload, up)
+    return {"job_id": up["job_id"], "upload_id": upload_id, "sha256": up["sha256"],
+            "original_filename": up["filename"]}
+
+def abort_upload(up: dict):
+    """Stop an open upload; a job decoding it fails (or is cancelled) at its next read."""
+    if up["status"] == "open":
+        up.update(status="aborted", updated_at=time.time())
+        JOB_STORE.save_upload(up)
+        remove_job_files(Path(up["path"]))
+
+@app.delete("/uploads/{upload_id}")
+def upload_abort(upload_id: str):
+    up = JOB_STORE.get_upload(upload_id)
+    if up is None:
+        return JSONResponse({"error": "unknown upload"}, status_code=404)
+    abort_upload(up)
+    return {"upload_id": upload_id, "status": up["status"]}
+
+# ---------- Cancellation, retention and disk quota ----------
+# A janitor on the heartbeat loop deletes finished jobs (record, transcript, renders) after
+# JOB_TTL_SEC, idle uploads after UPLOAD_KEEP_SEC and files nothing refers to any more.
+# Only the process holding the "janitor" lease in the job store sweeps; another one takes
+# over once the holder stops renewing it.
+# New uploads get 507 + Retry-After while the upload folder or the disk is full.
+JOB_TTL_SEC      = _env_int("GETSUBTITLES_JOB_TTL_SEC", 7 * 24 * 3600)  # 0 keeps jobs forever
+OUTPUT_TTL_SEC   = _env_int("GETSUBTITLES_OUTPUT_TTL_SEC", 0)  # subtitles in DEFAULT_OUTPUT_DIR; 0 keeps them
+UPLOAD_QUOTA_MB  = _env_int("GETSUBTITLES_UPLOAD_QUOTA_MB", 0)  # 0: no limit for UPLOAD_DIR
+MIN_FREE_MB      = _env_int("GETSUBTITLES_MIN_FREE_MB", 512)   # free space left on the upload disk
+JANITOR_INTERVAL = 60
+QUOTA_RETRY_SEC  = 30
+_JOB_OUTPUT_NAME = re.compile(r"^[0-9a-f]{8}\.srt$")  # {job_id}.srt written by run_transcription
+
+def _dir_bytes(path: Path) -> int:
+    """Apparent size of the files directly in `path` (open uploads count at their full size)."""
+    total = 0
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.is_file(follow_symlinks=False):
+                    try:
+                        total += entry.stat(follow_symlinks=False).st_size
+                    except OSError:
+                        pass
+    except OSError:
+        pass
+    return total
+
+def _rss_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+class Janitor:
+    """Retention and disk-quota housekeeping. The counters cover this process only."""
+
+    LEASE_TTL = 3 * JANITOR_INTERVAL  # the holder renews on every run
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_run = 0.0
+        self.stats = {"runs": 0, "last_run_at": None, "jobs_deleted": 0, "uploads_deleted": 0,
+                      "files_deleted": 0, "bytes_reclaimed": 0, "uploads_refused": 0}
+
+    def _remove(self, path: Path) -> int:
+        try:
+            size = path.stat().st_size
+            path.unlink()
+        except FileNotFoundError:
+            return 0
+        except OSError as e:
+            print(f"[GETSUBTITLES] Could not remove {path}: {e}")
+            return 0
+        self.stats["files_deleted"] += 1
+        self.stats["bytes_reclaimed"] += size
+        METRICS.inc("getsubtitles_reclaimed_bytes_total", size)
+        return size
+
+    def run(self, force: bool = False):
+        with self._lock:
+            if not force and time.time() - self._last_run < JANITOR_INTERVAL:
+                return
+            now = self._last_run = time.time()
+            if not force and not JOB_STORE.take_lease("janitor", WORKER_ID, self.LEASE_TTL):
+                return  # another process sweeps
+            self.expire_uploads(now - UPLOAD_KEEP_SEC)
+            if JOB_TTL_SEC > 0:
+                self.expire_jobs(now - JOB_TTL_SEC)
+            self.sweep_files(now)
+            self.stats["runs"] += 1
+            self.stats["last_run_at"] = now
+
+    def expire_uploads(self, before: float, need: Optional[int] = None) -> int:
+        """Delete uploads idle since `before` that no queued or running job reads, oldest first;
+        with `need`, stop once that many bytes are free."""
+        stale = sorted(JOB_STORE.stale_uploads(before), key=lambda up: up["updated_at"])
+        if not stale:
+            return 0
+        in_use = JOB_STORE.unfinished_sources()
+        freed = 0
+        for up in stale:
+            if need is not None and freed >= need:
+                break
+            if up["path"] in in_use:
+                continue
+            if not up.get("deduplicated"):
+                freed += self._remove(Path(up["path"]))
+            JOB_STORE.delete_upload(up["upload_id"])
+            self.stats["uploads_deleted"] += 1
+        return freed
+
+    def expire_jobs(self, before: float):
+        jobs = JOB_STORE.expired_jobs(before)
+        for job in jobs:
+            self._remove(TRANSCRIPT_DIR / f"{job.job_id}.json.gz")
+            for p in RENDER_DIR.glob(f"{job.job_id}.*"):
+                self._remove(p)
+        JOB_STORE.delete_jobs([j.job_id for j in jobs])
+        JOB_STORE.prune_batches(before)
+        self.stats["jobs_deleted"] += len(jobs)
+        if jobs:
+            print(f"[GETSUBTITLES] Deleted {len(jobs)} job(s) finished more than {JOB_TTL_SEC}s ago")
+
+    def sweep_files(self, now: float):
+        """Leftovers of crashed jobs in UPLOAD_DIR and, with OUTPUT_TTL_SEC, old default outputs."""
+        busy = JOB_STORE.unfinished()
+        busy_ids = tuple(j.job_id for j in busy)
+        keep = {Path(j.params["src_path"]).name for j in busy if j.params.get("src_path")}
+        keep |= {Path(p).name for p in JOB_STORE.upload_paths()}
+        for p in list(UPLOAD_DIR.iterdir()):
+            try:
+                stale = p.is_file() and p.stat().st_mtime < now - UPLOAD_KEEP_SEC
+            except OSError:
+                continue
+            if stale and p.name not in keep and not p.name.startswith(busy_ids):
+                self._remove(p)
+        if OUTPUT_TTL_SEC > 0:
+            for p in list(DEFAULT_OUTPUT_DIR.glob("*.srt")):
+                try:
+                    stale = p.stat().st_mtime < now - OUTPUT_TTL_SEC
+                except OSError:
+                    continue
+                if stale and _JOB_OUTPUT_NAME.match(p.name) and p.stem not in busy_ids:
+                    self._remove(p)
+
+    def _shortage(self, incoming: int) -> Optional[Tuple[str, int]]:
+        if UPLOAD_QUOTA_MB > 0:
+            quota = UPLOAD_QUOTA_MB * 1024 * 1024
+            used = _dir_bytes(UPLOAD_DIR)
+            if used + incoming > quota:
+                return (f"upload storage is full ({used / 1e6:.0f} of {quota / 1e6:.0f} MB in use)",
+                        used + incoming - quota)
+        reserve = MIN_FREE_MB * 1024 * 1024
+        free = shutil.disk_usage(UPLOAD_DIR).free
+        if free - incoming < reserve:
+            return "not enough free disk space on the server", reserve - (free - incoming)
+        return None
+
+    def make_room(self, incoming: int) -> Optional[str]:
+        """None if `incoming` more bytes fit, after evicting idle uploads if needed; else the reason."""
+        short = self._shortage(incoming)
+        if short is not None:
+            with self._lock:
+                self.expire_uploads(time.time() - JANITOR_INTERVAL, need=short[1])
+            short = self._shortage(incoming)
+        if short is None:
+            return None
+        self.stats["uploads_refused"] += 1
+        METRICS.inc("getsubtitles_uploads_refused_total")
+        print(f"[GETSUBTITLES] Refused an upload of {incoming} bytes: {short[0]}")
+        return short[0]
+
+JANITOR = Janitor()
+
+METRICS.describe("getsubtitles_reclaimed_bytes_total", "counter", "Bytes deleted by the janitor.")
+METRICS.describe("getsubtitles_uploads_refused_total", "counter", "Uploads refused because the disk or quota was full.")
+METRICS.describe("getsubtitles_upload_dir_bytes", "gauge", "Bytes held in the upload folder.")
+METRICS.gauge("getsubtitles_upload_dir_bytes", lambda: _dir_bytes(UPLOAD_DIR))
+
+def storage_full(reason: str) -> JSONResponse:
+    return JSONResponse({"error": f"{reason}; try again later", "retry_after_sec": QUOTA_RETRY_SEC},
+                        status_code=507, headers={"Retry-After": str(QUOTA_RETRY_SEC)})
+
+# Form uploads are spooled to disk before a handler runs, so they are checked from Content-Length
+# here. Large files are better sent through /uploads, which is refused at create time.
+FORM_UPLOAD_PATHS = ("/transcribe_start", "/batch_start")
+
+@app.middleware("http")
+async def refuse_form_uploads_over_quota(request: Request, call_next):
+    if request.method == "POST" and request.url.path in FORM_UPLOAD_PATHS:
+        length = request.headers.get("content-length", "")
+        if length.isdigit():
+            full = await run_in_threadpool(JANITOR.make_room, int(length))
+            if full:
+                return storage_full(full)
+    return await call_next(request)
+
+def cancel_job(job_id: str) -> Optional[Job]:
+    job = JOB_STORE.get(job_id)
+    if job is None or job.status in FINISHED_STATES:
+        return job
+    job = JOB_STORE.request_cancel(job_id)
+    upload_id = job.params.get("upload_id")
+    up = JOB_STORE.get_upload(upload_id) if upload_id else None
+    if up is not None:
+        abort_upload(up)  # the client's next chunk gets 409
+    if job.status == "cancelled":  # it was still queued, so no worker will clean up after it
+        if not job.params.get("keep_source"):
+            remove_job_files(Path(job.params["src_path"]))
+        _record_job_metrics(job)
+    return job
+
+@app.post("/cancel/{job_id}")
+def cancel(job_id: str):
+    """
+    Cancel a job. A queued job is cancelled at once; a running one stops at its next
+    progress check (about every half second, also in long-file chunk processes).
+    """
+    job = cancel_job(job_id)
+    if job is None:
+        return JSONResponse({"error": "unknown job"}, status_code=404)
+    return dict(progress_payload(job), job_id=job_id)
+
+@app.post("/batch/{batch_id}/cancel")
+def batch_cancel(batch_id: str):
+    batch = JOB_STORE.get_batch(batch_id)
+    if not batch:
+        return JSONResponse({"error": "unknown batch"}, status_code=404)
+    for job_id in batch["job_ids"]:
+        cancel_job(job_id)
+    return batch_progress(batch_id)
+
+@app.get("/storage/stats")
+def storage_stats():
+    db = JOB_STORE.path
+    return {
+        "bytes": {
+            "uploads": _dir_bytes(UPLOAD_DIR),
+            "transcripts": _dir_bytes(TRANSCRIPT_DIR),
+            "renders": _dir_bytes(RENDER_DIR),
+            "outputs": _dir_bytes(DEFAULT_OUTPUT_DIR),
+            "job_store": sum(p.stat().st_size for p in (db, Path(f"{db}-wal")) if p.exists()),
+        },
+        "disk_free_bytes": shutil.disk_usage(UPLOAD_DIR).free,
+        "upload_quota_mb": UPLOAD_QUOTA_MB or None,
+        "min_free_mb": MIN_FREE_MB,
+        "job_ttl_sec": JOB_TTL_SEC or None,
+        "output_ttl_sec": OUTPUT_TTL_SEC or None,
+        "upload_keep_sec": UPLOAD_KEEP_SEC,
+        "jobs": JOB_STORE.status_counts(),
+        "rss_bytes": _rss_bytes(),
+        "janitor": dict(JANITOR.stats),
+    }
+
+@app.post("/storage/cleanup")
+def storage_cleanup():
+    """Run the janitor now instead of waiting for its next round."""
+    JANITOR.run(force=True)
+    return storage_stats()
+
+# ---------- Batch API ----------
+MEDIA_EXTENSIONS = {".mp4", ".mkv", ".mov", ".avi", ".webm", ".m4v", ".ts", ".flv", ".wmv",
+                    ".mp3", ".wav", ".m4a", ".aac", ".flac", ".ogg", ".opus", ".wma"}
+
+# Server-local batch sources over HTTP must lie under this folder; unset, /batch_start takes uploads only.
+BATCH_SOURCE_ROOT = os.environ.get("GETSUBTITLES_BATCH_SOURCE_ROOT", "").strip()
+
+def _within(path: Path, root: Optional[Path]) -> Path:
+    """`path` with symlinks resolved; raises ValueError when it lies outside `root`."""
+    real = path.resolve()
+    if root is not None and not real.is_relative_to(root):
+        raise ValueError(f"{path} is outside the batch source folder")
+    return real
+
+def _batch_sources(source_dir: Optional[str], manifest: Optional[str],
+                   root: Optional[Path] = None) -> List[Path]:
+    """
+    Server-local media listed by a directory (recursive) and/or a manifest file.
+    With `root`, the folder, the manifest and every file in them must lie under it
+    (relative paths are taken from `root`).
+    """
+    if root is not None:
+        root = root.expanduser().resolve()
+    base = root or Path.cwd()
+    paths: List[Path] = []
+    if source_dir:
+        folder = _within(base / Path(source_dir).expanduser(), root)
+        if not folder.is_dir():
+            raise ValueError(f"source_dir is not a directory: {source_dir}")
+        paths += sorted(p for p in folder.rglob("*") if p.is_file() and p.suffix.lower() in MEDIA_EXTENSIONS)
+    if manifest:
+        mpath = _within(base / Path(manifest).expanduser(), root)
+        text = mpath.read_text(encoding="utf-8")
+        entries = json.loads(text) if mpath.suffix.lower() == ".json" else [
+            line.strip() for line in text.splitlines() if line.strip() and not line.strip().startswith("#")
+        ]
+        for entry in entries:
+            p = Path(entry).expanduser()
+            paths.append(p if p.is_absolute() else mpath.parent / p)
+    paths = [_within(p, root) for p in paths]
+    missing = [str(p) for p in paths if not p.is_file()]
+    if missing:
+        raise ValueError(f"{len(missing)} file(s) not found, e.g. {missing[0]}")
+    return paths
+
+@app.post("/batch_start")
+async def batch_start(
+    files: List[UploadFile] = File(None),
+    source_dir: str = Form(None),
+    manifest: str = Form(None),
+    language: str = Form("auto"),
+    task: str = Form("transcribe"),
+    model_choice: str = Form("fast"),
+    output_dir: str = Form(None),
+    style: str = Form("default"),
+    priority: int = Form(0),
+    long_mode: str = Form("auto"),
+    layout: str = Form(None),
+    vad: str = Form("off"),
+    refine: str = Form("off"),
+):
+    """
+    Start many jobs under one batch id: uploaded `files`, and/or server-local media from
+    `source_dir` / `manifest` (one path per line, or a .json list). Local files are read
+    in place and never deleted.
+    """
+    try:
+        settings = _job_settings(language, task, model_choice, style, long_mode, layout, vad, refine)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    if (source_dir or manifest) and not BATCH_SOURCE_ROOT:
+        return JSONResponse({"error": "server-local sources are disabled "
+                                      "(set GETSUBTITLES_BATCH_SOURCE_ROOT to allow a folder)"}, status_code=403)
+    try:
+        local = await run_in_threadpool(_batch_sources, source_dir, manifest, Path(BATCH_SOURCE_ROOT))
+    except (OSError, ValueError) as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    if not files and not local:
+        return JSONResponse({"error": "no files given"}, status_code=400)
+    full = await run_in_threadpool(JANITOR.make_room, sum(f.size or 0 for f in files or []))
+    if full:
+        return storage_full(full)
+
+    batch_id = "b" + str(uuid4())[:8]
+    out_dir = Path(output_dir).expanduser() if output_dir else DEFAULT_OUTPUT_DIR
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    # Save the uploads first, then write the batch and all its jobs in one transaction.
+    jobs: List[Job] = []
+    try:
+        for f in files or []:
+            job_id = str(uuid4())[:8]
+            src_path = UPLOAD_DIR / f"{job_id}_{Path(f.filename or 'upload').name}"
+            t0 = time.time()
+            _, source_hash = await run_in_threadpool(save_upload, f.file, src_path)
+            jobs.append(await run_in_threadpool(build_job, job_id, f.filename, src_path, settings, out_dir,
+                                                priority, source_hash, batch_id,
+                                                timings={"upload": time.time() - t0}))
+        for p in local:
+            jobs.append(build_job(str(uuid4())[:8], p.name, p, settings, out_dir, priority, None, batch_id, True))
+
+        job_ids = [j.job_id for j in jobs]
+        await run_in_threadpool(JOB_STORE.add_batch, batch_id,
+                                {"batch_id": batch_id, "created_at": time.time(), "job_ids": job_ids,
+                                 "settings": settings}, jobs)
+    except BaseException:
+        remove_job_files(*(Path(j.params["src_path"]) for j in jobs if not j.params["keep_source"]))
+        raise
+    SCHEDULER.wake(sum(j.status == "queued" for j in jobs))
+    return {"batch_id": batch_id, "job_ids": job_ids, "count": len(job_ids)}
+
+def _build_batch_zip(jobs: List[Job], zip_path: Path, fmt: str = "srt") -> int:
+    names = set()
+    written = 0
+    with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for j in jobs:
+            if j.status != "done":
+                continue
+            src = j.srt_path if fmt == "srt" else render_output(j, fmt)
+            if not src or not src.exists():
+                continue
+            name = Path(j.original_name or j.job_id).with_suffix(f".{fmt}").name
+            if name in names:
+                name = f"{Path(name).stem}_{j.job_id}.{fmt}"
+            names.add(name)
+            zf.write(src, arcname=name)
+            written += 1
+    return written
+
+@app.get("/batch/{batch_id}.zip")
+async def batch_zip(batch_id: str, format: str = "srt"):
+    if format not in OUTPUT_FORMATS:
+        return JSONResponse({"error": f"unknown format (choose from {', '.join(OUTPUT_FORMATS)})"},
+                            status_code=400)
+    batch = await run_in_threadpool(JOB_STORE.get_batch, batch_id)
+    if not batch:
+        return JSONResponse({"error": "unknown batch"}, status_code=404)
+    jobs = await run_in_threadpool(JOB_STORE.get_many, batch["job_ids"])
+    fd, tmp = tempfile.mkstemp(suffix=".zip", dir=UPLOAD_DIR)
+    os.close(fd)
+    zip_path = Path(tmp)
+    await run_in_threadpool(_build_batch_zip, jobs, zip_path, format)
+    return FileResponse(zip_path, media_type="application/zip", filename=f"{batch_id}.zip",
+                        background=BackgroundTask(remove_job_files, zip_path))
+
+@app.get("/batch/{batch_id}")
+def batch_progress(batch_id: str):
+    batch = JOB_STORE.get_batch(batch_id)
+    if not batch:
+        return JSONResponse({"error": "unknown batch"}, status_code=404)
+    jobs = JOB_STORE.get_many(batch["job_ids"])
+
+    counts: Dict[str, int] = {}
+    for j in jobs:
+        counts[j.status] = counts.get(j.status, 0) + 1
+    finished = [j for j in jobs if j.status in FINISHED_STATES]
+    done_audio = sum(j.duration for j in jobs if j.status == "done")
+    end = max((j.finished_at or 0.0) for j in finished) if len(finished) == len(jobs) else time.time()
+    wall = max(end - batch["created_at"], 1e-6)
+    progress = sum(1.0 if j.status in FINISHED_STATES else j.progress for j in jobs) / max(len(jobs), 1)
+
+    return {
+        "batch_id": batch_id,
+        "total": len(jobs),
+        "counts": counts,
+        "finished": len(finished) == len(jobs),
+        "progress": round(progress, 4),
+        "eta_sec": round(wall * (1 - progress) / progress, 1) if 0 < progress < 1 else None,
+        "audio_sec_done": round(done_audio, 1),
+        "wall_sec": round(wall, 1),
+        "throughput": round(done_audio / wall, 2),  # audio seconds per wall second
+        "zip_url": f"/batch/{batch_id}.zip",
+        "jobs": [
+            {"job_id": j.job_id, "file": j.original_name, "status": j.status,
+             "progress": round(j.progress, 4), "error": j.error_msg}
+            for j in jobs
+        ],
+    }
+
+# ---------- Push channel (Server-Sent Events) ----------
+PUSH_FALLBACK_POLL = 1.0  # re-read the store this often in case another process updated the job
+CUE_POLL_INTERVAL  = 0.25  # check a streamed SRT this often for cues written by another process
+EVENTS_POLL_OVERLAP = 2.0  # /events re-reads this much of the past, for saves that committed late
+
+class ProgressHub:
+    """
+    Fans job updates out to SSE subscribers. JobStore.save() publishes the new
+    progress payload; the segment loop pokes subscribers when a cue was written.
+    Publishers run on worker threads, subscribers are asyncio queues. Only updates
+    of this process are pushed: the SSE routes poll the store (and the SRT file)
+    for those of worker processes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subs: Dict[str, set] = {}  # job_id or "*" -> {(loop, queue)}
+
+    def subscribe(self, key: str) -> asyncio.Queue:
+        q: asyncio.Queue = asyncio.Queue(maxsize=256)
+        with self._lock:
+            self._subs.setdefault(key, set()).add((asyncio.get_running_loop(), q))
+        return q
+
+    def unsubscribe(self, key: str, q: asyncio.Queue):
+        with self._lock:
+            subs = self._subs.get(key, set())
+            subs.difference_update({s for s in subs if s[1] is q})
+            if not subs:
+                self._subs.pop(key, None)
+
+    def _targets(self, job_id: str) -> list:
+        with self._lock:
+            return list(self._subs.get(job_id, ())) + list(self._subs.get("*", ()))
+
+    def publish(self, job: Job):
+        targets = self._targets(job.job_id)
+        if targets:
+            payload = dict(progress_payload(job), job_id=job.job_id)
+            for loop, q in targets:
+                loop.call_soon_threadsafe(self._offer, q, payload)
+
+    def poke(self, job_id: str):
+        with self._lock:
+            targets = list(self._subs.get(job_id, ()))
+        for loop, q in targets:
+            loop.call_soon_threadsafe(self._offer, q, None)
+
+    @staticmethod
+    def _offer(q: asyncio.Queue, item):
+        if q.full():
+            q.get_nowait()  # slow consumer: drop the oldest update, the next one supersedes it
+        q.put_nowait(item)
+
+PROGRESS_HUB = ProgressHub()
+JOB_STORE.listeners.append(PROGRESS_HUB.publish)
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+class JobGone(Exception):
+    """The job was deleted (retention janitor, batch pruning) while a client followed it."""
+
+def _gone_event(job_id: str) -> str:
+    return _sse("error", {"job_id": job_id, "status": "error", "error": "the job no longer exists"})
+
+def _file_signature(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+async def _next_update(q: asyncio.Queue, job_id: str, watch: Optional[Path] = None,
+                       seen: Optional[Tuple[int, int]] = None) -> Optional[dict]:
+    """
+    Next pushed payload for the job (None for a cue poke); falls back to reading the store.
+    With `watch`, a change of that file from its `seen` signature is a cue poke too, so
+    cues written by a worker process wake the stream although its pokes stay in that process.
+    """
+    deadline = time.monotonic() + PUSH_FALLBACK_POLL
+    while True:
+        timeout = deadline - time.monotonic()
+        if watch is not None:
+            timeout = min(timeout, CUE_POLL_INTERVAL)
+        try:
+            return await asyncio.wait_for(q.get(), timeout=max(timeout, 0.0))
+        except asyncio.TimeoutError:
+            pass
+        if watch is not None and _file_signature(watch) != seen:
+            return None
+        if time.monotonic() >= deadline:
+            break
+    job = await run_in_threadpool(JOB_STORE.get, job_id)
+    if job is None:
+        raise JobGone(job_id)
+    return dict(await run_in_threadpool(progress_payload, job), job_id=job_id)
+
+@app.get("/events/{job_id}")
+async def job_events(job_id: str):
+    """`progress` event on every status/progress/ETA/timing change, then `done` or `error`."""
+    job = await run_in_threadpool(JOB_STORE.get, job_id)
+    if not job:
+        return JSONResponse({"error": "unknown job"}, status_code=404)
+
+    async def events():
+        q = PROGRESS_HUB.subscribe(job_id)
+        try:
+            payload = dict(await run_in_threadpool(progress_payload, job), job_id=job_id)
+            last = None
+            while True:
+                if payload is not None and payload != last:
+                    yield _sse("progress", payload)
+                    last = payload
+                    if payload["status"] in FINISHED_STATES:
+                        yield _sse(payload["status"], payload)
+                        return
+                try:
+                    payload = await _next_update(q, job_id)
+                except JobGone:
+                    yield _gone_event(job_id)
+                    return
+        finally:
+            PROGRESS_HUB.unsubscribe(job_id, q)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/events")
+async def all_job_events():
+    """
+    Multi-job feed: a `progress` event (with job_id) for every update of any job.
+    Updates of this process are pushed; those saved by worker processes are found by
+    polling the store for jobs updated since the previous poll.
+    """
+    async def events():
+        q = PROGRESS_HUB.subscribe("*")
+        try:
+            sent: Dict[str, float] = {}  # job_id -> updated_at of the last event sent
+            since = time.time()
+            next_poll = time.monotonic() + PUSH_FALLBACK_POLL
+            last_write = time.monotonic()
+            while True:
+                try:
+                    payload = await asyncio.wait_for(q.get(), timeout=max(next_poll - time.monotonic(), 0.0))
+                except asyncio.TimeoutError:
+                    payload = None
+                updates = [payload] if payload is not None else []
+                if time.monotonic() >= next_poll:
+                    # Re-read a little of the past: a save can commit after a later one was polled.
+                    polled_at = time.time()
+                    jobs = await run_in_threadpool(JOB_STORE.updated_since, since - EVENTS_POLL_OVERLAP)
+                    jobs = [j for j in jobs if j.updated_at > sent.get(j.job_id, 0.0)]
+                    updates += await run_in_threadpool(
+                        lambda: [dict(progress_payload(j), job_id=j.job_id) for j in jobs])
+                    since = polled_at
+                    sent = {k: v for k, v in sent.items() if v > since - EVENTS_POLL_OVERLAP}
+                    next_poll = time.monotonic() + PUSH_FALLBACK_POLL
+                for p in updates:
+                    if p["updated_at"] > sent.get(p["job_id"], 0.0):
+                        sent[p["job_id"]] = p["updated_at"]
+                        yield _sse("progress", p)
+                        last_write = time.monotonic()
+                if time.monotonic() - last_write >= 15.0:
+                    yield ": keep-alive\n\n"
+                    last_write = time.monotonic()
+        finally:
+            PROGRESS_HUB.unsubscribe("*", q)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def _cue_seconds(ts: str) -> float:
+    h, m, sec = ts.split(":")
+    return int(h) * 3600 + int(m) * 60 + float(sec.replace(",", "."))
+
+def _window_events(srt_path: Path, windows: list, revisions: list) -> List[str]:
+    """A `window` event with the current cues of every refined window the client hasn't seen."""
+    changed = [i for i, w in enumerate(windows) if w[2] != revisions[i]]
+    if not changed:
+        return []
+    cues, _ = read_new_cues(srt_path, 0)
+    out = []
+    for i in changed:
+        start, end, revision = windows[i]
+        revisions[i] = revision
+        out.append(_sse("window", {"window": i, "start": start, "end": end, "revision": revision,
+                                   "cues": [c for c in cues if start <= _cue_seconds(c["start"]) < end]}))
+    return out
+
+@app.get("/stream/{job_id}")
+async def stream_job(job_id: str, from_cue: int = 0):
+    """
+    Pushes `cue` events as subtitles are written, `progress` events on every change,
+    and a final `done`, `error` or `cancelled` event. `from_cue` skips cues the client
+    already has. In speculative mode, once the draft is complete a `reset` event carries
+    all cues, and each refined window then arrives as a `window` event whose cues replace
+    the ones starting between its `start` and `end`.
+    """
+    job = await run_in_threadpool(JOB_STORE.get, job_id)
+    if not job:
+        return JSONResponse({"error": "unknown job"}, status_code=404)
+    srt_path = job.out_dir / f"{job_id}.srt"
+
+    async def events():
+        q = PROGRESS_HUB.subscribe(job_id)
+        try:
+            offset, last, revisions = 0, None, None
+            payload = dict(await run_in_threadpool(progress_payload, job), job_id=job_id)
+            while True:
+                seen = _file_signature(srt_path)  # taken before reading, so no write is missed
+                refine = payload and payload["refine"]
+                if revisions is None and refine and refine["windows"]:
+                    # The draft is complete and the SRT is rewritten from now on.
+                    cues, _ = await run_in_threadpool(read_new_cues, srt_path, 0)
+                    yield _sse("reset", {"cues": cues, "windows": refine["windows"]})
+                    revisions = [w[2] for w in refine["windows"]]
+                elif revisions is None:
+                    cues, offset = await run_in_threadpool(read_new_cues, srt_path, offset)
+                    for cue in cues:
+                        if cue["index"] > from_cue:
+                            yield _sse("cue", cue)
+                elif refine:
+                    for event in await run_in_threadpool(_window_events, srt_path, refine["windows"], revisions):
+                        yield event
+                if payload is not None and payload != last:
+                    yield _sse("progress", payload)
+                    last = payload
+                    if payload["status"] in FINISHED_STATES:
+                        yield _sse(payload["status"], payload)
+                        return
+                try:
+                    payload = await _next_update(q, job_id, srt_path, seen)
+                except JobGone:
+                    yield _gone_event(job_id)
+                    return
+        finally:
+            PROGRESS_HUB.unsubscribe(job_id, q)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
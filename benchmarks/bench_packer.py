@@ -0,0 +1,159 @@
+"""
+Benchmark for the vertical subtitle packer on long synthetic transcripts.
+
+Compares build_vertical_blocks (array-based, single pass) with the previous
+string-building implementation kept below as a reference, checks that both give
+the same blocks for the default layout, and times every layout profile.
+
+    python benchmarks/bench_packer.py --words 100000,500000
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+os.environ["GETSUBTITLES_STATE_DIR"] = tempfile.mkdtemp(prefix="getsubtitles-bench-")
+os.environ.setdefault("GETSUBTITLES_CACHE_MB", "0")
+
+from app import main  # noqa: E402
+
+
+def legacy_build_vertical_blocks(words, max_chars=38, max_words=10, max_dur=2.2, min_dur=0.7):
+    """The packer as it was before WordBuffer: per-word dicts and f-string line rebuilding."""
+    def should_break(line, block_start, last_end, last_token):
+        if last_end - block_start >= max_dur:
+            return True
+        return len(line) >= max_chars - 3 and last_token and last_token[-1] in main.PUNCT_BREAK
+
+    blocks = []
+    i, n = 0, len(words)
+    while i < n:
+        line = ""
+        block_start = words[i]["start"]
+        block_end = words[i]["end"]
+        count = 0
+        j = i
+        while j < n:
+            token = words[j]["text"]
+            extra_len = (1 if line else 0) + len(token)
+            if len(line) + extra_len > max_chars and count > 0:
+                break
+            if count >= max_words:
+                break
+            line = f"{line} {token}" if line else token
+            block_end = words[j]["end"]
+            count += 1
+            j += 1
+            if should_break(line, block_start, block_end, token):
+                break
+        while j < n:
+            if block_end - block_start >= min_dur:
+                break
+            last_token = words[j - 1]["text"]
+            if last_token and last_token[-1] in {".", "!", "?"}:
+                break
+            extra_len = (1 if line else 0) + len(words[j]["text"])
+            if len(line) + extra_len > max_chars:
+                break
+            line = f"{line} {words[j]['text']}"
+            block_end = words[j]["end"]
+            count += 1
+            j += 1
+        if line.strip():
+            blocks.append({"start": block_start, "end": block_end,
+                           "text": main._clean_spaces(line.strip()), "n_words": j - i})
+        i = j if j > i else i + 1
+    return blocks
+
+
+def synth_words(n, seed=0):
+    """Word timings at roughly 2.5 words/s with pauses and sentence punctuation."""
+    rng = random.Random(seed)
+    vocab = ["the", "a", "subtitle", "video", "we", "transcribe", "really", "long", "audio",
+             "and", "then", "it", "works", "internationalization", "ok", "so", "because"]
+    words, t = [], 0.0
+    for _ in range(n):
+        token = rng.choice(vocab)
+        r = rng.random()
+        if r < 0.06:
+            token += "."
+        elif r < 0.12:
+            token += ","
+        elif r < 0.13:
+            token += "?"
+        dur = rng.uniform(0.12, 0.6)
+        words.append({"text": token, "start": t, "end": t + dur})
+        t += dur + (rng.uniform(0.3, 1.5) if r < 0.05 else rng.uniform(0.0, 0.12))
+    return words
+
+
+def traced_mb(fn):
+    """Memory held by fn's result, in MB."""
+    tracemalloc.start()
+    result = fn()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return round(size / 1e6, 2)
+
+
+def timed(fn, repeat):
+    times = []
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times), result
+
+
+def main_cli(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--words", default="100000,300000", help="comma-separated transcript sizes in words")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--out", default=None, help="write the JSON report here instead of stdout")
+    args = ap.parse_args(argv)
+
+    runs = []
+    for n in [int(x) for x in args.words.split(",") if x]:
+        print(f"[bench] {n} words ...", file=sys.stderr)
+        words = synth_words(n)
+        legacy_sec, legacy = timed(lambda: legacy_build_vertical_blocks(words), args.repeat)
+        run = {"words": n, "legacy_sec": round(legacy_sec, 4), "layouts": {}}
+        for name, layout in main.VERTICAL_LAYOUTS.items():
+            sec, blocks = timed(lambda: main.build_vertical_blocks(words, layout), args.repeat)
+            run["layouts"][name] = {
+                "sec": round(sec, 4),
+                "words_per_sec": round(n / sec),
+                "blocks": len(blocks),
+            }
+            if layout == main.DEFAULT_LAYOUT:
+                run["matches_legacy"] = blocks == legacy
+                run["speedup"] = round(legacy_sec / sec, 2)
+        buf = main.WordBuffer.from_dicts(words)
+        run["pack_only_sec"], _ = timed(lambda: buf.pack(), args.repeat)
+        run["pack_only_sec"] = round(run["pack_only_sec"], 4)
+        # Word storage: per-word dicts (the old packer's input) vs. the parallel arrays.
+        # from_dicts reuses the token strings, so the second figure is the containers alone.
+        run["words_mb_dicts"] = traced_mb(lambda: synth_words(n))
+        run["words_mb_arrays"] = traced_mb(lambda: main.WordBuffer.from_dicts(words))
+        runs.append(run)
+
+    text = json.dumps({"created_at": time.time(), "runs": runs}, indent=2)
+    if args.out:
+        Path(args.out).write_text(text, encoding="utf-8")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,331 @@
+"""
+Offline benchmark for the transcription pipeline.
+
+Measures, per synthetic audio length:
+  decode      ffmpeg -> float32 PCM (decode_pcm) and the legacy WAV path (to_wav16k_mono)
+  model_load  get_model() cold load, including the compute-type fallback chain
+  inference   consuming the segment generator
+  pack        build_vertical_blocks
+  write       SRT writers (segments, blocks, incremental stream writer)
+  memory      traced allocations of the retained Segment objects vs. the compact Transcript
+
+--sweep-cpu instead runs concurrent transcriptions under each CPU budget split
+(threads per job x concurrent jobs filling the cores) and reports throughput and
+per-job latency, to pick GETSUBTITLES_THREADS_PER_JOB / GETSUBTITLES_WORKERS.
+
+By default a stand-in model replaces WhisperModel so only the pipeline overhead is
+measured and no weights are needed. Pass --real to load the real profiles (local
+models/ folder or the Hugging Face cache).
+
+    python benchmarks/bench_pipeline.py --lengths 60,600,3600 --out bench.json
+    python benchmarks/bench_pipeline.py --real --profiles fast --lengths 60
+    python benchmarks/bench_pipeline.py --real --sweep-cpu --lengths 120
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import wave
+from pathlib import Path
+from types import SimpleNamespace
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# Keep benchmark runs out of the real job store, cache and compute-type record.
+_state = tempfile.mkdtemp(prefix="getsubtitles-bench-")
+os.environ["GETSUBTITLES_STATE_DIR"] = _state
+os.environ.setdefault("GETSUBTITLES_CACHE_MB", "0")
+
+import numpy as np  # noqa: E402
+from app import main  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+SR = main.SAMPLE_RATE
+
+
+class StubWhisperModel:
+    """
+    Stand-in for faster_whisper.WhisperModel with the same transcribe() contract.
+    Emits a segment every `segment_sec` with `words_per_sec` word timestamps, and
+    sleeps `rtf` seconds per audio second to emulate inference cost. Compute types
+    in `fail_compute` raise on construction to exercise the fallback chain.
+    """
+    rtf = 0.0
+    load_sec = 0.0
+    segment_sec = 3.0
+    words_per_sec = 2.5
+    fail_compute = set()
+
+    def __init__(self, model_id, device="cpu", compute_type="default", **kwargs):
+        if compute_type in self.fail_compute:
+            raise ValueError(f"stub: compute_type {compute_type} unsupported")
+        time.sleep(self.load_sec)
+        self.model_id = model_id
+
+    def transcribe(self, audio, task="transcribe", language=None, word_timestamps=False, **kwargs):
+        if isinstance(audio, (str, Path)):
+            with wave.open(str(audio), "rb") as wf:
+                duration = wf.getnframes() / wf.getframerate()
+        else:
+            duration = len(audio) / SR
+        info = SimpleNamespace(language=language or "en", language_probability=1.0, duration=duration)
+        return self._segments(duration, word_timestamps), info
+
+    def _segments(self, duration, word_timestamps):
+        t = 0.0
+        n = 0
+        while t < duration:
+            end = min(t + self.segment_sec, duration)
+            if self.rtf:
+                time.sleep((end - t) * self.rtf)
+            words = None
+            if word_timestamps:
+                count = max(1, int((end - t) * self.words_per_sec))
+                step = (end - t) / count
+                words = [
+                    SimpleNamespace(word=f" word{(n + i) % 997}{'.' if i == count - 1 else ''}",
+                                    start=t + i * step, end=t + (i + 0.8) * step, probability=0.9)
+                    for i in range(count)
+                ]
+                n += count
+            # tokens/avg_logprob/... mirror the fields a real Segment carries around
+            yield SimpleNamespace(start=t, end=end, text=" ".join(w.word.strip() for w in words) if words
+                                  else f" Segment starting at {t:.1f} seconds.", words=words,
+                                  tokens=list(range(50364, 50364 + max(8, int((end - t) * 4)))),
+                                  avg_logprob=-0.3, compression_ratio=1.4, no_speech_prob=0.01, temperature=0.0)
+            t = end
+
+
+def synth_audio(path: Path, seconds: float, seed: int = 0):
+    """Speech-like test signal: voiced bursts with pauses, plus a little noise."""
+    rng = np.random.default_rng(seed)
+    n = int(seconds * SR)
+    out = np.empty(n, dtype=np.int16)
+    block = SR * 60
+    with wave.open(str(path), "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(SR)
+        for i in range(0, n, block):
+            t = np.arange(i, min(i + block, n)) / SR
+            gate = (np.sin(2 * np.pi * 0.4 * t) > -0.3).astype(np.float32)
+            x = 0.25 * gate * np.sin(2 * np.pi * (180 + 40 * np.sin(2 * np.pi * 3 * t)) * t)
+            x += 0.01 * rng.standard_normal(len(t))
+            out[i:i + len(t)] = (np.clip(x, -1, 1) * 32767).astype(np.int16)
+        wf.writeframes(out.tobytes())
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def traced_peak_mb(fn):
+    """Peak traced allocation while fn runs, in MB (includes what fn keeps alive)."""
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return round(peak / 1e6, 2)
+
+
+def timed(fn, repeat):
+    times = []
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times), result
+
+
+def bench_length(seconds, profile, style, repeat, work: Path):
+    src = work / f"synth_{int(seconds)}s.wav"
+    if not src.exists():
+        synth_audio(src, seconds)
+    stages = {}
+
+    stages["decode_pcm"], audio = timed(lambda: main.decode_pcm(src, work / "spill.f32"), repeat)
+    stages["decode_wav"], _ = timed(lambda: main.to_wav16k_mono(src, work / "decoded.wav"), repeat)
+
+    main.MODELS.clear()
+    t0 = time.perf_counter()
+    model, meta = main.get_model(profile)
+    stages["model_load"] = time.perf_counter() - t0
+
+    word_ts = style == "vertical"
+    first_segment = None
+
+    def run_inference():
+        nonlocal first_segment
+        t_start = time.perf_counter()
+        segments, _ = model.transcribe(audio, language="en", word_timestamps=word_ts)
+        out = []
+        for seg in segments:
+            if first_segment is None:
+                first_segment = time.perf_counter() - t_start
+            out.append(seg)
+        return out
+
+    stages["inference"], seg_list = timed(run_inference, 1)
+    stages["first_segment"] = first_segment
+
+    def fill_transcript():
+        transcript = main.Transcript()
+        for seg in model.transcribe(audio, language="en", word_timestamps=word_ts)[0]:
+            transcript.add_segment(seg)
+        return transcript
+
+    def keep_segments():
+        # what run_transcription used to hold: every Segment, plus per-word dicts for vertical mode
+        segs = list(model.transcribe(audio, language="en", word_timestamps=word_ts)[0])
+        words = [{"text": w.word.strip(), "start": w.start, "end": w.end} for s in segs for w in (s.words or [])]
+        return segs, words
+
+    stages["transcript"], transcript = timed(fill_transcript, 1)
+    memory = {
+        "segments_mb": traced_peak_mb(keep_segments),
+        "transcript_mb": traced_peak_mb(fill_transcript),
+    }
+
+    words = [{"text": t, "start": s, "end": e} for t, s, e in
+             zip(transcript.words.texts, transcript.words.starts, transcript.words.ends)]
+    if words:
+        stages["pack_vertical"], blocks = timed(lambda: main.build_vertical_blocks(words), repeat)
+        stages["write_blocks"], _ = timed(lambda: main.write_srt_from_blocks(blocks, work / "b.srt"), repeat)
+    stages["write_segments"], _ = timed(lambda: main.write_srt_from_segments(seg_list, work / "s.srt"), repeat)
+    stages["write_stream"], _ = timed(lambda: main.write_subtitles(transcript, style, work / "w.srt"), repeat)
+
+    return {
+        "audio_sec": seconds,
+        "profile": profile,
+        "style": style,
+        "model": meta,
+        "segments": len(seg_list),
+        "words": len(words),
+        "rtf": round((stages["decode_pcm"] + stages["inference"]) / seconds, 5),
+        "inference_rtf": round(stages["inference"] / seconds, 5),
+        "peak_rss_mb": peak_rss_mb(),
+        "memory": memory,
+        "stages_sec": {k: (round(v, 5) if v is not None else None) for k, v in stages.items()},
+    }
+
+
+def sweep_splits(total: int):
+    """(threads_per_job, concurrent jobs) pairs that use the whole budget: 1xN, 2xN/2, ... Nx1."""
+    splits, per_job = [], 1
+    while per_job <= total:
+        splits.append((per_job, total // per_job))
+        per_job *= 2
+    if splits[-1][0] != total:
+        splits.append((total, 1))
+    return splits
+
+def bench_cpu_split(seconds, profile, per_job, jobs, pin, work: Path):
+    src = work / f"synth_{int(seconds)}s.wav"
+    if not src.exists():
+        synth_audio(src, seconds)
+    audio = main.decode_pcm(src, work / "spill.f32")
+    main.CPU_BUDGET.configure(threads_per_job=per_job, workers=jobs, pin=pin)
+    main.MODELS.clear()
+    model, meta = main.get_model(profile)
+    for _ in model.transcribe(audio[:SR * 5], language="en")[0]:  # warm-up
+        pass
+
+    latencies = []
+    lock = threading.Lock()
+
+    def one_job():
+        t0 = time.perf_counter()
+        for _ in model.transcribe(audio, language="en")[0]:
+            pass
+        with lock:
+            latencies.append(time.perf_counter() - t0)
+
+    threads = [threading.Thread(target=one_job) for _ in range(jobs)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - t0
+    return {
+        "threads_per_job": per_job,
+        "concurrent_jobs": jobs,
+        "model": meta,
+        "wall_sec": round(wall, 3),
+        "audio_sec_per_sec": round(jobs * seconds / wall, 3),
+        "job_latency_sec": round(statistics.mean(latencies), 3),
+        "job_rtf": round(statistics.mean(latencies) / seconds, 4),
+    }
+
+
+def main_cli(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--lengths", default="30,300,1800", help="comma-separated audio lengths in seconds")
+    ap.add_argument("--profiles", default="fast", help="comma-separated model profiles (fast,balanced,best)")
+    ap.add_argument("--style", default="vertical", choices=["default", "vertical"])
+    ap.add_argument("--repeat", type=int, default=3, help="repetitions for the cheap stages (median)")
+    ap.add_argument("--real", action="store_true", help="use real faster-whisper models instead of the stub")
+    ap.add_argument("--stub-rtf", type=float, default=0.0, help="stub inference cost, seconds per audio second")
+    ap.add_argument("--stub-load-sec", type=float, default=0.0, help="stub model construction time")
+    ap.add_argument("--stub-fail", default="", help="compute types the stub rejects, e.g. int8,int16")
+    ap.add_argument("--sweep-cpu", action="store_true", help="compare CPU budget splits instead of stages")
+    ap.add_argument("--sweep-threads", type=int, default=0, help="budget to split (default: all CPUs)")
+    ap.add_argument("--pin", default="", help="CPU pinning for the sweep: '', 'auto' or a list like 0-7")
+    ap.add_argument("--out", default=None, help="write the JSON report here instead of stdout")
+    args = ap.parse_args(argv)
+
+    if not args.real:
+        StubWhisperModel.rtf = args.stub_rtf
+        StubWhisperModel.load_sec = args.stub_load_sec
+        StubWhisperModel.fail_compute = {c for c in args.stub_fail.split(",") if c}
+        main.set_model_factory(StubWhisperModel)
+
+    work = Path(tempfile.mkdtemp(prefix="getsubtitles-bench-work-"))
+    budget = main.CPU_BUDGET.settings()
+    runs = []
+    for profile in [p for p in args.profiles.split(",") if p]:
+        for seconds in [float(x) for x in args.lengths.split(",") if x]:
+            if args.sweep_cpu:
+                for per_job, jobs in sweep_splits(args.sweep_threads or main.CPU_BUDGET.total_threads):
+                    print(f"[bench] {profile} {seconds:.0f}s {per_job} threads x {jobs} jobs ...", file=sys.stderr)
+                    runs.append(bench_cpu_split(seconds, profile, per_job, jobs, args.pin, work))
+            else:
+                print(f"[bench] {profile} {seconds:.0f}s ...", file=sys.stderr)
+                runs.append(bench_length(seconds, profile, args.style, args.repeat, work))
+
+    report = {
+        "created_at": time.time(),
+        "host": {
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            "cpu_budget": budget,
+            "device": main._detect_device(),
+        },
+        "model": "real" if args.real else "stub",
+        "runs": runs,
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        Path(args.out).write_text(text, encoding="utf-8")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main_cli()
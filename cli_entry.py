@@ -0,0 +1,271 @@
+"""
+Headless bulk transcription, without the HTTP server or the UI.
+
+Walks folders (recursively) and/or manifests, keeps the model loaded for the whole
+run, decodes the next files while the current ones are transcribed, skips files whose
+outputs already exist and prints a throughput summary at the end. Jobs go through the
+same pipeline, job store and result cache as the server.
+
+    python cli_entry.py ~/videos --out ~/subtitles --model balanced --format srt,vtt
+    python cli_entry.py --manifest files.txt --style vertical --layout two_lines
+"""
+import os
+import sys
+import json
+import time
+import queue
+import shutil
+import argparse
+import contextlib
+import threading
+import multiprocessing
+from pathlib import Path
+from uuid import uuid4
+
+base = Path(os.getenv("LOCALAPPDATA", Path.home() / "AppData" / "Local")) / "GetSubtitles"
+os.environ.setdefault("HF_HOME", str(base / "hf"))
+os.environ.setdefault("CTRANSLATE2_HOME", str(base / "ct2"))
+
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("inputs", nargs="*", help="media files or folders (searched recursively)")
+    ap.add_argument("--manifest", default=None, help="file with one media path per line, or a .json list")
+    ap.add_argument("--out", default=None, help="output folder (default: next to each source file)")
+    ap.add_argument("--format", default="srt", help="comma-separated output formats, e.g. srt,vtt,txt")
+    ap.add_argument("--language", default="auto")
+    ap.add_argument("--task", default="transcribe", choices=["transcribe", "translate"])
+    ap.add_argument("--model", default="fast", choices=["fast", "balanced", "best"])
+    ap.add_argument("--style", default="default", choices=["default", "vertical"])
+    ap.add_argument("--layout", default=None, help="vertical layout profile or JSON overrides")
+    ap.add_argument("--vad", default="off", help="on, off or JSON VAD options")
+    ap.add_argument("--long-mode", default="auto", choices=["auto", "on", "off"])
+    ap.add_argument("--jobs", type=int, default=0, help="files transcribed at once (default: the CPU budget's workers)")
+    ap.add_argument("--prefetch", type=int, default=2, help="decoded files kept ready ahead of the workers")
+    ap.add_argument("--force", action="store_true", help="redo files whose outputs already exist")
+    ap.add_argument("--report", default=None, help="also write the summary as JSON to this file")
+    return ap.parse_args(argv)
+
+
+def collect_sources(inputs, manifest, extensions):
+    """[(source, output stem relative to the output folder)] in a stable order."""
+    items = []
+    for entry in inputs:
+        p = Path(entry).expanduser()
+        if p.is_dir():
+            for f in sorted(p.rglob("*")):
+                if f.is_file() and f.suffix.lower() in extensions:
+                    items.append((f, f.relative_to(p).with_suffix("")))
+        elif p.is_file():
+            items.append((p, Path(p.stem)))
+        else:
+            raise SystemExit(f"not found: {p}")
+    if manifest:
+        from app.main import _batch_sources
+        try:
+            items += [(p, Path(p.stem)) for p in _batch_sources(None, manifest)]
+        except (OSError, ValueError) as e:
+            raise SystemExit(f"manifest: {e}")
+    return items
+
+
+class BulkRun:
+    """Decoder thread -> bounded queue -> transcription workers, all in this process."""
+
+    def __init__(self, args, main):
+        self.args = args
+        self.main = main
+        self.formats = [f.strip() for f in args.format.split(",") if f.strip()]
+        unknown = [f for f in self.formats if f not in main.OUTPUT_FORMATS]
+        if unknown or not self.formats:
+            raise SystemExit(f"unknown format {unknown} (choose from {', '.join(main.OUTPUT_FORMATS)})")
+        try:
+            self.settings = main._job_settings(args.language, args.task, args.model, args.style,
+                                               args.long_mode, args.layout, args.vad)
+        except ValueError as e:
+            raise SystemExit(str(e))
+        self.out_root = Path(args.out).expanduser() if args.out else None
+        self.jobs = args.jobs or main.CPU_BUDGET.workers
+        self.ready = queue.Queue(maxsize=max(1, args.prefetch))
+        self.lock = threading.Lock()
+        self.stats = {"files": 0, "done": 0, "cached": 0, "skipped": 0, "failed": 0,
+                      "audio_sec": 0.0, "transcribed_sec": 0.0,
+                      "decode_sec": 0.0, "inference_sec": 0.0}
+        self.failures = []
+
+    def targets(self, src: Path, stem: Path):
+        folder = self.out_root / stem.parent if self.out_root else src.parent
+        name = stem.name if self.out_root else src.stem
+        return {fmt: folder / f"{name}.{fmt}" for fmt in self.formats}
+
+    def _count(self, key, value=1):
+        with self.lock:
+            self.stats[key] += value
+
+    def _new_job(self, src: Path, targets: dict):
+        main = self.main
+        out_dir = next(iter(targets.values())).parent
+        out_dir.mkdir(parents=True, exist_ok=True)
+        job = main.Job(str(uuid4())[:8], src.name, out_dir)
+        job.params = dict(self.settings, src_path=str(src), source_hash=None, keep_source=True)
+        job.status = "decoding"  # never "queued": a server sharing the state folder must not claim it
+        job.worker_id = main.WORKER_ID  # kept alive by our heartbeat, see start_cluster()
+        job.started_at = time.time()
+        main.JOB_STORE.add(job)
+        return job
+
+    def decode_loop(self, items):
+        main = self.main
+        try:
+            for src, targets in items:
+                job = None
+                try:
+                    job = self._new_job(src, targets)
+                    if main.RESULT_CACHE.max_bytes > 0:
+                        job.params["source_hash"] = main.file_sha256(src)
+                        if main.complete_from_cache(job):
+                            self.export(job, targets)
+                            continue
+                    t0 = time.time()
+                    audio = main.decode_pcm(src, main.UPLOAD_DIR / f"{job.job_id}.f32", job_id=job.job_id)
+                    job.timings["decode"] = time.time() - t0
+                    main.JOB_STORE.save(job)
+                except main.JobCancelled:
+                    job.status, job.finished_at = "cancelled", time.time()
+                    main.JOB_STORE.save(job)
+                    self.fail(src, "cancelled")
+                    continue
+                except Exception as e:
+                    if job is not None:
+                        job.status, job.error_msg, job.finished_at = "error", str(e), time.time()
+                        main.JOB_STORE.save(job)
+                    self.fail(src, str(e))
+                    continue
+                self.ready.put((job, targets, audio))
+                del audio
+        finally:  # the workers wait for these even if this loop dies
+            for _ in range(self.jobs):
+                self.ready.put(None)
+
+    def work_loop(self):
+        main = self.main
+        while True:
+            item = self.ready.get()
+            if item is None:
+                return
+            job, targets, audio = item
+            item = None
+            src = Path(job.params["src_path"])
+            try:  # a dead worker would leave decode_loop blocked on the full queue
+                main.run_job(job, audio)
+                audio = None
+                job = main.JOB_STORE.get(job.job_id)
+                if job is None:
+                    self.fail(src, "job was removed from the job store")
+                elif job.status == "done":
+                    self.export(job, targets)
+                else:
+                    self.fail(src, job.error_msg or job.status)
+            except Exception as e:
+                audio = None
+                self.fail(src, str(e))
+
+    def export(self, job, targets: dict):
+        """Move the SRT into place and render the other formats from the stored transcript."""
+        main = self.main
+        for fmt, target in targets.items():
+            if fmt == "srt":
+                os.replace(job.srt_path, target)
+            else:
+                rendered = main.render_output(job, fmt)
+                if rendered is None:
+                    raise RuntimeError(f"no stored transcript to render {fmt} from")
+                shutil.copyfile(rendered, target)
+        if "srt" in targets:
+            job.srt_path = targets["srt"]
+        else:
+            main.remove_job_files(job.srt_path)
+        main.JOB_STORE.save(job)
+        self._count("cached" if job.cache_hit else "done")
+        self._count("audio_sec", job.duration or 0.0)
+        if not job.cache_hit:
+            self._count("transcribed_sec", job.duration or 0.0)
+            self._count("decode_sec", job.timings.get("decode", 0.0))
+            self._count("inference_sec", job.timings.get("inference", 0.0))
+        print(f"[GETSUBTITLES] {'cached' if job.cache_hit else 'done  '} {Path(job.params['src_path'])}"
+              f" ({job.duration or 0:.0f}s audio)")
+
+    def fail(self, src: Path, error: str):
+        self._count("failed")
+        self.failures.append({"source": str(src), "error": error})
+        print(f"[GETSUBTITLES] failed {src}: {error}")
+
+    def run(self, items) -> dict:
+        main = self.main
+        self.stats["files"] = len(items)
+        todo = []
+        for src, stem in items:
+            targets = self.targets(src, stem)
+            if not self.args.force and all(p.exists() for p in targets.values()):
+                self.stats["skipped"] += 1
+            else:
+                todo.append((src, targets))
+        t0 = time.time()
+        with contextlib.ExitStack() as stack:
+            if todo:
+                model_t0 = time.time()
+                # The lease keeps the model resident for the whole run and is handed back after it.
+                model, meta = stack.enter_context(main.MODELS.lease(self.args.model))
+                main.warm_up(model)
+                self.stats["model"] = meta
+                self.stats["model_load_sec"] = round(time.time() - model_t0, 2)
+            threads = [threading.Thread(target=self.work_loop, name=f"getsubtitles-cli-{i}", daemon=True)
+                       for i in range(self.jobs)]
+            for t in threads:
+                t.start()
+            self.decode_loop(todo)
+            for t in threads:
+                t.join()
+        wall = time.time() - t0
+        s = self.stats
+        s["wall_sec"] = round(wall, 2)
+        s["audio_sec_per_sec"] = round(s["audio_sec"] / wall, 2) if wall > 0 else None
+        s["files_per_min"] = round((s["done"] + s["cached"]) * 60 / wall, 2) if wall > 0 else None
+        s["rtf"] = round(s["inference_sec"] / s["transcribed_sec"], 4) if s["transcribed_sec"] else None
+        s["workers"] = self.jobs
+        s["failures"] = self.failures
+        return s
+
+
+def print_summary(s: dict):
+    print("")
+    print(f"Files      {s['files']} total: {s['done']} transcribed, {s['cached']} from cache, "
+          f"{s['skipped']} skipped (outputs exist), {s['failed']} failed")
+    print(f"Audio      {s['audio_sec'] / 3600:.2f} h in {s['wall_sec'] / 60:.1f} min wall time "
+          f"with {s['workers']} worker(s)")
+    if s["audio_sec_per_sec"]:
+        print(f"Throughput {s['audio_sec_per_sec']:.1f}x real time, {s['files_per_min']} files/min")
+    if s["rtf"] is not None:
+        print(f"Inference  RTF {s['rtf']}, decode {s['decode_sec']:.1f}s (overlapped with inference)")
+
+
+def main_cli(argv=None):
+    args = parse_args(argv)
+    from app import main
+
+    items = collect_sources(args.inputs, args.manifest, main.MEDIA_EXTENSIONS)
+    if not items:
+        raise SystemExit("no media files found")
+    main.CPU_BUDGET.pin_current_thread()
+    main.MODELS.idle_timeout = 0  # keep the model for the whole run
+    main.start_cluster("cli", maintenance=False)  # heartbeat for our own jobs only
+    stats = BulkRun(args, main).run(items)
+    print_summary(stats)
+    if args.report:
+        Path(args.report).write_text(json.dumps(stats, indent=2), encoding="utf-8")
+    return 1 if stats["failed"] else 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()  # long-file mode spawns worker processes
+    sys.exit(main_cli())
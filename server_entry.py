@@ -1,7 +1,16 @@
 import os
+import argparse
+import multiprocessing
 from pathlib import Path
 import uvicorn
 
+parser = argparse.ArgumentParser(description="Get Subtitles backend")
+parser.add_argument("--preload", default=None,
+                    help="Comma-separated profiles to load and warm up at startup, e.g. fast,balanced")
+args, _ = parser.parse_known_args()
+if args.preload is not None:
+    os.environ["GETSUBTITLES_PRELOAD"] = args.preload
+
 base = Path(os.getenv("LOCALAPPDATA", Path.home() / "AppData" / "Local")) / "GetSubtitles"
 os.environ.setdefault("HF_HOME", str(base / "hf"))
 os.environ.setdefault("CTRANSLATE2_HOME", str(base / "ct2"))
@@ -9,4 +18,5 @@ os.environ.setdefault("CTRANSLATE2_HOME", str(base / "ct2"))
 from app.main import app 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # long-file mode spawns worker processes
     uvicorn.run(app, host="127.0.0.1", port=8000)
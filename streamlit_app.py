@@ -1,5 +1,10 @@
 import os, sys
+import shutil
+import subprocess
+import tempfile
 import time
+import json
+import hashlib
 from pathlib import Path
 import threading
 import requests
@@ -30,7 +35,7 @@ st.title("Get Subtitles in SRT Format")
 st.markdown("""
 * The system will automatically detect the language of the uploaded video/audio.
 * Once the file is loaded, please wait for the **"Create subtitles"** button to appear.
-* If you have a large video, uploading only the audio is much faster.
+* Large videos are uploaded as their audio track only (see "Send only the audio track").
 * It works better with files without background music.
 """)
 
@@ -49,6 +54,10 @@ MODEL_MAP = {
     MODEL_LABELS[2]: "best",
 }
 MODEL_DISPLAY = {"fast": "Fast", "balanced": "Balanced", "best": "Best"}
+PHASE_LABELS = {"upload": "Upload", "queue_wait": "Queue", "decode": "Audio extraction",
+                "vad": "Speech detection", "language_detect": "Language detection", "model_load": "Model load",
+                "first_segment": "First subtitle", "inference": "Transcription", "write": "Writing",
+                "refine": "Improving the draft"}
 
 LANGUAGE_NAMES = {
     "af":"Afrikaans","am":"Amharic","ar":"Arabic","as":"Assamese","az":"Azerbaijani","ba":"Bashkir",
@@ -78,8 +87,129 @@ def fmt_mmss(seconds):
     seconds = max(0, int(round(float(seconds))))
     return f"{seconds // 60}:{seconds % 60:02d}"
 
+def iter_sse(resp):
+    """Yield (event, data) pairs from a text/event-stream response."""
+    event, data = "message", []
+    for line in resp.iter_lines(chunk_size=None, decode_unicode=True):
+        if line is None:
+            continue
+        if line == "":
+            if data:
+                yield event, json.loads("\n".join(data))
+            event, data = "message", []
+        elif line.startswith("event:"):
+            event = line[6:].strip()
+        elif line.startswith("data:"):
+            data.append(line[5:].strip())
+
+UPLOAD_CHUNK = 8 * 1024 * 1024
+
+def find_ffmpeg():
+    """ffmpeg bundled next to the app (bin/), else the one on PATH; None if there is none."""
+    bundled = resource_path(os.path.join("bin", "ffmpeg.exe" if os.name == "nt" else "ffmpeg"))
+    return bundled if os.path.exists(bundled) else shutil.which("ffmpeg")
+
+# Mono 16 kHz is all the backend uses. Opus is far smaller; FLAC is the fallback for ffmpeg
+# builds without libopus. bitexact keeps the output identical for the same input, so the
+# backend still recognises a file that was sent before.
+AUDIO_ENCODINGS = [
+    (".ogg", ["-c:a", "libopus", "-b:a", "32k", "-application", "voip"]),
+    (".flac", ["-c:a", "flac", "-compression_level", "8"]),
+]
+
+def extract_audio(file, workdir: str):
+    """
+    Write the uploaded file's audio track as compact mono 16 kHz audio.
+    Returns (path, seconds taken), or None without ffmpeg or when it isn't smaller.
+    """
+    ffmpeg = find_ffmpeg()
+    if not ffmpeg:
+        return None
+    t0 = time.time()
+    src = os.path.join(workdir, "source" + Path(file.name).suffix)
+    file.seek(0)
+    with open(src, "wb") as out:
+        shutil.copyfileobj(file, out, UPLOAD_CHUNK)
+    for ext, codec in AUDIO_ENCODINGS:
+        dst = os.path.join(workdir, Path(file.name).stem + ext)
+        cmd = [ffmpeg, "-nostdin", "-y", "-i", src, "-vn", "-sn", "-dn", "-ac", "1", "-ar", "16000", *codec,
+               "-map_metadata", "-1", "-fflags", "+bitexact", "-flags:a", "+bitexact", dst]
+        if subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).returncode == 0:
+            if os.path.getsize(dst) < file.size:
+                return dst, time.time() - t0
+            return None
+    return None
+
+def upload_resumable(file, filename: str, size: int, settings: dict, on_progress,
+                     original_bytes: int = 0, extract_sec: float = 0.0, on_job=None) -> dict:
+    """
+    Send the file through the backend's chunked upload API without copying it whole.
+    A file the backend already has is not sent again once its proof challenge is answered;
+    failed chunks are retried and the upload resumes from what the backend reports as
+    missing. The job starts while the chunks are still arriving (`on_job` gets its id).
+    Returns the backend's /complete response.
+    """
+    digest = hashlib.sha256()
+    file.seek(0)
+    for block in iter(lambda: file.read(UPLOAD_CHUNK), b""):
+        digest.update(block)
+    sha = digest.hexdigest()
+
+    r = requests.post(
+        f"{BACKEND}/uploads",
+        data=dict(settings, filename=filename, size=size, sha256=sha, chunk_size=UPLOAD_CHUNK, start="true",
+                  original_bytes=original_bytes or size, extract_sec=extract_sec),
+        timeout=60,
+    )
+    if r.status_code == 507:  # the server is out of space for uploads right now
+        raise RuntimeError(r.json().get("error", "the server is out of storage"))
+    r.raise_for_status()
+    up = r.json()
+    if on_job and up.get("job_id"):
+        on_job(up["job_id"])
+    url = f"{BACKEND}/uploads/{up['upload_id']}"
+    if up.get("proof"):  # the backend has this file; prove we do too instead of sending it
+        file.seek(up["proof"]["offset"])
+        proof = hashlib.sha256(file.read(up["proof"]["length"])).hexdigest()
+        resp = requests.post(f"{url}/proof", data={"sha256": proof}, timeout=60)
+        if resp.ok:
+            up = resp.json()
+    missing, total, failures = list(up["missing"]), up["chunks"], 0
+    while missing:
+        i = missing[0]
+        file.seek(i * UPLOAD_CHUNK)
+        block = file.read(UPLOAD_CHUNK)
+        try:
+            resp = requests.put(f"{url}/chunks/{i}", data=block, timeout=300,
+                                headers={"X-Chunk-Sha256": hashlib.sha256(block).hexdigest()})
+            resp.raise_for_status()
+            missing.pop(0)
+            failures = 0
+        except requests.RequestException:
+            failures += 1
+            if failures > 5:
+                raise
+            time.sleep(min(2 ** failures, 30))
+            try:
+                missing = requests.get(url, timeout=30).json()["missing"]
+            except (requests.RequestException, ValueError, KeyError):
+                pass  # keep our own list and try again
+        on_progress(1 - len(missing) / total, up.get("deduplicated", False))
+    on_progress(1.0, up.get("deduplicated", False))
+
+    r = requests.post(f"{url}/complete", data={"sha256": sha}, timeout=None)
+    r.raise_for_status()
+    return r.json()
+
 selected_label = st.radio("Model", MODEL_LABELS, index=0)
 model_choice = MODEL_MAP[selected_label]
+draft_first = st.checkbox(
+    "Show a quick draft first",
+    value=False,
+    disabled=model_choice == "fast",
+    help="The Fast model writes draft subtitles within moments. The selected model then improves them "
+         "section by section, so you can follow along while you wait for the final version.",
+)
 
 SUB_LABELS = ["Same as audio/video", "English (translate)"]
 task_value = "transcribe" if st.radio("Subtitle language", SUB_LABELS, index=0) == SUB_LABELS[0] else "translate"
@@ -92,69 +222,182 @@ STYLE_MAP = {
 style_choice = STYLE_MAP[st.radio("Subtitle style", STYLE_LABELS, index=0,
                                   help="Use Vertical for reels/shorts: shorter, faster-changing single-line captions.")]
 
+EXTRA_FORMATS = {"vtt": "Save .vtt (WebVTT)", "txt": "Save .txt (plain text)", "json": "Save .json (word timings)"}
+
+LAYOUT_LABELS = {
+    "One line (default)": "reels",
+    "One line, very short": "compact",
+    "Two lines": "two_lines",
+}
+layout_choice = "reels"
+if style_choice == "vertical":
+    layout_choice = LAYOUT_LABELS[st.selectbox("Vertical layout", list(LAYOUT_LABELS), index=0)]
+
+skip_silence = st.checkbox(
+    "Skip silence and music",
+    value=False,
+    help="Detects speech first and only transcribes those parts. Faster on footage with long quiet or music-only stretches.",
+)
+
+has_ffmpeg = find_ffmpeg() is not None
+audio_only = st.checkbox(
+    "Send only the audio track",
+    value=has_ffmpeg,
+    disabled=not has_ffmpeg,
+    help="Extracts a small mono audio file on this computer and uploads that instead of the whole video."
+         + ("" if has_ffmpeg else " Needs ffmpeg, which was not found."),
+)
+
 file = st.file_uploader("Upload audio/video", type=None)
 
+def cancel_active_job():
+    """Cancel button callback; runs before the rerun that stops the running job display."""
+    job_id = st.session_state.pop("active_job", None)
+    if job_id:
+        try:
+            requests.post(f"{BACKEND}/cancel/{job_id}", timeout=10)
+            st.session_state["cancel_note"] = "Cancelled. The file was not transcribed."
+        except requests.RequestException as e:
+            st.session_state["cancel_note"] = f"Could not cancel: {e}"
+
+if "cancel_note" in st.session_state:
+    st.warning(st.session_state.pop("cancel_note"))
+
 # Run job
 if file and st.button("Create subtitles"):
     try:
-        start_resp = requests.post(
-            f"{BACKEND}/transcribe_start",
-            files={"file": (file.name, file.getvalue())},
-            data={
-                "language": "auto",
-                "task": task_value,
-                "model_choice": model_choice,
-                "style": style_choice,  # << NEW
-            },
-            timeout=None,
-        )
-        start_resp.raise_for_status()
-        job = start_resp.json()
+        prog = st.progress(0, text="Uploading…")
+        st.button("Cancel", on_click=cancel_active_job)
+
+        def show_upload(fraction, deduplicated):
+            if deduplicated:
+                prog.progress(100, text="Already on the server, skipping the upload")
+            else:
+                prog.progress(int(fraction * 100), text=f"Uploading… {int(fraction * 100)}%")
+
+        def remember_job(job_id):
+            st.session_state["active_job"] = job_id
+
+        settings = {
+            "language": "auto",
+            "task": task_value,
+            "model_choice": "fast" if draft_first and model_choice != "fast" else model_choice,
+            "refine": model_choice if draft_first and model_choice != "fast" else "off",
+            "style": style_choice,  # << NEW
+            "layout": layout_choice,
+            "vad": "on" if skip_silence else "off",
+        }
+        with tempfile.TemporaryDirectory(prefix="getsubtitles-") as workdir:
+            extracted = None
+            if audio_only:
+                prog.progress(0, text="Extracting the audio track…")
+                extracted = extract_audio(file, workdir)
+            if extracted:
+                path, extract_sec = extracted
+                with open(path, "rb") as audio_file:
+                    job = upload_resumable(audio_file, Path(path).name, os.path.getsize(path), settings,
+                                           show_upload, original_bytes=file.size, extract_sec=extract_sec,
+                                           on_job=remember_job)
+                job["original_filename"] = file.name  # name the downloads after what the user picked
+            else:
+                job = upload_resumable(file, file.name, file.size, settings, show_upload, on_job=remember_job)
         job_id = job["job_id"]
+        remember_job(job_id)
 
-        prog = st.progress(0, text="Starting…")
+        prog.progress(0, text="Starting…")
         status_text = st.empty()
+        preview = st.empty()
         t0 = time.time()
-        t_running_start = None
-        
-        while True:
-            pr = requests.get(f"{BACKEND}/progress/{job_id}", timeout=30)
-            pr.raise_for_status()
-            info = pr.json()
-
-            if info["status"] == "loading_model":
+        cues = []
+        finished = False
+
+        # The backend pushes progress changes and each new subtitle cue as it is written.
+        stream = requests.get(f"{BACKEND}/stream/{job_id}", stream=True, timeout=(30, None))
+        stream.raise_for_status()
+        for event, info in iter_sse(stream):
+            if event == "cue":
+                cues.append(info)
+                preview.code("\n".join(f"{c['start'][:8]}  {c['text']}" for c in cues[-6:]), language=None)
+                continue
+            if event == "reset":  # the draft is complete
+                cues = info["cues"]
+                continue
+            if event == "window":  # a section was improved: show its new lines
+                preview.code("\n".join(f"{c['start'][:8]}  {c['text']}" for c in info["cues"][:6]), language=None)
+                continue
+
+            if info["status"] == "queued":
+                prog.progress(0, text="Waiting in queue…")
+                status_text.info(
+                    f"Other files are being processed. Position in queue: {info.get('queue_position') or '?'} "
+                    f"• Waiting for {fmt_mmss(info.get('wait_sec'))}"
+                )
+
+            elif info["status"] in ("starting", "decoding"):
+                prog.progress(0, text="Preparing audio…")
+                status_text.info("Extracting the audio track from the uploaded file…")
+
+            elif info["status"] == "detecting_speech":
+                prog.progress(0, text="Finding speech…")
+                status_text.info("Finding the parts of the file that contain speech…")
+
+            elif info["status"] == "detecting_language":
+                prog.progress(0, text="Detecting language…")
+                status_text.info("Listening to a few parts of the file to detect the spoken language…")
+
+            elif info["status"] == "loading_model":
                 prog.progress(0, text="Please wait..")
+                eta = info.get("eta_sec")
                 status_text.info(
                     "The selected AI model is being downloaded/loaded. "
                     "This may take a while on the first run."
+                    + (f" Expected transcription time: {fmt_mmss(eta)}" if eta is not None else "")
                 )
 
             elif info["status"] == "running":
-                if t_running_start is None:
-                    t_running_start = time.time()
-
-                real_pct = int(round((info.get("progress") or 0.0) * 100))
-
-                elapsed_running = time.time() - t_running_start
-                SIMULATED_DURATION_SECONDS = 15.0
-                SIMULATED_PROGRESS_CAP = 15
-                
-                simulated_pct = (elapsed_running / SIMULATED_DURATION_SECONDS) * SIMULATED_PROGRESS_CAP
-                simulated_pct = min(int(simulated_pct), SIMULATED_PROGRESS_CAP)
-                
-                display_pct = max(real_pct, simulated_pct)
-
-                prog.progress(min(max(display_pct, 0), 100), text=f"{display_pct}%")
-                
+                pct = int(round((info.get("progress") or 0.0) * 100))
+                prog.progress(min(max(pct, 0), 100), text=f"{pct}%")
+
+                # The backend predicts the ETA from past jobs' speed before the first segment arrives.
                 eta = info.get("eta_sec")
                 model_pretty = MODEL_DISPLAY.get(info.get("model_choice",""), info.get("model_name",""))
-                lang_pretty = pretty_lang(info.get("language"))
-                
-                status_text.info(f"Processing… {display_pct}% • ETA: {fmt_mmss(eta)} • Model: {model_pretty}")
-            
+                status_text.info(f"Processing… {pct}% • ETA: {fmt_mmss(eta)} • Model: {model_pretty}")
+
+            elif info["status"] == "refining":
+                refine = info.get("refine") or {}
+                pct = int(round((info.get("progress") or 0.0) * 100))
+                prog.progress(min(max(pct, 0), 100), text=f"Improving the draft… {pct}%")
+                status_text.info(
+                    f"Draft ready after {fmt_mmss(refine.get('draft_ready_sec'))}. "
+                    f"{MODEL_DISPLAY.get(refine.get('profile', ''), '')} model: "
+                    f"{refine.get('refined', 0)} of {len(refine.get('windows') or [])} sections improved"
+                    + (f" • ETA: {fmt_mmss(info.get('eta_sec'))}" if info.get("eta_sec") is not None else "")
+                )
+
             elif info["status"] == "done":
+                finished = True
+                model_pretty = MODEL_DISPLAY.get(info.get("model_choice",""), info.get("model_name",""))
+                lang_pretty = pretty_lang(info.get("language"))
                 elapsed = time.time() - t0
                 st.success(f"Done in {fmt_mmss(elapsed)} — Detected: {lang_pretty} • Model: {model_pretty}")
+                timings = info.get("timings") or {}
+                if timings:
+                    st.caption(" • ".join(f"{PHASE_LABELS.get(k, k)}: {fmt_mmss(v)}" for k, v in timings.items()))
+                transfer = info.get("transfer")
+                if transfer and transfer["deduplicated"]:
+                    st.caption("The file was already on the server, so nothing was uploaded.")
+                elif transfer and transfer["saved_bytes"]:
+                    saved = transfer.get("time_saved_sec")
+                    st.caption(
+                        f"Uploaded {transfer['sent_bytes'] / 1e6:.1f} MB instead of {transfer['original_bytes'] / 1e6:.1f} MB"
+                        + (f" • Saved about {fmt_mmss(saved)} of upload time" if saved and saved > 0 else "")
+                    )
+                vad = info.get("vad")
+                if vad:
+                    st.caption(
+                        f"Speech: {vad['speech_ratio']:.0%} of the file • Skipped {fmt_mmss(vad['skipped_sec'])}"
+                        + (f" • Saved about {fmt_mmss(vad['time_saved_sec'])}" if vad.get("time_saved_sec") else "")
+                    )
 
                 suggested = Path(job.get("original_filename","subtitle")).with_suffix(".srt").name
                 srt_url = info.get("srt_url")
@@ -183,13 +426,35 @@ if file and st.button("Create subtitles"):
                         )
                     else:
                         st.info("SRT created. Open the outputs folder to find it.")
+
+                # The same transcript rendered in other formats, on demand.
+                other = {k: v for k, v in (info.get("downloads") or {}).items() if k in EXTRA_FORMATS}
+                for col, (fmt, url) in zip(st.columns(len(other) or 1), other.items()):
+                    r = requests.get(f"{BACKEND}{url}", timeout=None)
+                    if r.ok:
+                        col.download_button(
+                            EXTRA_FORMATS[fmt],
+                            r.content,
+                            file_name=Path(suggested).with_suffix(f".{fmt}").name,
+                            mime=r.headers.get("content-type", "text/plain"),
+                            use_container_width=True,
+                        )
                 break
 
             elif info["status"] == "error":
+                finished = True
                 st.error(f"Failed: {info.get('error','unknown error')}")
                 break
 
-            time.sleep(0.5)
+            elif info["status"] == "cancelled":
+                finished = True
+                st.warning("Cancelled.")
+                break
+
+        stream.close()
+        st.session_state.pop("active_job", None)
+        if not finished:
+            st.error("Lost the connection to the backend before the job finished.")
 
     except Exception as e:
         st.error(f"Request failed: {e}")
@@ -0,0 +1,36 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# app.main creates its folders and the job store at import time; keep them out of the checkout.
+_TMP = Path(tempfile.mkdtemp(prefix="getsubtitles-tests-"))
+for _name in ("STATE", "UPLOAD", "OUTPUT"):
+    os.environ.setdefault(f"GETSUBTITLES_{_name}_DIR", str(_TMP / _name.lower()))
+
+
+@pytest.fixture(scope="session")
+def main():
+    pytest.importorskip("faster_whisper")
+    from app import main
+    return main
+
+
+class FakeModel:
+    """Stands in for WhisperModel; only identity matters to the model manager."""
+
+    def __init__(self, model_id, device="cpu", compute_type="int8", **kwargs):
+        self.model_id = model_id
+        self.compute_type = compute_type
+
+
+@pytest.fixture
+def fake_models(main, monkeypatch):
+    monkeypatch.setattr(main, "MODEL_FACTORY", FakeModel)
+    monkeypatch.setattr(main, "_detect_device", lambda: "cpu")
+    return FakeModel
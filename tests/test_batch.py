@@ -0,0 +1,56 @@
+import pytest
+
+
+@pytest.fixture
+def media_root(tmp_path):
+    root = tmp_path / "media"
+    (root / "show").mkdir(parents=True)
+    (root / "show" / "ep1.mp4").write_bytes(b"\0")
+    (root / "list.txt").write_text("show/ep1.mp4\n", encoding="utf-8")
+    (tmp_path / "secret.wav").write_bytes(b"\0")
+    return root
+
+
+def test_batch_sources_stay_under_the_root(main, media_root, tmp_path):
+    assert main._batch_sources("show", None, media_root) == [media_root / "show" / "ep1.mp4"]
+    assert main._batch_sources(None, "list.txt", media_root) == [media_root / "show" / "ep1.mp4"]
+    with pytest.raises(ValueError):
+        main._batch_sources(str(tmp_path), None, media_root)
+    with pytest.raises(ValueError):
+        main._batch_sources("../", None, media_root)
+    (media_root / "escape.txt").write_text("../secret.wav\n", encoding="utf-8")
+    with pytest.raises(ValueError):
+        main._batch_sources(None, "escape.txt", media_root)
+    (media_root / "link.wav").symlink_to(tmp_path / "secret.wav")
+    with pytest.raises(ValueError):
+        main._batch_sources(".", None, media_root)
+
+
+def test_server_local_batches_need_a_configured_root(main, monkeypatch, media_root):
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setattr(main, "BATCH_SOURCE_ROOT", "")
+    r = TestClient(main.app).post("/batch_start", data={"source_dir": str(media_root)})
+    assert r.status_code == 403
+
+
+def test_batch_row_is_written_with_its_jobs(main, monkeypatch, media_root):
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setattr(main, "BATCH_SOURCE_ROOT", str(media_root))
+    monkeypatch.setattr(main.RESULT_CACHE, "max_bytes", 0)
+    r = TestClient(main.app).post("/batch_start", data={"source_dir": "show"})
+    assert r.status_code == 200, r.text
+    batch = main.JOB_STORE.get_batch(r.json()["batch_id"])
+    assert batch["job_ids"] == r.json()["job_ids"]
+    assert [j.batch_id for j in main.JOB_STORE.get_many(batch["job_ids"])] == [batch["batch_id"]]
+    main.JOB_STORE.delete_jobs(batch["job_ids"])  # nothing runs them here
+
+
+def test_failed_batch_insert_leaves_no_orphan_jobs(main, tmp_path):
+    store = main.JobStore(tmp_path / "jobs.sqlite3")
+    store.add_batch("b1", {"created_at": 0.0, "job_ids": []})
+    job = main.Job("j1", "a.wav", tmp_path)
+    with pytest.raises(Exception):
+        store.add_batch("b1", {"created_at": 0.0, "job_ids": ["j1"]}, [job])  # duplicate batch id
+    assert store.get("j1") is None
@@ -0,0 +1,61 @@
+import os
+
+
+def _job(main, tmp_path):
+    job = main.Job(os.urandom(4).hex(), "clip.wav", tmp_path)
+    job.params = {"source_hash": "ab" * 32, "task": "transcribe", "model_choice": "fast", "style": "default"}
+    return job
+
+
+def test_worker_recheck_does_not_count_a_second_miss(main, monkeypatch, tmp_path):
+    cache = main.ResultCache(tmp_path / "cache", 1 << 20)
+    monkeypatch.setattr(main, "RESULT_CACHE", cache)
+    job = _job(main, tmp_path)
+
+    assert not main.complete_from_cache(job)               # lookup at upload time
+    assert not main.complete_from_cache(job, recheck=True)  # the worker looks again before decoding
+    assert (cache.hits, cache.misses) == (0, 1)
+
+
+def test_recheck_finds_a_result_stored_meanwhile(main, monkeypatch, tmp_path):
+    cache = main.ResultCache(tmp_path / "cache", 1 << 20)
+    monkeypatch.setattr(main, "RESULT_CACHE", cache)
+    job = _job(main, tmp_path)
+    transcript = main.Transcript()
+    transcript.add(0.0, 1.5, " Hello.", [])
+    cache.put(main.result_cache_key(job), {"language": "en", "duration": 1.5, "model_name": "small",
+                                           "compute_type": "int8", "has_words": False,
+                                           "segments": main.segments_to_cache(transcript)})
+    main.JOB_STORE.add(job)
+
+    assert main.complete_from_cache(job, recheck=True)
+    assert job.cache_hit and job.status == "done"
+    assert (cache.hits, cache.misses) == (1, 0)
+    assert "Hello." in (tmp_path / f"{job.job_id}.srt").read_text(encoding="utf-8")
+
+
+def test_api_replica_leaves_the_lookup_to_the_worker(main, monkeypatch, tmp_path):
+    cache = main.ResultCache(tmp_path / "cache", 1 << 20)
+    monkeypatch.setattr(main, "RESULT_CACHE", cache)
+    settings = main._job_settings("auto", "transcribe", "fast", "default", "auto", None, "off", "off")
+    src = tmp_path / "clip.wav"
+    src.write_bytes(b"RIFF")
+
+    # An API replica can't know which compute type a worker will use, so it doesn't look.
+    monkeypatch.setattr(main, "ROLE", "api")
+    job = main.build_job(os.urandom(4).hex(), "clip.wav", src, settings, tmp_path, source_hash="cd" * 32)
+    assert job.status == "queued" and "cache_checked" not in job.params
+    assert (cache.hits, cache.misses) == (0, 0)
+    main.JOB_STORE.add(job)
+
+    # The worker stored the result under the compute type it ran with and finds it.
+    monkeypatch.setattr(main, "ROLE", "worker")
+    transcript = main.Transcript()
+    transcript.add(0.0, 1.5, " Hello.", [])
+    cache.put(main.result_cache_key(job), {"language": "en", "duration": 1.5, "model_name": "small",
+                                           "compute_type": "int8", "has_words": False,
+                                           "segments": main.segments_to_cache(transcript)})
+    main.run_job(job)
+    done = main.JOB_STORE.get(job.job_id)
+    assert done.status == "done" and done.cache_hit
+    assert (cache.hits, cache.misses) == (1, 0)
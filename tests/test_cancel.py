@@ -0,0 +1,44 @@
+import os
+import threading
+import time
+
+import pytest
+
+
+@pytest.fixture
+def endless_ffmpeg(main, monkeypatch, tmp_path):
+    """An "ffmpeg" that never stops producing PCM."""
+    if os.name == "nt":
+        pytest.skip("needs a POSIX shell")
+    script = tmp_path / "ffmpeg"
+    script.write_text("#!/bin/sh\nexec cat /dev/zero\n")
+    script.chmod(0o755)
+    monkeypatch.setattr(main, "_ffmpeg_path", lambda: str(script))
+
+
+def _running_job(main, tmp_path):
+    job = main.Job(os.urandom(4).hex(), "clip.wav", tmp_path)
+    job.status = "decoding"
+    main.JOB_STORE.add(job)
+    return job
+
+
+def test_cancel_stops_a_running_decode(main, endless_ffmpeg, tmp_path):
+    job = _running_job(main, tmp_path)
+    threading.Timer(0.3, main.JOB_STORE.request_cancel, args=(job.job_id,)).start()
+    t0 = time.time()
+    with pytest.raises(main.JobCancelled):
+        main.decode_pcm(tmp_path / "clip.wav", tmp_path / "spill.f32", memory_limit=1 << 20, job_id=job.job_id)
+    assert time.time() - t0 < 5
+
+
+def test_cancelled_decode_ends_the_job_cancelled(main, endless_ffmpeg, tmp_path, monkeypatch):
+    monkeypatch.setattr(main.RESULT_CACHE, "max_bytes", 0)
+    job = _running_job(main, tmp_path)
+    src = tmp_path / "clip.wav"
+    src.write_bytes(b"RIFF")
+    job.params = {"src_path": str(src), "task": "transcribe", "model_choice": "fast", "style": "default"}
+    main.JOB_STORE.save(job)
+    threading.Timer(0.3, main.JOB_STORE.request_cancel, args=(job.job_id,)).start()
+    main.run_job(job)
+    assert main.JOB_STORE.get(job.job_id).status == "cancelled"
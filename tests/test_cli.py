@@ -0,0 +1,87 @@
+import threading
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import cli_entry
+
+
+@pytest.fixture
+def bulk(main, monkeypatch, tmp_path):
+    monkeypatch.setattr(main.RESULT_CACHE, "max_bytes", 0)
+    monkeypatch.setattr(main, "decode_pcm", lambda src, spill, **kw: np.zeros(main.SAMPLE_RATE, dtype=np.float32))
+    sources = []
+    for i in range(4):
+        src = tmp_path / f"clip{i}.wav"
+        src.write_bytes(b"RIFF")
+        sources.append(src)
+
+    def run(fmt):
+        args = cli_entry.parse_args(["--out", str(tmp_path / "out"), "--format", fmt, "--jobs", "1", "--prefetch", "1"])
+        run = cli_entry.BulkRun(args, main)
+        items = [(src, run.targets(src, Path(src.stem))) for src in sources]
+        worker = threading.Thread(target=run.work_loop, daemon=True)
+        worker.start()
+        decoder = threading.Thread(target=run.decode_loop, args=(items,), daemon=True)
+        decoder.start()
+        decoder.join(timeout=10)
+        worker.join(timeout=10)
+        assert not decoder.is_alive() and not worker.is_alive(), "bulk run hung"
+        return run
+
+    return run
+
+
+def test_worker_errors_are_reported_not_fatal(main, bulk, monkeypatch):
+    def broken(job, decoded=None):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(main, "run_job", broken)
+    run = bulk("srt")
+    assert run.stats["failed"] == 4
+    assert {f["error"] for f in run.failures} == {"disk full"}
+
+
+def test_missing_transcript_fails_the_file(main, bulk, monkeypatch):
+    def no_transcript(job, decoded=None):
+        job.srt_path = job.out_dir / f"{job.job_id}.srt"
+        job.srt_path.write_text("", encoding="utf-8")
+        job.status = "done"
+        main.JOB_STORE.save(job)
+
+    monkeypatch.setattr(main, "run_job", no_transcript)
+    run = bulk("srt,txt")
+    assert run.stats["failed"] == 4
+    assert all("no stored transcript" in f["error"] for f in run.failures)
+
+
+def test_job_creation_errors_are_reported_not_fatal(main, bulk, monkeypatch):
+    def unwritable(self, src, targets):
+        raise PermissionError("output folder is read-only")
+
+    monkeypatch.setattr(cli_entry.BulkRun, "_new_job", unwritable)
+    run = bulk("srt")
+    assert run.stats["failed"] == 4
+    assert {f["error"] for f in run.failures} == {"output folder is read-only"}
+
+
+def test_cli_heartbeat_leaves_other_processes_jobs_alone(main, monkeypatch):
+    monkeypatch.setattr(main.JOB_STORE, "requeue_orphans", lambda: pytest.fail("the CLI requeued jobs"))
+    monkeypatch.setattr(main.JANITOR, "run", lambda: pytest.fail("the CLI ran the janitor"))
+    main._cluster_round("cli", maintenance=False)
+    assert any(w["worker_id"] == main.WORKER_ID for w in main.JOB_STORE.workers())
+
+
+def test_the_run_hands_its_model_lease_back(main, fake_models, monkeypatch, tmp_path):
+    monkeypatch.setattr(main, "MODELS", main.ModelManager(0, 0))
+    monkeypatch.setattr(main, "warm_up", lambda model: None)
+    monkeypatch.setattr(main.RESULT_CACHE, "max_bytes", 0)
+    monkeypatch.setattr(main, "decode_pcm", lambda src, spill, **kw: np.zeros(main.SAMPLE_RATE, dtype=np.float32))
+    monkeypatch.setattr(main, "run_job", lambda job, decoded=None: None)
+    src = tmp_path / "clip.wav"
+    src.write_bytes(b"RIFF")
+
+    args = cli_entry.parse_args(["--out", str(tmp_path / "out"), "--jobs", "1"])
+    cli_entry.BulkRun(args, main).run([(src, Path(src.stem))])
+    assert [m["leases"] for m in main.MODELS.resident()] == [0]
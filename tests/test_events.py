@@ -0,0 +1,71 @@
+import asyncio
+import json
+import os
+import threading
+
+import pytest
+
+
+@pytest.mark.parametrize("route", ["events", "stream"])
+def test_stream_ends_with_error_when_the_job_is_deleted(main, monkeypatch, tmp_path, route):
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setattr(main, "PUSH_FALLBACK_POLL", 0.05)
+    job = main.Job(os.urandom(4).hex(), "clip.wav", tmp_path)
+    job.status = "running"
+    main.JOB_STORE.add(job)
+    # e.g. the retention janitor, while the client is still following the job
+    threading.Timer(0.2, main.JOB_STORE.delete_jobs, args=([job.job_id],)).start()
+
+    with TestClient(main.app).stream("GET", f"/{route}/{job.job_id}") as r:
+        body = "".join(r.iter_text())
+    assert r.status_code == 200
+    last = body.strip().split("\n\n")[-1]
+    assert last.startswith("event: error\n")
+    assert '"error": "the job no longer exists"' in last
+
+
+def _events_until(route, predicate, timeout=10.0):
+    """Follow an SSE route's body until `predicate(event, data)` holds (the feeds never end)."""
+    async def follow():
+        response = await route
+        body = response.body_iterator
+        try:
+            async for chunk in body:
+                for message in chunk.split("\n\n"):
+                    lines = dict(line.split(": ", 1) for line in message.split("\n") if ": " in line)
+                    if "data" in lines and predicate(lines.get("event"), json.loads(lines["data"])):
+                        return
+        finally:
+            await body.aclose()
+
+    asyncio.run(asyncio.wait_for(follow(), timeout))
+
+
+def test_events_feed_sees_jobs_saved_by_another_process(main, monkeypatch, tmp_path):
+    monkeypatch.setattr(main, "PUSH_FALLBACK_POLL", 0.05)
+    worker_store = main.JobStore(main.JOB_STORE.path)  # no listeners: nothing is pushed here
+    job = main.Job(os.urandom(4).hex(), "clip.wav", tmp_path)
+    worker_store.add(job)
+
+    def work():
+        job.status, job.progress = "running", 0.5
+        worker_store.save(job)
+    threading.Timer(0.2, work).start()
+
+    _events_until(main.all_job_events(), lambda event, d: event == "progress" and d["job_id"] == job.job_id
+                  and d["progress"] == 0.5)
+
+
+def test_stream_wakes_for_cues_written_by_another_process(main, monkeypatch, tmp_path):
+    monkeypatch.setattr(main, "PUSH_FALLBACK_POLL", 60.0)  # only the file watch can wake it
+    monkeypatch.setattr(main, "CUE_POLL_INTERVAL", 0.05)
+    job = main.Job(os.urandom(4).hex(), "clip.wav", tmp_path)
+    job.status = "running"
+    main.JOB_STORE.add(job)
+    srt = tmp_path / f"{job.job_id}.srt"
+    srt.write_text("")
+    threading.Timer(0.2, srt.write_text, args=("1\n00:00:00,000 --> 00:00:01,000\nhello\n\n",)).start()
+
+    _events_until(main.stream_job(job.job_id), lambda event, d: event == "cue" and d["text"] == "hello",
+                  timeout=5.0)
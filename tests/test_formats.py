@@ -0,0 +1,59 @@
+import json
+import os
+
+import pytest
+
+
+@pytest.fixture
+def finished(main, tmp_path):
+    transcript = main.Transcript()
+    transcript.add(0.0, 1.25, " Hello there.", [(" Hello", 0.0, 0.5), (" there.", 0.6, 1.25)])
+    transcript.add(61.5, 63.0, " Tab\tinside", [(" Tab\tinside", 61.5, 63.0)])
+    job = main.Job(os.urandom(4).hex(), "talk.mp4", tmp_path)
+    job.status, job.language, job.duration = "done", "en", 63.0
+    job.params = {"style": "default"}
+    main.save_transcript(job, transcript)
+    main.JOB_STORE.add(job)
+    return job
+
+
+@pytest.fixture
+def client(main):
+    from fastapi.testclient import TestClient
+    return TestClient(main.app)
+
+
+def test_every_format_renders_from_the_stored_transcript(client, finished):
+    base = f"/download/{finished.job_id}"
+    vtt = client.get(f"{base}.vtt")
+    assert vtt.headers["content-type"].startswith("text/vtt")
+    assert vtt.text.startswith("WEBVTT\n\n1\n00:00:00.000 --> 00:00:01.250\nHello there.\n")
+
+    data = client.get(f"{base}.json").json()
+    assert data["language"] == "en" and data["duration"] == 63.0
+    assert [s["text"] for s in data["segments"]] == ["Hello there.", "Tab\tinside"]
+    assert data["segments"][0]["words"][1] == {"word": "there.", "start": 0.6, "end": 1.25}
+
+    tsv = client.get(f"{base}.tsv").text.splitlines()
+    assert tsv == ["start\tend\ttext", "0\t1250\tHello there.", "61500\t63000\tTab inside"]
+
+    assert client.get(f"{base}.txt").text == "Hello there.\nTab\tinside\n"
+    r = client.get(f"{base}?format=txt")  # the same render through the query form
+    assert r.status_code == 200 and 'filename="talk.txt"' in r.headers["content-disposition"]
+
+
+def test_renders_are_reused(main, finished):
+    first = main.render_output(finished, "json")
+    first.write_text("{}")  # a second call must not render again
+    assert main.render_output(finished, "json").read_text() == "{}"
+
+
+def test_bad_requests(main, client, finished, tmp_path):
+    r = client.get(f"/download/{finished.job_id}.docx")
+    assert r.status_code == 400 and "choose from" in r.json()["error"]
+    assert client.get("/download/nope.json").status_code == 404
+
+    running = main.Job(os.urandom(4).hex(), "talk.mp4", tmp_path)
+    running.status = "running"
+    main.JOB_STORE.add(running)
+    assert client.get(f"/download/{running.job_id}.json").status_code == 409
@@ -0,0 +1,46 @@
+import time
+
+
+def test_only_the_lease_holder_sweeps(main, tmp_path):
+    store = main.JobStore(tmp_path / "jobs.sqlite3")
+    assert store.take_lease("janitor", "a", 60)
+    assert store.take_lease("janitor", "a", 60)       # renewal
+    assert not store.take_lease("janitor", "b", 60)
+
+    store._conn().execute("UPDATE leases SET expires_at = ?", (time.time() - 1,))
+    assert store.take_lease("janitor", "b", 60)       # the holder stopped renewing
+    assert not store.take_lease("janitor", "a", 60)
+
+
+def test_janitor_skips_without_the_lease(main, monkeypatch, tmp_path):
+    store = main.JobStore(tmp_path / "jobs.sqlite3")
+    store.take_lease("janitor", "someone-else", 60)
+    monkeypatch.setattr(main, "JOB_STORE", store)
+    swept = []
+    janitor = main.Janitor()
+    monkeypatch.setattr(janitor, "sweep_files", lambda now: swept.append(now))
+
+    janitor.run()
+    assert swept == [] and janitor.stats["runs"] == 0
+    janitor.run(force=True)                            # POST /storage/cleanup
+    assert len(swept) == 1
+
+    store.remove_worker("someone-else")                # its lease goes with it
+    janitor._last_run = 0.0
+    janitor.run()
+    assert len(swept) == 2
+
+
+def test_oversized_form_upload_is_refused_before_the_body_is_read(main, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setattr(main, "UPLOAD_QUOTA_MB", 1)
+
+    def handler_reached(*args, **kwargs):
+        raise AssertionError("the upload was read before the quota check")
+
+    monkeypatch.setattr(main, "_job_settings", handler_reached)
+    client = TestClient(main.app)  # no context manager: no startup, no worker threads
+    r = client.post("/transcribe_start", files={"file": ("big.wav", b"\0" * (2 << 20))})
+    assert r.status_code == 507
+    assert r.headers["Retry-After"] == str(main.QUOTA_RETRY_SEC)
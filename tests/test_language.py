@@ -0,0 +1,71 @@
+import os
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+
+class DetectorModel:
+    """A WhisperModel stand-in whose transcribe() only reports language probabilities."""
+    calls = 0
+
+    def __init__(self, model_id, device="cpu", compute_type="int8", **kwargs):
+        self.model_id = model_id
+
+    def transcribe(self, audio, **kwargs):
+        DetectorModel.calls += 1
+        return iter(()), SimpleNamespace(language="de", language_probability=0.7,
+                                         all_language_probs=[("de", 0.7), ("en", 0.3)])
+
+
+@pytest.fixture
+def detector(main, monkeypatch):
+    monkeypatch.setattr(main, "MODELS", main.ModelManager(0, 0))
+    monkeypatch.setattr(main, "MODEL_FACTORY", DetectorModel)
+    monkeypatch.setattr(main, "_detect_device", lambda: "cpu")
+    DetectorModel.calls = 0
+    return DetectorModel
+
+
+def _job(main, tmp_path, source_hash):
+    job = main.Job(os.urandom(4).hex(), "clip.wav", tmp_path)
+    job.params = {"source_hash": source_hash}
+    return job
+
+
+def test_language_is_detected_once_per_source(main, detector, tmp_path):
+    audio = np.zeros(main.SAMPLE_RATE * 5, dtype=np.float32)
+    source = os.urandom(32).hex()
+
+    first = _job(main, tmp_path, source)
+    assert main.pin_language(first, audio) == "de"
+    assert (first.language_source, first.language_probability) == ("detected", 0.7)
+    assert detector.calls == 1
+
+    again = _job(main, tmp_path, source)  # a re-run of the same upload
+    assert main.pin_language(again, audio) == "de"
+    assert again.language_source == "cached"
+    assert detector.calls == 1
+
+
+def test_failed_detection_leaves_it_to_the_model(main, detector, monkeypatch, tmp_path):
+    def broken(self, audio, **kwargs):
+        raise RuntimeError("no detector")
+    monkeypatch.setattr(detector, "transcribe", broken)
+    source = os.urandom(32).hex()
+    job = _job(main, tmp_path, source)
+
+    assert main.pin_language(job, np.zeros(main.SAMPLE_RATE, dtype=np.float32)) is None
+    assert job.language_source == "model"
+    assert main.JOB_STORE.get_source_language(source, main.LANG_DETECT_PROFILE) is None
+
+
+def test_detection_samples_the_loudest_windows(main):
+    sr, win = main.SAMPLE_RATE, main.LANG_WINDOW_SEC * main.SAMPLE_RATE
+    audio = np.zeros(10 * win, dtype=np.float32)
+    audio[6 * win:7 * win] = 0.5  # the only speech, far from the start
+    windows = main._detection_windows(audio, 1)
+    assert len(windows) == 1
+    start, end = windows[0]
+    assert end - start == win and abs(start - 6 * win) < win // 2
+    assert main._detection_windows(audio[:sr], 3) == [(0, sr)]  # shorter than one window
@@ -0,0 +1,18 @@
+import numpy as np
+
+
+def test_cuts_land_in_silence(main):
+    sr = main.SAMPLE_RATE
+    rng = np.random.default_rng(0)
+    audio = (rng.standard_normal(60 * sr) * 0.3).astype(np.float32)
+    audio[28 * sr:29 * sr] = 0.0  # the only pause near the 30 s target
+    (cut,) = main.find_silence_cuts(audio, target=30, search=5)
+    assert 28 <= cut <= 29
+
+
+def test_chunks_cover_the_file_once(main):
+    chunks = main.plan_chunks(100.0, [30.0, 65.0], overlap=1.0)
+    assert [c[:2] for c in chunks] == [(0.0, 31.0), (29.0, 66.0), (64.0, 100.0)]
+    # every midpoint belongs to exactly one chunk
+    for t in (0.0, 29.5, 30.0, 64.9, 65.0, 99.9):
+        assert sum(keep_from <= t < keep_to for _, _, keep_from, keep_to in chunks) == 1
@@ -0,0 +1,42 @@
+def _other_worker(main, store, report):
+    store.heartbeat("elsewhere:1:abc", "worker", report)
+    # another host, so the liveness check relies on the heartbeat age alone
+    store._conn().execute("UPDATE workers SET host = 'elsewhere' WHERE worker_id = 'elsewhere:1:abc'")
+
+
+def test_render_merges_worker_snapshots(main):
+    worker = main.Metrics()
+    worker.describe("jobs_total", "counter", "Jobs.")
+    worker.inc("jobs_total", status="done")
+    worker.gauge("resident", lambda: 2, per_process=True)
+
+    api = main.Metrics()
+    api.describe("jobs_total", "counter", "Jobs.")
+    api.gauge("resident", lambda: 0, per_process=True)
+    api.gauge("queue", lambda: 5)
+
+    text = api.render("api", {"w1": worker.snapshot()})
+    assert 'jobs_total{status="done",worker="w1"} 1.0' in text
+    assert 'resident{worker="api"} 0' in text
+    assert 'resident{worker="w1"} 2' in text
+    assert "queue 5" in text
+
+
+def test_worker_reports_travel_through_the_store(main, tmp_path):
+    store = main.JobStore(tmp_path / "jobs.sqlite3")
+    report = {"metrics": {"counters": [], "hists": [], "gauges": {}},
+              "models": [{"model_choice": "fast"}],
+              "cache": {"hits": 3, "misses": 1, "stores": 1, "evictions": 0}}
+    _other_worker(main, store, report)
+    store.heartbeat(main.WORKER_ID, "all", {"metrics": {}})  # this process is left out
+    assert store.worker_reports() == {"elsewhere:1:abc": report}
+
+    stats = main.ResultCache(tmp_path / "cache", 1024).stats([report["cache"]])
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (3, 1, 0.75)
+
+
+def test_stale_worker_reports_are_ignored(main, tmp_path):
+    store = main.JobStore(tmp_path / "jobs.sqlite3")
+    _other_worker(main, store, {"metrics": {}})
+    store._conn().execute("UPDATE workers SET heartbeat_at = 0")
+    assert store.worker_reports() == {}
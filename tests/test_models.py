@@ -0,0 +1,78 @@
+import time
+
+
+def _budget_for_one(main):
+    return main._approx_model_bytes("medium", "int16") + 1
+
+
+def test_leased_model_is_not_evicted(main, fake_models):
+    mgr = main.ModelManager(_budget_for_one(main), 0)
+    fast, _ = mgr.get("fast")              # a running job holds the small model
+    balanced, _ = mgr.get("balanced")      # a second job overflows the budget
+    assert {m["model_choice"] for m in mgr.resident()} == {"fast", "balanced"}
+
+    again, _ = mgr.get("fast")             # no second copy while the first is in use
+    assert again is fast
+    mgr.release("fast", fast)
+    mgr.release("fast", fast)
+    mgr.release("balanced", balanced)      # the budget catches up once nothing is leased
+    assert [m["model_choice"] for m in mgr.resident()] == ["balanced"]
+
+
+def test_idle_reaper_skips_leased_models(main, fake_models):
+    mgr = main.ModelManager(0, 60)
+    model, _ = mgr.get("fast")
+    mgr.reap_idle(now=time.time() + 3600)
+    assert mgr.meta("fast") is not None
+
+    mgr.release("fast", model)
+    mgr.reap_idle(now=time.time() + 3600)
+    assert mgr.meta("fast") is None
+
+
+def test_lease_context_releases(main, fake_models):
+    mgr = main.ModelManager(0, 0)
+    with mgr.lease("fast") as (model, meta):
+        assert mgr.resident()[0]["leases"] == 1
+    assert mgr.resident()[0]["leases"] == 0
+
+
+def test_release_after_unload_is_ignored(main, fake_models):
+    mgr = main.ModelManager(0, 0)
+    old, _ = mgr.get("fast")
+    mgr.unload("fast")
+    new, _ = mgr.get("fast")
+    mgr.release("fast", old)  # the job that held the unloaded copy finishes
+    assert mgr.resident()[0]["leases"] == 1
+    mgr.release("fast", new)
+
+
+def test_chunk_pool_counts_against_budget_and_is_shut_down(main, fake_models, monkeypatch):
+    per_model = main._approx_model_bytes("small", "int8")
+    mgr = main.ModelManager(main.CHUNK_PROCS * per_model + 1, 0)
+    monkeypatch.setattr(main, "MODELS", mgr)
+    pool = main._get_chunk_pool("fast", "small", "cpu", ["int8"])
+    (entry,) = mgr.resident()
+    assert entry["model_choice"] == "fast/chunks"
+    assert entry["approx_mb"] == round(main.CHUNK_PROCS * per_model / 1e6)
+
+    mgr.release("fast/chunks", pool)
+    model, _ = mgr.get("fast")  # no room next to the pool's model copies
+    assert [m["model_choice"] for m in mgr.resident()] == ["fast"]
+    assert pool._shutdown_thread
+    mgr.release("fast", model)
+
+
+def test_idle_chunk_pool_is_reaped(main, fake_models, monkeypatch):
+    mgr = main.ModelManager(0, 60)
+    monkeypatch.setattr(main, "MODELS", mgr)
+    pool = main._get_chunk_pool("fast", "small", "cpu", ["int8"])
+    assert main._get_chunk_pool("fast", "small", "cpu", ["int8"]) is pool
+    mgr.release("fast/chunks", pool)
+    mgr.reap_idle(now=time.time() + 3600)
+    assert mgr.meta("fast/chunks") is not None  # still leased once
+
+    mgr.release("fast/chunks", pool)
+    mgr.reap_idle(now=time.time() + 3600)
+    assert mgr.meta("fast/chunks") is None
+    assert pool._shutdown_thread
@@ -0,0 +1,36 @@
+import pytest
+
+
+@pytest.fixture(scope="module")
+def bench(main):
+    from benchmarks import bench_packer
+    return bench_packer
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_default_layout_matches_the_legacy_packer(main, bench, seed):
+    words = bench.synth_words(3000, seed=seed)
+    assert main.build_vertical_blocks(words) == bench.legacy_build_vertical_blocks(words)
+
+
+@pytest.mark.parametrize("name", ["reels", "compact", "two_lines"])
+def test_blocks_respect_the_layout(main, bench, name):
+    layout = main.VERTICAL_LAYOUTS[name]
+    words = bench.synth_words(2000, seed=7)
+    blocks = main.build_vertical_blocks(words, layout)
+    assert sum(b["n_words"] for b in blocks) == len(words)  # every word once, in order
+    for b in blocks:
+        lines = b["text"].split("\n")
+        assert len(lines) <= layout.lines
+        # a single word longer than the line is the only way past max_chars
+        assert all(len(line) <= layout.max_chars or " " not in line for line in lines)
+
+
+def test_layout_from_profile_or_overrides(main):
+    assert main.parse_layout(None) == main.DEFAULT_LAYOUT
+    assert main.parse_layout("compact") == main.VERTICAL_LAYOUTS["compact"]
+    layout = main.parse_layout('{"profile": "two_lines", "max_chars": 30}')
+    assert layout.lines == 2 and layout.max_chars == 30
+    for bad in ("huge", '{"max_chars": 0}', '{"colour": "red"}', "[1, 2]"):
+        with pytest.raises(ValueError):
+            main.parse_layout(bad)
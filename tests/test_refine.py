@@ -0,0 +1,77 @@
+import os
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+
+class RefineModel:
+    """Stands in for the refine profile: one segment per window, optionally failing on window `fail_at`."""
+    fail_at = None
+
+    def __init__(self, model_id, device="cpu", compute_type="int8", **kwargs):
+        self.model_id = model_id
+        self.calls = 0
+
+    def transcribe(self, audio, **kwargs):
+        self.calls += 1
+        if self.calls == RefineModel.fail_at:
+            raise RuntimeError("out of memory")
+        seg = SimpleNamespace(start=0.0, end=len(audio) / 16000, text=" refined", words=[])
+        return iter([seg]), None
+
+
+@pytest.fixture
+def refine_setup(main, monkeypatch, tmp_path):
+    monkeypatch.setattr(main, "MODELS", main.ModelManager(0, 0))
+    monkeypatch.setattr(main, "MODEL_FACTORY", RefineModel)
+    monkeypatch.setattr(main, "_detect_device", lambda: "cpu")
+    monkeypatch.setattr(main, "REFINE_WINDOW_SEC", 30)
+    RefineModel.fail_at = None
+
+    sr = main.SAMPLE_RATE
+    rng = np.random.default_rng(0)
+    audio = (rng.standard_normal(120 * sr) * 0.3).astype(np.float32)
+    for t in (30, 60, 90):
+        audio[(t - 1) * sr:t * sr] = 0.0  # pauses to cut the windows at
+
+    draft = main.Transcript()
+    for t in range(0, 120, 10):
+        draft.add(t + 1.0, t + 9.0, f" draft {t}", [])
+
+    job = main.Job(os.urandom(4).hex(), "clip.wav", tmp_path)
+    job.status, job.duration, job.started_at, job.model_name = "transcribing", 120.0, time.time(), "small"
+    job.refine = {"profile": "best", "windows": [], "revisions": []}
+    main.JOB_STORE.add(job)
+
+    def run():
+        return main.refine_transcript(job, audio, draft, None, "transcribe", "default",
+                                      main.DEFAULT_LAYOUT, tmp_path / f"{job.job_id}.srt", "cpu")
+    return job, run
+
+
+def test_every_window_replaces_its_draft_segments(main, refine_setup):
+    job, run = refine_setup
+    transcript = run()
+    windows = job.refine["windows"]
+    assert len(windows) == 4 and windows[0][0] == 0.0 and windows[-1][1] == 120.0
+    assert job.refine["revisions"] == [1, 1, 1, 1]
+    assert transcript.texts == ["refined"] * 4
+    for (start, end), s0, e0 in zip(windows, transcript.starts, transcript.ends):
+        assert start <= (s0 + e0) / 2 < end  # each refined segment sits in its own window
+    srt = (job.out_dir / f"{job.job_id}.srt").read_text()
+    assert "refined" in srt and "draft" not in srt
+    assert main.load_transcript(job.job_id).texts == transcript.texts
+
+
+def test_a_failed_window_keeps_the_draft_from_there_on(main, refine_setup):
+    job, run = refine_setup
+    RefineModel.fail_at = 3
+    transcript = run()
+    assert job.refine["stopped"] and job.refine["error"] == "out of memory"
+    assert job.refine["revisions"] == [1, 1, 0, 0]
+    cut = job.refine["windows"][2][0]
+    drafts = [f"draft {t}" for t in range(0, 120, 10) if (t + 1 + t + 9) / 2 >= cut]
+    assert transcript.texts == ["refined", "refined"] + drafts
+    assert main.load_transcript(job.job_id).texts == transcript.texts
@@ -0,0 +1,35 @@
+import os
+import threading
+
+
+def _queued(main, tmp_path):
+    job = main.Job(os.urandom(4).hex(), "clip.wav", tmp_path)
+    job.priority = 100  # ahead of anything other tests left queued
+    job.params = {"src_path": str(tmp_path / "clip.wav"), "task": "transcribe", "model_choice": "fast",
+                  "style": "default"}
+    main.JOB_STORE.add(job)
+    return job
+
+
+def test_a_crashing_job_is_failed_and_the_worker_keeps_going(main, monkeypatch, tmp_path):
+    ran = threading.Event()
+
+    def run_job(job):
+        if job.job_id == bad.job_id:
+            raise RuntimeError("boom")
+        ran.set()
+    monkeypatch.setattr(main, "run_job", run_job)
+
+    bad, good = _queued(main, tmp_path), _queued(main, tmp_path)
+    scheduler = main.JobScheduler(main.JOB_STORE, 1)
+    scheduler.start()
+    try:
+        assert ran.wait(10)
+    finally:
+        scheduler.resize(0)
+    failed = main.JOB_STORE.get(bad.job_id)
+    assert failed.status == "error" and failed.error_msg == "boom" and failed.finished_at
+
+
+def test_a_job_deleted_before_it_starts_is_skipped(main, tmp_path):
+    main.run_transcription("gone1234", tmp_path / "clip.wav", None, "transcribe", "fast", tmp_path, "default")
@@ -0,0 +1,88 @@
+import os
+from types import SimpleNamespace
+
+
+def _segment(start, end, text, words=()):
+    return SimpleNamespace(start=start, end=end, text=text,
+                           words=[SimpleNamespace(word=w, start=s, end=e) for w, s, e in words])
+
+
+def _speech(t0, text):
+    words = [(f" {w}", t0 + k * 0.4, t0 + k * 0.4 + 0.3) for k, w in enumerate(text.split())]
+    return _segment(t0, words[-1][2], text, words)
+
+
+SEGMENTS = [
+    _speech(0.0, "we start the show with a short look back."),
+    _speech(3.0, "then the band plays"),
+    _segment(5.0, 9.0, "(music)"),
+    _speech(9.5, "and that was the opening number of tonight,"),
+    _segment(13.0, 15.0, "(applause)"),
+    _speech(15.5, "thank you all for coming."),
+]
+
+
+def _cues(path):
+    return [block.split("\n", 2)[1:] for block in path.read_text().strip().split("\n\n")]
+
+
+def test_streamed_vertical_matches_rerender_around_wordless_segments(main, tmp_path):
+    streamed = tmp_path / "streamed.srt"
+    with main.SubtitleStreamWriter(streamed, "vertical") as writer:
+        for seg in SEGMENTS:
+            writer.add(seg)
+
+    rerendered = tmp_path / "rerendered.srt"
+    main.write_subtitles(writer.transcript, "vertical", rerendered)
+
+    assert rerendered.read_text() == streamed.read_text()
+    cues = _cues(rerendered)
+    texts = [text for _, text in cues]
+    assert "(music)" in texts and "(applause)" in texts
+    # nothing is packed across a wordless segment, and cues stay in time order
+    before = " ".join(texts[:texts.index("(music)")]).split()
+    assert before[-1] == "plays"
+    starts = [timing.split(" --> ")[0] for timing, _ in cues]
+    assert starts == sorted(starts)
+
+
+def test_each_cue_is_readable_as_soon_as_it_is_added(main, tmp_path):
+    srt = tmp_path / "partial.srt"
+    offset, seen = 0, []
+    with main.SubtitleStreamWriter(srt, "default") as writer:
+        for seg in SEGMENTS:
+            writer.add(seg)
+            cues, offset = main.read_new_cues(srt, offset)
+            assert len(cues) == 1  # flushed with the segment, nothing held back
+            seen += cues
+    assert [c["text"] for c in seen] == [seg.text for seg in SEGMENTS]
+    assert [c["index"] for c in seen] == list(range(1, len(SEGMENTS) + 1))
+
+
+def test_read_new_cues_leaves_a_half_written_cue_for_later(main, tmp_path):
+    srt = tmp_path / "partial.srt"
+    srt.write_text("1\n00:00:00,000 --> 00:00:01,000\nfirst\n\n2\n00:00:01,000 --> 00:00:02,")
+    cues, offset = main.read_new_cues(srt, 0)
+    assert [c["text"] for c in cues] == ["first"]
+    with srt.open("a") as f:
+        f.write("000\nsecond\n\n")
+    cues, _ = main.read_new_cues(srt, offset)
+    assert [(c["index"], c["text"]) for c in cues] == [(2, "second")]
+
+
+def test_stream_sends_the_cues_then_done(main, tmp_path):
+    from fastapi.testclient import TestClient
+
+    job = main.Job(os.urandom(4).hex(), "clip.wav", tmp_path)
+    srt = tmp_path / f"{job.job_id}.srt"
+    with main.SubtitleStreamWriter(srt, "default") as writer:
+        for seg in SEGMENTS:
+            writer.add(seg)
+    job.status, job.progress, job.srt_path = "done", 1.0, srt
+    main.JOB_STORE.add(job)
+
+    with TestClient(main.app).stream("GET", f"/stream/{job.job_id}?from_cue=2") as r:
+        body = "".join(r.iter_text())
+    events = [m.split("\n", 1)[0] for m in body.strip().split("\n\n")]
+    assert events == ["event: cue"] * (len(SEGMENTS) - 2) + ["event: progress", "event: done"]
+    assert '"index": 3, ' in body and '"index": 2, ' not in body  # the client had cues 1 and 2
@@ -0,0 +1,145 @@
+import hashlib
+import os
+import threading
+
+import pytest
+
+CHUNK = 256 * 1024  # the smallest chunk size the server accepts
+
+
+@pytest.fixture
+def client(main):
+    from fastapi.testclient import TestClient
+    return TestClient(main.app)
+
+
+def _create(client, data, **form):
+    r = client.post("/uploads", data=dict(filename="clip.opus", size=len(data), chunk_size=CHUNK, **form))
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def _put(client, up, i, data, sha=None):
+    block = data[i * CHUNK:(i + 1) * CHUNK]
+    return client.put(f"/uploads/{up['upload_id']}/chunks/{i}", content=block,
+                      headers={"X-Chunk-Sha256": sha or hashlib.sha256(block).hexdigest()})
+
+
+def _upload(client, data):
+    up = _create(client, data, sha256=hashlib.sha256(data).hexdigest())
+    for i in up["missing"]:
+        assert _put(client, up, i, data).status_code == 200
+    r = client.post(f"/uploads/{up['upload_id']}/complete", data={"sha256": hashlib.sha256(data).hexdigest()})
+    assert r.status_code == 200, r.text
+    return up
+
+
+def test_chunks_in_any_order_resume_and_complete(main, client):
+    data = os.urandom(2 * CHUNK + 1000)
+    up = _create(client, data)
+    assert up["status"] == "open" and up["chunks"] == 3 and up["missing"] == [0, 1, 2]
+
+    assert _put(client, up, 2, data).status_code == 200
+    assert _put(client, up, 0, data).status_code == 200
+    # an interrupted client asks what is still missing
+    assert client.get(f"/uploads/{up['upload_id']}").json()["missing"] == [1]
+    r = client.post(f"/uploads/{up['upload_id']}/complete")
+    assert r.status_code == 409 and "missing" in r.json()["error"]
+
+    assert _put(client, up, 1, data).status_code == 200
+    r = client.post(f"/uploads/{up['upload_id']}/complete", data={"sha256": hashlib.sha256(data).hexdigest()})
+    assert r.status_code == 200
+    assert r.json()["sha256"] == hashlib.sha256(data).hexdigest()
+    stored = main.JOB_STORE.get_upload(up["upload_id"])
+    assert stored["status"] == "complete"
+    with open(stored["path"], "rb") as f:
+        assert f.read() == data
+
+
+def test_bad_chunk_hash_and_length_are_refused(client):
+    data = os.urandom(CHUNK + 10)
+    up = _create(client, data)
+    r = _put(client, up, 0, data, sha="0" * 64)
+    assert r.status_code == 400 and "sha256" in r.json()["error"]
+    r = client.put(f"/uploads/{up['upload_id']}/chunks/1", content=b"short")
+    assert r.status_code == 400
+    assert client.get(f"/uploads/{up['upload_id']}").json()["missing"] == [0, 1]
+
+
+def test_dedup_needs_the_bytes_not_just_the_hash(main, client):
+    data = os.urandom(CHUNK + 5000)
+    _upload(client, data)
+    sha = hashlib.sha256(data).hexdigest()
+
+    # knowing the hash only gets a challenge; a wrong answer means uploading as usual
+    up = _create(client, data, sha256=sha)
+    assert up["status"] == "open" and not up["deduplicated"] and up["proof"]
+    r = client.post(f"/uploads/{up['upload_id']}/proof", data={"sha256": sha})
+    assert r.status_code == 409
+    assert client.post(f"/uploads/{up['upload_id']}/proof", data={"sha256": sha}).status_code == 409  # one try
+    assert client.get(f"/uploads/{up['upload_id']}").json()["missing"] == [0, 1]
+
+    up = _create(client, data, sha256=sha)
+    offset, length = up["proof"]["offset"], up["proof"]["length"]
+    r = client.post(f"/uploads/{up['upload_id']}/proof",
+                    data={"sha256": hashlib.sha256(data[offset:offset + length]).hexdigest()})
+    assert r.status_code == 200, r.text
+    assert r.json()["deduplicated"] and r.json()["status"] == "complete" and r.json()["missing"] == []
+    r = client.post(f"/uploads/{up['upload_id']}/complete")
+    assert r.status_code == 200 and r.json()["sha256"] == sha
+
+
+def test_no_dedup_once_chunks_were_sent(client):
+    data = os.urandom(CHUNK + 5000)
+    _upload(client, data)
+    up = _create(client, data, sha256=hashlib.sha256(data).hexdigest())
+    assert _put(client, up, 0, data).status_code == 200
+    offset, length = up["proof"]["offset"], up["proof"]["length"]
+    r = client.post(f"/uploads/{up['upload_id']}/proof",
+                    data={"sha256": hashlib.sha256(data[offset:offset + length]).hexdigest()})
+    assert r.status_code == 409
+    assert client.get(f"/uploads/{up['upload_id']}").json()["missing"] == [1]
+
+
+def _follow(main, upload_id):
+    received, done = [], threading.Event()
+
+    def read():
+        for block in main.upload_feed(upload_id):
+            received.append(block)
+        done.set()
+    threading.Thread(target=read, daemon=True).start()
+    return received, done
+
+
+def test_feed_yields_the_prefix_while_chunks_arrive(main, client):
+    data = os.urandom(2 * CHUNK + 7)
+    up = _create(client, data)
+    received, done = _follow(main, up["upload_id"])
+
+    _put(client, up, 1, data)  # no prefix yet
+    _put(client, up, 0, data)
+    for _ in range(50):
+        if sum(map(len, received)) == 2 * CHUNK:
+            break
+        done.wait(0.1)
+    assert b"".join(received) == data[:2 * CHUNK]
+    assert not done.is_set()
+
+    _put(client, up, 2, data)
+    client.post(f"/uploads/{up['upload_id']}/complete")
+    assert done.wait(5)
+    assert b"".join(received) == data
+
+
+def test_feed_reads_the_known_file_after_a_dedup_proof(main, client):
+    data = os.urandom(CHUNK + 5000)
+    _upload(client, data)
+    up = _create(client, data, sha256=hashlib.sha256(data).hexdigest())
+    received, done = _follow(main, up["upload_id"])  # e.g. a job started with the upload
+
+    offset, length = up["proof"]["offset"], up["proof"]["length"]
+    client.post(f"/uploads/{up['upload_id']}/proof",
+                data={"sha256": hashlib.sha256(data[offset:offset + length]).hexdigest()})
+    assert done.wait(5)
+    assert b"".join(received) == data
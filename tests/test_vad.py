@@ -0,0 +1,49 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+
+def _regions(main, *spans):
+    return [(int(a * main.SAMPLE_RATE), int(b * main.SAMPLE_RATE)) for a, b in spans]
+
+
+def test_speech_times_map_back_to_the_original_timeline(main):
+    # speech at 10-12 s and 30-35 s, concatenated to 0-2 s and 2-7 s
+    smap = main.SpeechMap(_regions(main, (10, 12), (30, 35)))
+    assert smap.speech_sec == 7.0
+    assert smap.to_original(0.0) == 10.0
+    assert smap.to_original(1.5) == 11.5
+    assert smap.to_original(2.0) == 30.0                # a start on the seam opens the next region
+    assert smap.to_original(2.0, is_end=True) == 12.0   # an end on it closes the previous one
+    assert smap.to_original(6.5, is_end=True) == 34.5
+    assert main.SpeechMap([]).to_original(3.0) == 3.0
+
+
+def test_segments_and_words_are_remapped(main):
+    smap = main.SpeechMap(_regions(main, (10, 12), (30, 35)))
+    seg = SimpleNamespace(start=1.0, end=2.0, text=" one two", words=[
+        SimpleNamespace(word=" one", start=1.0, end=1.5),
+        SimpleNamespace(word=" two", start=1.5, end=2.0),
+    ])
+    streamed = main.Transcript()
+    streamed.add_segment(seg, smap)
+    assert (streamed.starts[0], streamed.ends[0]) == (11.0, 12.0)
+    assert streamed.segment_words(0) == [("one", 11.0, 11.5), ("two", 11.5, 12.0)]
+
+    # remapping a finished transcript in place gives the same times
+    finished = main.Transcript()
+    finished.add_segment(seg)
+    smap.apply(finished)
+    assert list(finished.starts) == list(streamed.starts) and list(finished.ends) == list(streamed.ends)
+    assert finished.segment_words(0) == streamed.segment_words(0)
+
+
+def test_collect_speech_concatenates_the_regions(main, tmp_path):
+    audio = np.arange(10 * main.SAMPLE_RATE, dtype=np.float32)
+    regions = _regions(main, (1, 2), (5, 7))
+    speech = main.collect_speech(audio, regions, tmp_path / "speech.f32")
+    assert len(speech) == 3 * main.SAMPLE_RATE
+    assert speech[0] == audio[regions[0][0]] and speech[-1] == audio[regions[1][1] - 1]
+
+    spilled = main.collect_speech(audio, regions, tmp_path / "speech.f32", memory_limit=0)
+    assert isinstance(spilled, np.memmap) and np.array_equal(spilled, speech)
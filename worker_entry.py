@@ -0,0 +1,64 @@
+"""
+Inference worker without the HTTP API. Claims jobs from the shared job store
+(GETSUBTITLES_STATE_DIR), heartbeats while it runs them and writes results to the
+shared folders, so any API replica started with GETSUBTITLES_ROLE=api can answer
+/progress and /download. Start as many as the hosts hold.
+
+    python worker_entry.py --preload fast --workers 2
+
+SIGTERM/Ctrl+C stops claiming jobs and exits once the running ones have finished;
+a second signal exits at once and other workers pick the jobs up again.
+"""
+import os
+import sys
+import time
+import signal
+import argparse
+import threading
+import multiprocessing
+from pathlib import Path
+
+parser = argparse.ArgumentParser(description="Get Subtitles inference worker")
+parser.add_argument("--preload", default=None,
+                    help="Comma-separated profiles to load and warm up at startup, e.g. fast,balanced")
+parser.add_argument("--workers", type=int, default=None, help="jobs this process runs at once")
+args, _ = parser.parse_known_args()
+if args.preload is not None:
+    os.environ["GETSUBTITLES_PRELOAD"] = args.preload
+if args.workers is not None:
+    os.environ["GETSUBTITLES_WORKERS"] = str(args.workers)
+os.environ["GETSUBTITLES_ROLE"] = "worker"
+
+base = Path(os.getenv("LOCALAPPDATA", Path.home() / "AppData" / "Local")) / "GetSubtitles"
+os.environ.setdefault("HF_HOME", str(base / "hf"))
+os.environ.setdefault("CTRANSLATE2_HOME", str(base / "ct2"))
+
+
+def main_cli():
+    from app import main
+
+    stop = threading.Event()
+
+    def on_signal(signum, frame):
+        if stop.is_set():
+            print("[GETSUBTITLES] Exiting now; running jobs will be requeued")
+            os._exit(1)
+        print("[GETSUBTITLES] Finishing running jobs, then exiting (signal again to exit now)")
+        stop.set()
+
+    signal.signal(signal.SIGINT, on_signal)
+    signal.signal(signal.SIGTERM, on_signal)
+
+    main.start_services()
+    while not stop.wait(1.0):
+        pass
+    main.SCHEDULER.resize(0)
+    while main.SCHEDULER.alive():
+        time.sleep(0.5)
+    main.JOB_STORE.remove_worker(main.WORKER_ID)
+    return 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()  # long-file mode spawns worker processes
+    sys.exit(main_cli())